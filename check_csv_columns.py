@@ -1,7 +1,25 @@
-import pandas as pd
+import sys
 
-df1 = pd.read_csv('c:/Users/EvanJacobs/Documents/OmniaOffline/Parquet to CSV and CLean/csv_output/ANP2 for July - Nov 2025/pi_data_20251230_125107.csv')
-df2 = pd.read_csv('c:/Users/EvanJacobs/Documents/OmniaOffline/Parquet to CSV and CLean/csv_output/NAP2 for July - Nov 2025/pi_data_20251229_151817.csv')
+import compare_plants
+import table_io
 
-print('ANP2 Columns:', df1.columns.tolist())
-print('NAP2 Columns:', df2.columns.tolist())
\ No newline at end of file
+# Headers only: no data is read (see compare_plants.py for the full comparison)
+if len(sys.argv) == 3:
+    path1, path2 = sys.argv[1], sys.argv[2]
+elif len(sys.argv) == 1:
+    path1 = 'c:/Users/EvanJacobs/Documents/OmniaOffline/Parquet to CSV and CLean/csv_output/ANP2 for July - Nov 2025/pi_data_20251230_125107.csv'
+    path2 = 'c:/Users/EvanJacobs/Documents/OmniaOffline/Parquet to CSV and CLean/csv_output/NAP2 for July - Nov 2025/pi_data_20251229_151817.csv'
+else:
+    print(f'Usage: python {sys.argv[0]} [FILE_A FILE_B]', file=sys.stderr)
+    sys.exit(2)
+
+columns1 = table_io.read_columns(path1)
+columns2 = table_io.read_columns(path2)
+schema = compare_plants.schema_diff(columns1, columns2)
+label1 = table_io.data_stem(path1)
+label2 = table_io.data_stem(path2)
+
+print(f'{label1} Columns:', columns1)
+print(f'{label2} Columns:', columns2)
+print(f'Only in {label1}:', schema['only_a'])
+print(f'Only in {label2}:', schema['only_b'])
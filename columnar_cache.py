@@ -0,0 +1,213 @@
+"""
+Memory-mapped columnar cache of table files, shared by the web tools.
+
+- The first read of a CSV (plain or compressed) or Parquet file writes an
+  uncompressed Arrow IPC copy next to it ("<file>.arrow"); later reads, by
+  any process, memory-map that copy instead of parsing text again
+- Uncompressed IPC is read in place: selecting columns touches only their
+  pages, and the filter and plotter servers share the OS page cache
+- Numbers are parsed once, when the copy is built; date/time text is kept
+  as written (format and UTC offset), so filtered output reproduces it
+- The copy records the source's size and mtime in its schema metadata and
+  is rebuilt when they change
+- Column types come from the first INFER_BYTES of the file; when a later
+  block does not fit (an int-looking tag that later holds floats, or "Bad
+  Input" text), one more pass reads every column as text and widens each
+  column that does not fit to float64 or text, then the copy is written
+  with those types. A CSV is never read into memory as a whole
+- If the copy cannot be written next to the source (read-only folder, file
+  in use on Windows) it is written to the system temp folder instead
+
+Disk cost: the copy is uncompressed, so it takes about as much disk as the
+table takes in memory - roughly the size of a plain CSV, several times the
+size of a .csv.gz/.csv.zst or Parquet file. Copies are never deleted by the
+tools; remove "*.arrow" files to reclaim the space. Set ENABLED to False (or
+start the tools with COLUMNAR_CACHE=0 in the environment) to read every file
+directly, without writing copies.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+import table_io
+
+CACHE_SUFFIX = '.arrow'
+
+# False reads every file directly (no copies on disk); COLUMNAR_CACHE=0 in the environment turns it off too
+ENABLED = os.environ.get('COLUMNAR_CACHE', '1') != '0'
+
+# Leading part of a CSV used to infer column types; later blocks that do not fit trigger one re-typing pass
+INFER_BYTES = 16 * 1024 * 1024
+
+# Bumped when the layout of cache copies changes, so older copies are rebuilt
+CACHE_VERSION = b'2'
+
+# Fallback location for copies that cannot be written next to their source
+FALLBACK_DIR = Path(tempfile.gettempdir()) / 'columnar_cache'
+
+_FAILED_COLUMN = re.compile(r"CSV column #(\d+)")
+
+
+def cache_path(path):
+    return Path(str(path) + CACHE_SUFFIX)
+
+
+def _fallback_path(path):
+    key = hashlib.sha256(str(Path(path).resolve()).encode('utf-8')).hexdigest()[:24]
+    return FALLBACK_DIR / f"{key}{CACHE_SUFFIX}"
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return {b'source_size': str(stat.st_size).encode(), b'source_mtime_ns': str(stat.st_mtime_ns).encode(),
+            b'cache_version': CACHE_VERSION}
+
+
+def _open_copy(copy_path, path, check=True):
+    """The memory-mapped table at copy_path if it exists (and, with check, is current for path), else None"""
+    try:
+        source = pa.memory_map(str(copy_path), 'r')
+    except (OSError, pa.ArrowException):
+        return None
+    try:
+        reader = pa.ipc.open_file(source)
+        metadata = reader.schema.metadata or {}
+        if not check or all(metadata.get(key) == value for key, value in _signature(path).items()):
+            return reader.read_all()
+    except pa.ArrowException:
+        pass
+    source.close()
+    return None
+
+
+def _open_cached(path):
+    """The memory-mapped cached table for path if it is current, else None"""
+    for copy_path in (cache_path(path), _fallback_path(path)):
+        table = _open_copy(copy_path, path)
+        if table is not None:
+            return table
+    return None
+
+
+def _initial_types(path, compression):
+    """Column types inferred from the first INFER_BYTES, adjusted to pandas-like parsing:
+    date/time text stays text and all-missing (null) columns are float64"""
+    with pa.input_stream(str(path), compression=compression) as stream:
+        schema = pa_csv.open_csv(stream, read_options=pa_csv.ReadOptions(block_size=INFER_BYTES),
+                                 convert_options=pa_csv.ConvertOptions(strings_can_be_null=True)).schema
+    types = {}
+    for field in schema:
+        if pa.types.is_temporal(field.type):
+            types[field.name] = pa.string()
+        elif pa.types.is_null(field.type):
+            types[field.name] = pa.float64()
+        else:
+            types[field.name] = field.type
+    return types
+
+
+def _widen(data_type):
+    """Next type to try for a column whose values did not fit data_type"""
+    if pa.types.is_integer(data_type) or pa.types.is_boolean(data_type):
+        return pa.float64()
+    if pa.types.is_string(data_type) or pa.types.is_large_string(data_type):
+        return None
+    return pa.string()
+
+
+def _write(target, schema, batches):
+    # Unique per process and thread: the Flask servers may build the same copy from two requests at once
+    tmp_path = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with pa.OSFile(str(tmp_path), 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+        os.replace(tmp_path, target)
+    finally:
+        if tmp_path.exists():
+            os.remove(tmp_path)
+
+
+def _fits(column, data_type):
+    try:
+        pc.cast(column, data_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return False
+    return True
+
+
+def _scan_types(path, compression, types):
+    """Column types that fit every block: one pass reading the columns as text, widening each one that does not fit"""
+    types = dict(types)
+    convert = pa_csv.ConvertOptions(strings_can_be_null=True, column_types={name: pa.string() for name in types})
+    with pa.input_stream(str(path), compression=compression) as stream:
+        for batch in pa_csv.open_csv(stream, convert_options=convert):
+            for name, data_type in types.items():
+                column = batch.column(name)
+                while data_type is not None and not _fits(column, data_type):
+                    data_type = _widen(data_type)
+                types[name] = data_type if data_type is not None else pa.string()
+    return types
+
+
+def _stream_csv(path, compression, consume):
+    """consume(reader) on a streaming reader of the CSV, re-typed once if a later block does not fit its columns"""
+    types = _initial_types(path, compression)
+    for attempt in range(2):
+        convert = pa_csv.ConvertOptions(strings_can_be_null=True, column_types=types)
+        with pa.input_stream(str(path), compression=compression) as stream:
+            try:
+                return consume(pa_csv.open_csv(stream, convert_options=convert))
+            except pa.ArrowInvalid as e:
+                if attempt or _FAILED_COLUMN.search(str(e)) is None:
+                    raise
+        # A later block did not fit: find every column's final type in one pass, instead of one pass per column
+        types = _scan_types(path, compression, types)
+
+
+def _write_csv(path, compression, target, metadata):
+    """Stream a CSV into the cache copy at target"""
+    _stream_csv(path, compression, lambda reader: _write(target, reader.schema.with_metadata(metadata), reader))
+
+
+def _build(path, fmt):
+    """Write the cache copy of path (next to it, else in FALLBACK_DIR); returns it memory-mapped"""
+    metadata = _signature(path)
+    compression = table_io.CSV_COMPRESSION.get(fmt)
+    for target in (cache_path(path), _fallback_path(path)):
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if fmt in table_io.CSV_COMPRESSION:
+                _write_csv(path, compression, target, metadata)
+            else:
+                parquet = pq.ParquetFile(path)
+                _write(target, parquet.schema_arrow.with_metadata(metadata), parquet.iter_batches())
+        except OSError:
+            continue
+        # The copy just written, even if the source changed meanwhile (the next read rebuilds it)
+        table = _open_copy(target, path, check=False)
+        if table is not None:
+            return table
+    raise OSError(f"Could not write a columnar cache copy of {path}")
+
+
+def read_table(path, fmt, columns=None):
+    """Arrow table of a CSV ('csv', 'csv.gz', 'csv.zst') or 'parquet' file, via its cache copy (if ENABLED)"""
+    if not ENABLED:
+        if fmt not in table_io.CSV_COMPRESSION:
+            return pq.read_table(path, columns=columns)
+        table = _stream_csv(path, table_io.CSV_COMPRESSION[fmt], lambda reader: reader.read_all())
+    else:
+        table = _open_cached(path)
+        if table is None:
+            table = _build(path, fmt)
+    return table.select(columns) if columns is not None else table
@@ -0,0 +1,348 @@
+"""
+Cross-plant tag comparison (e.g. ANP2 vs NAP2).
+
+- Schema diff from headers only (table_io.read_columns; parquet footers
+  for plant folders): common tags, tags only in one plant
+- Both sides are streamed and resampled onto the same time grid
+  (resample.py floors to the interval, so the buckets line up) and paired
+  bucket by bucket, holding at most a chunk or two of each side
+- Per-tag difference statistics (bias, std, MAE, RMSE, max |diff|,
+  correlation) are accumulated chunk by chunk with mergeable moments,
+  vectorized over all tags of a chunk
+- The common tags are split into groups compared in worker processes;
+  each worker decodes only its group's columns
+
+Sources can be plant folders, CSV (plain or compressed), Parquet or
+Feather files. Usage:
+    python compare_plants.py "parquet_source/ANP2 for July - Nov 2025" "parquet_source/NAP2 for July - Nov 2025" --interval 10min
+"""
+
+import argparse
+import contextlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import parquet_search
+import plant_dataset
+import resample
+import table_io
+
+DEFAULT_INTERVAL = '10min'
+DEFAULT_WORKERS = os.cpu_count() or 1
+TIMESTAMP_COL = 'timestamp'
+
+
+# ===========================
+# SCHEMA DIFF
+# ===========================
+
+def _tag_name(column):
+    return column.lstrip('\ufeff')
+
+
+def schema_diff(columns_a, columns_b):
+    """Common tags (in a's order) and the tags only one side has; timestamps are left out"""
+    tags_a = [col for col in columns_a if _tag_name(col).lower() != TIMESTAMP_COL]
+    tags_b = [col for col in columns_b if _tag_name(col).lower() != TIMESTAMP_COL]
+    names_a = {_tag_name(col) for col in tags_a}
+    names_b = {_tag_name(col) for col in tags_b}
+    return {
+        'common': [col for col in tags_a if _tag_name(col) in names_b],
+        'only_a': [col for col in tags_a if _tag_name(col) not in names_b],
+        'only_b': [col for col in tags_b if _tag_name(col) not in names_a],
+    }
+
+
+def _timestamp_column(columns):
+    return next((col for col in columns if _tag_name(col).lower() == TIMESTAMP_COL), None)
+
+
+# ===========================
+# STREAMING ALIGNMENT
+# ===========================
+
+def _source_frames(path, tags, start=None, end=None):
+    """Time-ordered chunks of 'timestamp' (as naive UTC) plus tags, within [start, end].
+
+    Naive bounds are UTC (parquet_search.utc_bound), both for the plant
+    pre-filter and for the rows here, as in the plotter's endpoints.
+    """
+    header = table_io.read_columns(path)
+    timestamp_col = _timestamp_column(header)
+    if timestamp_col is None:
+        raise ValueError(f"No timestamp column in {path}")
+    names = {col: _tag_name(col) for col in header}
+    wanted = [timestamp_col] + [col for col in header if names[col] in set(tags)]
+    names[timestamp_col] = TIMESTAMP_COL
+    start, end = parquet_search.utc_bound(start), parquet_search.utc_bound(end)
+    if Path(path).is_dir():
+        # Plants skip files and row groups outside the window
+        frames = plant_dataset.PlantDataset(path).iter_frames(wanted, start, end)
+    else:
+        frames = table_io.iter_frames(path, wanted)
+    for frame in frames:
+        frame = frame.rename(columns=names)
+        timestamps = pd.to_datetime(frame[TIMESTAMP_COL])
+        reference = pd.Timestamp(0, tz=timestamps.dt.tz)  # any time in the data's timezone
+        keep = np.ones(len(frame), dtype=bool)
+        if start is not None:
+            keep &= (timestamps >= parquet_search.align_time(start, reference)).to_numpy()
+        if end is not None:
+            keep &= (timestamps <= parquet_search.align_time(end, reference)).to_numpy()
+        # Both plants are compared on one clock
+        if timestamps.dt.tz is not None:
+            timestamps = timestamps.dt.tz_convert('UTC').dt.tz_localize(None)
+        frame[TIMESTAMP_COL] = timestamps
+        frame = frame[keep]
+        if len(frame):
+            yield frame
+
+
+def _numeric(frame, tags):
+    """tags of frame as a float matrix (text values become NaN)"""
+    return np.column_stack([pd.to_numeric(frame[tag], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+                            for tag in tags]) if tags else np.empty((len(frame), 0))
+
+
+def paired_chunks(frames_a, frames_b, tags):
+    """Yield (a, b) float matrices of the grid buckets both resampled streams have.
+
+    Each side is buffered only until the other has caught up with it, so
+    memory stays at about one chunk per side.
+    """
+    iters = [iter(frames_a), iter(frames_b)]
+    buffers = [None, None]
+    done = [False, False]
+
+    def last(side):
+        buffer = buffers[side]
+        return buffer.index[-1] if buffer is not None and len(buffer) else None
+
+    while not all(done):
+        # Pull from the side that is behind (an empty buffer is furthest behind)
+        side = min((i for i in (0, 1) if not done[i]), key=lambda i: last(i) or pd.Timestamp.min)
+        chunk = next(iters[side], None)
+        if chunk is None:
+            done[side] = True
+        else:
+            chunk = chunk.set_index(TIMESTAMP_COL)
+            buffers[side] = chunk if buffers[side] is None else pd.concat([buffers[side], chunk])
+        if any(done[i] and last(i) is None for i in (0, 1)):
+            return  # one side has nothing left to pair with
+        if last(0) is None or last(1) is None:
+            continue
+        # Buckets up to the earlier end are final on both sides; a finished side is final throughout
+        open_ends = [last(i) for i in (0, 1) if not done[i]]
+        cutoff = min(open_ends) if open_ends else None
+        ready = [buffer if cutoff is None else buffer[buffer.index <= cutoff] for buffer in buffers]
+        buffers = [buffer.iloc[len(part):] for buffer, part in zip(buffers, ready)]
+        common = ready[0].index.intersection(ready[1].index)
+        if len(common):
+            yield _numeric(ready[0].loc[common], tags), _numeric(ready[1].loc[common], tags)
+
+
+# ===========================
+# DIFFERENCE STATISTICS
+# ===========================
+
+class DifferenceStats:
+    """Running per-tag statistics of a - b over paired samples (all tags updated at once)"""
+
+    _MOMENTS = ('mean_a', 'mean_b', 'mean_d', 'm2_a', 'm2_b', 'm2_d', 'c_ab')
+
+    def __init__(self, tags):
+        self.tags = list(tags)
+        zeros = lambda: np.zeros(len(self.tags))
+        self.n = zeros()
+        self.rows_a = zeros()
+        self.rows_b = zeros()
+        self.sum_abs = zeros()
+        self.max_abs = np.full(len(self.tags), np.nan)
+        for name in self._MOMENTS:
+            setattr(self, name, zeros())
+
+    def update(self, a, b):
+        """Add a chunk of paired rows: a and b are (rows, tags) float matrices"""
+        self.rows_a += np.isfinite(a).sum(axis=0)
+        self.rows_b += np.isfinite(b).sum(axis=0)
+        valid = np.isfinite(a) & np.isfinite(b)
+        n = valid.sum(axis=0).astype(float)
+        if not n.any():
+            return
+        a = np.where(valid, a, 0.0)
+        b = np.where(valid, b, 0.0)
+        d = a - b
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_a, mean_b, mean_d = a.sum(axis=0) / n, b.sum(axis=0) / n, d.sum(axis=0) / n
+        mean_a, mean_b, mean_d = (np.nan_to_num(m) for m in (mean_a, mean_b, mean_d))
+        da = np.where(valid, a - mean_a, 0.0)
+        db = np.where(valid, b - mean_b, 0.0)
+        dd = np.where(valid, d - mean_d, 0.0)
+        self.sum_abs += np.abs(d).sum(axis=0)
+        self.max_abs = np.fmax(self.max_abs, np.where(n > 0, np.abs(d).max(axis=0), np.nan))
+        self._merge(n, mean_a, mean_b, mean_d, (da * da).sum(axis=0), (db * db).sum(axis=0),
+                    (dd * dd).sum(axis=0), (da * db).sum(axis=0))
+
+    def _merge(self, n, mean_a, mean_b, mean_d, m2_a, m2_b, m2_d, c_ab):
+        """Combine the chunk's centred moments with the running ones (Chan et al.)"""
+        total = self.n + n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(total > 0, n / total, 0.0)
+            cross = np.where(total > 0, self.n * n / total, 0.0)
+        delta_a, delta_b, delta_d = mean_a - self.mean_a, mean_b - self.mean_b, mean_d - self.mean_d
+        self.mean_a = self.mean_a + delta_a * weight
+        self.mean_b = self.mean_b + delta_b * weight
+        self.mean_d = self.mean_d + delta_d * weight
+        self.m2_a = self.m2_a + m2_a + delta_a * delta_a * cross
+        self.m2_b = self.m2_b + m2_b + delta_b * delta_b * cross
+        self.m2_d = self.m2_d + m2_d + delta_d * delta_d * cross
+        self.c_ab = self.c_ab + c_ab + delta_a * delta_b * cross
+        self.n = total
+
+    def result(self):
+        """{tag: statistics}; values are None where there were no (or too few) pairs"""
+        def clean(values):
+            return [float(v) if np.isfinite(v) else None for v in values]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            paired = np.where(self.n > 0, 1.0, np.nan)
+            columns = {
+                'pairs': self.n.astype(int).tolist(),
+                'rows_a': self.rows_a.astype(int).tolist(),
+                'rows_b': self.rows_b.astype(int).tolist(),
+                'mean_a': clean(self.mean_a * paired),
+                'mean_b': clean(self.mean_b * paired),
+                'mean_diff': clean(self.mean_d * paired),
+                'std_diff': clean(np.where(self.n > 1, np.sqrt(self.m2_d / (self.n - 1)), np.nan)),
+                'mean_abs_diff': clean(self.sum_abs / self.n),
+                'rmse': clean(np.sqrt(self.mean_d ** 2 + self.m2_d / self.n)),
+                'max_abs_diff': clean(self.max_abs),
+                'correlation': clean(self.c_ab / np.sqrt(self.m2_a * self.m2_b)),
+            }
+        return {tag: {name: values[i] for name, values in columns.items()} for i, tag in enumerate(self.tags)}
+
+
+# ===========================
+# COMPARISON
+# ===========================
+
+def compare_tags(path_a, path_b, tags, interval=DEFAULT_INTERVAL, agg='mean', start=None, end=None):
+    """Difference statistics for tags (present in both sources), streamed on a shared grid"""
+    stats = DifferenceStats(tags)
+    options = {'interval': interval, 'agg': agg, 'timestamp_col': TIMESTAMP_COL}
+    grid_a = resample.resample_frames(_source_frames(path_a, tags, start, end), **options)
+    grid_b = resample.resample_frames(_source_frames(path_b, tags, start, end), **options)
+    for a, b in paired_chunks(grid_a, grid_b, tags):
+        stats.update(a, b)
+    return stats.result()
+
+
+def _prepare(path):
+    """Build shared caches once before the workers start (plant catalog, columnar copy)"""
+    if Path(path).is_dir():
+        plant_dataset.PlantDataset(path)
+    else:
+        fmt = table_io.detect_format(path)
+        if fmt in table_io.CSV_COMPRESSION or fmt == 'parquet':
+            table_io.columnar_cache.read_table(path, fmt)
+
+
+def _overlaps(path):
+    """[earlier, later] file names of a plant whose time ranges overlap (their late rows are dropped)"""
+    if not Path(path).is_dir():
+        return []
+    return plant_dataset.PlantDataset(path).describe()['overlaps']
+
+
+def compare(path_a, path_b, interval=DEFAULT_INTERVAL, agg='mean', tags=None, start=None, end=None,
+            workers=DEFAULT_WORKERS, pool=None):
+    """Schema diff plus per-tag difference statistics (a - b) of two plants or files.
+
+    tags restricts the comparison (default: every common tag). Naive start/end
+    bounds are UTC, so both sources are cut at the same instant. The tags are
+    split across up to workers processes, run in pool when given (an executor
+    that outlives the call, as in the web app) or else in one started here.
+    """
+    started = time.perf_counter()
+    resample.Resampler(interval, agg)  # report a bad interval or aggregation before any reading
+    schema = schema_diff(table_io.read_columns(path_a), table_io.read_columns(path_b))
+    common = [_tag_name(col) for col in schema['common']]
+    if tags is not None:
+        unknown = [tag for tag in tags if tag not in common]
+        if unknown:
+            raise ValueError(f"Not in both sources: {', '.join(unknown)}")
+        common = [tag for tag in common if tag in set(tags)]
+    for path in (path_a, path_b):
+        _prepare(path)
+
+    workers = max(1, min(workers, len(common)))
+    groups = [common[i::workers] for i in range(workers)]
+    results = {}
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) if pool is None else contextlib.nullcontext(pool) as executor:
+            futures = [executor.submit(compare_tags, path_a, path_b, group, interval, agg, start, end) for group in groups]
+            for future in futures:
+                results.update(future.result())
+    elif common:
+        results = compare_tags(path_a, path_b, common, interval, agg, start, end)
+    return {
+        'a': table_io.data_stem(path_a),
+        'b': table_io.data_stem(path_b),
+        'interval': interval,
+        'agg': agg,
+        'schema': schema,
+        'overlaps': {'a': _overlaps(path_a), 'b': _overlaps(path_b)},
+        'tags': {tag: results[tag] for tag in common},
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+def to_frame(comparison):
+    """The per-tag statistics of a comparison as a DataFrame, one row per tag"""
+    df = pd.DataFrame.from_dict(comparison['tags'], orient='index')
+    df.index.name = 'tag'
+    return df
+
+
+def main():
+    plants = plant_dataset.find_plants('parquet_source')
+    p = argparse.ArgumentParser(description='Compare the common tags of two plants (or table files)')
+    p.add_argument('a', nargs='?', default=str(plants[0]) if len(plants) > 1 else None, help='First plant folder or file')
+    p.add_argument('b', nargs='?', default=str(plants[1]) if len(plants) > 1 else None, help='Second plant folder or file')
+    p.add_argument('--interval', default=DEFAULT_INTERVAL, help=f'Shared grid interval (default: {DEFAULT_INTERVAL})')
+    p.add_argument('--agg', default='mean', choices=resample.AGGREGATIONS, help='Aggregation per bucket (default: mean)')
+    p.add_argument('--tags', nargs='*', default=None, help='Only these tags (default: all common tags)')
+    p.add_argument('--start', default=None, help='Start of the time window (naive = UTC)')
+    p.add_argument('--end', default=None, help='End of the time window (naive = UTC)')
+    p.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help=f'Worker processes (default: {DEFAULT_WORKERS})')
+    p.add_argument('--output', default=None, help='Also write the per-tag statistics to this CSV file')
+    args = p.parse_args()
+    if args.a is None or args.b is None:
+        p.error('give two plant folders or files (parquet_source has fewer than two plants)')
+
+    comparison = compare(args.a, args.b, args.interval, args.agg, args.tags, args.start, args.end, args.workers)
+    schema = comparison['schema']
+    print(f"{comparison['a']} vs {comparison['b']}: {len(schema['common'])} common tags, "
+          f"{len(schema['only_a'])} only in {comparison['a']}, {len(schema['only_b'])} only in {comparison['b']}")
+    for side in ('a', 'b'):
+        if schema[f'only_{side}']:
+            print(f"  Only in {comparison[side]}: {', '.join(schema[f'only_{side}'])}")
+        for earlier, later in comparison['overlaps'][side]:
+            print(f"  Warning: {later} overlaps {earlier} in {comparison[side]}; rows out of time order are dropped")
+    df = to_frame(comparison)
+    if not df.empty:
+        with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200):
+            print(df[['pairs', 'mean_a', 'mean_b', 'mean_diff', 'std_diff', 'rmse', 'max_abs_diff', 'correlation']])
+    print(f"Compared {len(df)} tags on a {args.interval} grid in {comparison['seconds']:.2f}s")
+    if args.output:
+        df.to_csv(args.output, encoding='utf-8')
+        print(f"Saved: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Lagged (cross-) correlation between tag time series.
+
+cross_correlations computes the Pearson correlation of x[t] and y[t + lag]
+for every lag in [-max_lag, max_lag] and every requested pair at once:
+- the six sums Pearson needs per lag (overlap count, sum x, sum y, sum x^2,
+  sum y^2, sum xy) are cross-correlations, computed with real FFTs
+- missing values are masked per pair, so each lag uses exactly the rows
+  where both tags are present (same as pandas pairwise corr at lag 0)
+- each tag's spectra are computed once and shared by all its pairs
+
+A positive peak lag means y follows x (y responds lag samples later).
+Samples are assumed evenly spaced; callers convert lags to time units.
+
+CorrelationAccumulator builds a zero-lag correlation matrix chunk by
+chunk (pairwise-complete, like DataFrame.corr) from a few matrix products
+per chunk, so files can be streamed instead of loaded whole.
+"""
+
+import numpy as np
+
+# Fewest overlapping samples for a lag's coefficient to be reported
+MIN_PERIODS = 3
+
+
+def _fft_size(n, max_lag):
+    """Power of two long enough that lags up to max_lag do not wrap around"""
+    return 1 << int(n + max_lag - 1).bit_length()
+
+
+def _spectra(values, nfft):
+    """FFTs of the centred values, their squares and the validity mask"""
+    values = np.asarray(values, dtype=float)
+    valid = np.isfinite(values)
+    # Centring keeps the sums small so the per-lag variance does not cancel badly
+    mean = values[valid].mean() if valid.any() else 0.0
+    centred = np.where(valid, values - mean, 0.0)
+    return {
+        'x': np.fft.rfft(centred, nfft),
+        'xx': np.fft.rfft(centred * centred, nfft),
+        'm': np.fft.rfft(valid.astype(float), nfft),
+    }
+
+
+def _xcorr(fa, fb, nfft, max_lag):
+    """sum_t a[t] * b[t + lag] for lag = -max_lag..max_lag, from the spectra of a and b"""
+    full = np.fft.irfft(np.conj(fa) * fb, nfft)
+    return np.concatenate([full[nfft - max_lag:], full[:max_lag + 1]]) if max_lag else full[:1]
+
+
+def _lagged_pearson(sx, sy, nfft, max_lag, min_periods):
+    n = np.rint(_xcorr(sx['m'], sy['m'], nfft, max_lag))
+    sum_x = _xcorr(sx['x'], sy['m'], nfft, max_lag)
+    sum_y = _xcorr(sx['m'], sy['x'], nfft, max_lag)
+    sum_xx = _xcorr(sx['xx'], sy['m'], nfft, max_lag)
+    sum_yy = _xcorr(sx['m'], sy['xx'], nfft, max_lag)
+    sum_xy = _xcorr(sx['x'], sy['x'], nfft, max_lag)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sum_xy - sum_x * sum_y / n
+        var_x = sum_xx - sum_x * sum_x / n
+        var_y = sum_yy - sum_y * sum_y / n
+        r = cov / np.sqrt(var_x * var_y)
+    r[(n < min_periods) | ~(var_x > 0) | ~(var_y > 0)] = np.nan
+    return np.clip(r, -1.0, 1.0)
+
+
+def cross_correlations(columns, pairs, max_lag, min_periods=MIN_PERIODS):
+    """Lagged correlation curves for several tag pairs.
+
+    columns maps tag name -> 1-D array (all the same length, NaN = missing),
+    pairs is a list of (x_name, y_name). Returns (lags, results) where lags
+    is the array -max_lag..max_lag and results holds one dict per pair:
+    x, y, r (coefficient per lag), peak_lag and peak_r (largest |r|; None
+    when no lag has enough overlap).
+    """
+    n = len(next(iter(columns.values()))) if columns else 0
+    max_lag = int(max(0, min(max_lag, n - 1)))
+    lags = np.arange(-max_lag, max_lag + 1)
+    nfft = _fft_size(max(n, 1), max_lag)
+    spectra = {}
+    results = []
+    for x_name, y_name in pairs:
+        for name in (x_name, y_name):
+            if name not in spectra:
+                spectra[name] = _spectra(columns[name], nfft)
+        r = _lagged_pearson(spectra[x_name], spectra[y_name], nfft, max_lag, min_periods)
+        if np.isnan(r).all():
+            peak_lag, peak_r = None, None
+        else:
+            peak = int(np.nanargmax(np.abs(r)))
+            peak_lag, peak_r = int(lags[peak]), float(r[peak])
+        results.append({'x': x_name, 'y': y_name, 'r': r, 'peak_lag': peak_lag, 'peak_r': peak_r})
+    return lags, results
+
+
+class CorrelationAccumulator:
+    """Pairwise-complete Pearson correlation matrix accumulated over row chunks.
+
+    Per chunk, with Z the values (shifted by the first chunk's column means
+    and zero where missing) and M the validity mask, it adds M'M (pair
+    counts), Z'M (sums), (Z*Z)'M (sums of squares) and Z'Z (cross
+    products). Chunks without missing values need only Z'Z.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        p = len(self.columns)
+        self.rows = 0
+        self.shift = None
+        self.n = np.zeros((p, p))
+        self.sum = np.zeros((p, p))      # [i, j]: sum of column i over rows where j is present
+        self.sum_sq = np.zeros((p, p))
+        self.cross = np.zeros((p, p))
+
+    def update(self, frame):
+        """Add a DataFrame chunk; missing or non-numeric columns count as missing values"""
+        frame = frame.select_dtypes(include=[np.number]).reindex(columns=self.columns)
+        values = frame.to_numpy(dtype=float, na_value=np.nan)
+        if len(values) == 0:
+            return
+        if self.shift is None:
+            with np.errstate(invalid='ignore'):
+                counts = np.isfinite(values).sum(axis=0)
+                self.shift = np.where(counts > 0, np.nansum(values, axis=0) / np.maximum(counts, 1), 0.0)
+        z = values - self.shift
+        valid = np.isfinite(z)
+        self.rows += len(z)
+        if valid.all():
+            col_sum = z.sum(axis=0)
+            self.n += len(z)
+            self.sum += col_sum[:, None]
+            self.sum_sq += (z * z).sum(axis=0)[:, None]
+        else:
+            z = np.where(valid, z, 0.0)
+            mask = valid.astype(float)
+            self.n += mask.T @ mask
+            self.sum += z.T @ mask
+            self.sum_sq += (z * z).T @ mask
+        self.cross += z.T @ z
+
+    def result(self, min_periods=MIN_PERIODS):
+        """(matrix, counts): correlation matrix and the number of rows behind each entry"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = self.cross - self.sum * self.sum.T / self.n
+            var = self.sum_sq - self.sum * self.sum / self.n
+            matrix = cov / np.sqrt(var * var.T)
+        matrix[(self.n < min_periods) | ~(var > 0) | ~(var.T > 0)] = np.nan
+        matrix = np.clip(matrix, -1.0, 1.0)
+        # Exact ones on the diagonal wherever the column has any variance
+        diagonal = np.isfinite(np.diag(matrix))
+        matrix[np.diag_indices_from(matrix)] = np.where(diagonal, 1.0, np.nan)
+        return matrix, self.n.astype(np.int64)
+
+
+def correlation_matrix(chunks, columns, min_periods=MIN_PERIODS):
+    """Correlation matrix of columns over an iterable of DataFrame chunks; returns (matrix, counts, rows)"""
+    accumulator = CorrelationAccumulator(columns)
+    for chunk in chunks:
+        accumulator.update(chunk)
+    matrix, counts = accumulator.result(min_periods)
+    return matrix, counts, accumulator.rows
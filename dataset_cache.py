@@ -0,0 +1,133 @@
+"""
+Bounded in-memory cache of loaded datasets for the web tools.
+
+- Keyed by file path; an entry is only reused while the file's mtime and
+  size (or a custom signature, e.g. for a folder of files) are unchanged,
+  so edited files are reloaded automatically
+- Least-recently-used entries are evicted once the total in-memory size
+  (DataFrame.memory_usage(deep=True)) exceeds the memory budget
+- Hits, misses and evictions are counted for a stats endpoint
+- Thread safe: Flask serves requests from several threads, and two tabs
+  asking for the same file wait for a single load
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class DatasetCache:
+    def __init__(self, loader, max_bytes, signature=None):
+        """loader(path) -> DataFrame; max_bytes is the memory budget for all entries.
+
+        signature(path) returns what must stay equal for an entry to be reused
+        (default: the file's mtime and size).
+        """
+        self.loader = loader
+        if signature is not None:
+            self._signature = signature
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # path -> entry dict, least recently used first
+        self._lock = threading.Lock()
+        self._loading = {}  # path -> Lock held while that path loads
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, path):
+        """Return the DataFrame for path, loading it on a miss.
+
+        Callers share the returned frame and must not modify it in place.
+        """
+        path = str(path)
+        signature = self._signature(path)
+        with self._lock:
+            entry = self._lookup(path, signature)
+            if entry is not None:
+                return entry['df']
+            load_lock = self._loading.setdefault(path, threading.Lock())
+
+        with load_lock:
+            # Another request may have finished loading while we waited
+            with self._lock:
+                entry = self._lookup(path, signature)
+                if entry is not None:
+                    return entry['df']
+                self.misses += 1
+            try:
+                df = self.loader(path)
+                nbytes = int(df.memory_usage(deep=True).sum())
+                with self._lock:
+                    self._entries[path] = {
+                        'df': df,
+                        'signature': signature,
+                        'bytes': nbytes,
+                        'loaded_at': time.time(),
+                        'last_used': time.time(),
+                    }
+                    self._evict(keep=path)
+            finally:
+                # Also after a failed load, so a file that cannot be read does not leave its lock behind
+                with self._lock:
+                    if self._loading.get(path) is load_lock:
+                        del self._loading[path]
+            return df
+
+    def peek(self, path):
+        """The cached DataFrame for path if it is loaded and current, else None (never loads)"""
+        path = str(path)
+        try:
+            signature = self._signature(path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._lookup(path, signature)
+            return entry['df'] if entry is not None else None
+
+    def _lookup(self, path, signature):
+        """Current entry for path (marking it most recently used), dropping a stale one"""
+        entry = self._entries.get(path)
+        if entry is None:
+            return None
+        if entry['signature'] != signature:
+            del self._entries[path]
+            return None
+        self._entries.move_to_end(path)
+        entry['last_used'] = time.time()
+        self.hits += 1
+        return entry
+
+    def _evict(self, keep):
+        """Drop least recently used entries until under budget (never the one just loaded)"""
+        total = sum(entry['bytes'] for entry in self._entries.values())
+        for path in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            total -= self._entries.pop(path)['bytes']
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            entries = [{
+                'dataset_id': path,
+                'size_mb': round(entry['bytes'] / (1024 ** 2), 2),
+                'rows': len(entry['df']),
+                'loaded_at': entry['loaded_at'],
+                'last_used': entry['last_used'],
+            } for path, entry in reversed(self._entries.items())]
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': entries,
+                'total_mb': round(sum(entry['bytes'] for entry in self._entries.values()) / (1024 ** 2), 2),
+                'budget_mb': round(self.max_bytes / (1024 ** 2), 2),
+            }
@@ -0,0 +1,218 @@
+"""
+Derived tags: columns computed from other tags by expressions kept in
+derived_tags.json, e.g.
+
+    "Total_NH3_Flow": {"expression": "`95FI003A/PV` + `95FI003B/PV` + `95FI003C/PV`"}
+
+- Tag names are written in backticks; plain names refer to numeric
+  constants or the functions listed in FUNCTIONS
+- Derived tags may use other derived tags (evaluated in dependency order,
+  cycles are rejected)
+- Expressions are parsed and checked against a whitelist once, then
+  evaluated vectorized per chunk with numexpr when it is installed,
+  otherwise NumPy. Intermediate derived tags stay as arrays and are never
+  added to a DataFrame unless they were requested
+
+The converter (--derived), the filter web app and the plotter all read the
+same definitions file, so derived tags behave like raw tags everywhere.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+DEFINITIONS_FILE = Path(__file__).with_name("derived_tags.json")
+
+# Functions allowed in expressions (all supported by numexpr and NumPy)
+FUNCTIONS = {
+    'abs': np.abs,
+    'sqrt': np.sqrt,
+    'exp': np.exp,
+    'log': np.log,
+    'log10': np.log10,
+    'where': np.where,
+}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.USub, ast.UAdd, ast.Invert,
+    ast.BitAnd, ast.BitOr, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+)
+
+_TAG_PATTERN = re.compile(r"`([^`]+)`")
+
+
+class DerivedTag:
+    """One parsed definition: name, expression and the tags it reads"""
+
+    def __init__(self, name, expression, units=None, description=None):
+        self.name = name
+        self.expression = expression
+        self.units = units
+        self.description = description
+        # Backticked tag names become plain identifiers t0, t1, ... for evaluation
+        self.inputs = list(dict.fromkeys(_TAG_PATTERN.findall(expression)))
+        aliases = {tag: f"t{i}" for i, tag in enumerate(self.inputs)}
+        self.source = _TAG_PATTERN.sub(lambda match: aliases[match.group(1)], expression)
+        self._aliases = aliases
+        self._check()
+        self._code = compile(self.source, f"<derived {name}>", 'eval')
+
+    def _check(self):
+        try:
+            tree = ast.parse(self.source, mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"Derived tag {self.name}: invalid expression {self.expression!r} ({e.msg})")
+        aliases = set(self._aliases.values())
+        for node in ast.walk(tree):
+            if not isinstance(node, _ALLOWED_NODES):
+                raise ValueError(f"Derived tag {self.name}: {type(node).__name__} is not allowed in expressions")
+            if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS):
+                raise ValueError(f"Derived tag {self.name}: only {', '.join(FUNCTIONS)} can be called")
+            if isinstance(node, ast.Name) and node.id not in aliases and node.id not in FUNCTIONS:
+                raise ValueError(f"Derived tag {self.name}: unknown name {node.id!r} (put tag names in backticks)")
+            if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+                raise ValueError(f"Derived tag {self.name}: only numeric constants are allowed")
+
+    def evaluate(self, values):
+        """Evaluate against {tag: float array}; returns a float64 array"""
+        local = {alias: values[tag] for tag, alias in self._aliases.items()}
+        if numexpr is not None:
+            return np.asarray(numexpr.evaluate(self.source, local_dict=local), dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.asarray(eval(self._code, {'__builtins__': {}, **FUNCTIONS}, local), dtype=float)
+
+    def to_dict(self):
+        return {'name': self.name, 'expression': self.expression, 'units': self.units,
+                'description': self.description, 'inputs': self.inputs}
+
+
+_loaded = {}  # path -> (signature, definitions)
+
+
+def load_definitions(path=DEFINITIONS_FILE):
+    """{name: DerivedTag} from a definitions file ({} if it does not exist).
+
+    Parsed once and reused until the file changes.
+    """
+    path = Path(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return {}
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _loaded.get(str(path))
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+    definitions = {}
+    for name, spec in raw.items():
+        if isinstance(spec, str):
+            spec = {'expression': spec}
+        definitions[name] = DerivedTag(name, spec['expression'], spec.get('units'), spec.get('description'))
+    _evaluation_order(definitions, list(definitions))  # reject cycles up front
+    _loaded[str(path)] = (signature, definitions)
+    return definitions
+
+
+def definitions_hash(definitions):
+    """Short digest of the expressions, to notice when a formula changes"""
+    expressions = {name: tag.expression for name, tag in sorted(definitions.items())}
+    return hashlib.sha256(json.dumps(expressions, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def _evaluation_order(definitions, names):
+    """Requested derived tags plus the derived tags they depend on, dependencies first"""
+    order = []
+    state = {}  # name -> 'visiting' | 'done'
+
+    def visit(name, chain):
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise ValueError(f"Derived tags depend on each other: {' -> '.join(chain + [name])}")
+        state[name] = 'visiting'
+        for tag in definitions[name].inputs:
+            if tag in definitions:
+                visit(tag, chain + [name])
+        state[name] = 'done'
+        order.append(name)
+
+    for name in names:
+        visit(name, [])
+    return order
+
+
+def required_columns(names, definitions):
+    """Raw columns needed to compute names (raw names in the list are passed through)"""
+    needed = []
+    for name in names:
+        if name not in definitions:
+            needed.append(name)
+    for name in _evaluation_order(definitions, [name for name in names if name in definitions]):
+        needed.extend(tag for tag in definitions[name].inputs if tag not in definitions)
+    return list(dict.fromkeys(needed))
+
+
+def available(columns, definitions):
+    """Derived tags that can be computed from the given raw columns, in definition order"""
+    columns = set(columns)
+    ready = []
+    for name in definitions:
+        if name in columns:
+            continue  # a real column of that name wins
+        try:
+            raw = required_columns([name], definitions)
+        except ValueError:
+            continue
+        if all(tag in columns for tag in raw):
+            ready.append(name)
+    return ready
+
+
+def evaluate(frame, names, definitions):
+    """{name: array} for the requested derived tags.
+
+    frame is a DataFrame chunk or a {tag: NumPy array} mapping; text values
+    in input columns count as missing.
+    """
+    values = {}
+
+    def column(tag):
+        if tag not in values:
+            series = frame[tag]
+            if isinstance(series, np.ndarray):
+                if series.dtype.kind not in 'fiub':
+                    series = pd.to_numeric(series, errors='coerce')
+                values[tag] = np.asarray(series, dtype=float)
+            else:
+                if not pd.api.types.is_numeric_dtype(series):
+                    series = pd.to_numeric(series, errors='coerce')
+                values[tag] = series.to_numpy(dtype=float, na_value=np.nan)
+        return values[tag]
+
+    for name in _evaluation_order(definitions, names):
+        tag = definitions[name]
+        values[name] = tag.evaluate({source: values[source] if source in definitions else column(source)
+                                     for source in tag.inputs})
+    return {name: values[name] for name in names}
+
+
+def add_derived(frame, names, definitions):
+    """frame with the requested derived tags appended as columns (a new frame)"""
+    names = [name for name in names if name in definitions and name not in frame.columns]
+    if not names:
+        return frame
+    return frame.assign(**evaluate(frame, names, definitions))
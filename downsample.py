@@ -0,0 +1,91 @@
+"""
+Downsampling of long time series for plotting.
+
+- minmax: per bucket keep the minimum and maximum sample, so spikes survive
+- lttb:   Largest-Triangle-Three-Buckets, keeps the visual shape of the line
+
+Both return row indices rather than values, so several series can share one
+x axis: select_indices takes the union of the indices chosen for each series.
+"""
+
+import numpy as np
+
+METHODS = ('minmax', 'lttb', 'none')
+
+
+def minmax_indices(y, n_buckets):
+    """Indices of the min and max of y in each of n_buckets equal-width buckets.
+
+    NaNs are ignored; all-NaN buckets contribute nothing. First and last
+    valid samples are always kept so the line spans the full range.
+    """
+    n = len(y)
+    if n_buckets <= 0 or n <= 2 * n_buckets:
+        return np.flatnonzero(~np.isnan(y))
+    size = -(-n // n_buckets)  # ceil division
+    padded = n_buckets * size
+    valid = ~np.isnan(y)
+    lows = np.full(padded, np.inf)
+    lows[:n] = np.where(valid, y, np.inf)
+    highs = np.full(padded, -np.inf)
+    highs[:n] = np.where(valid, y, -np.inf)
+    offsets = np.arange(n_buckets) * size
+    arg_min = lows.reshape(n_buckets, size).argmin(axis=1) + offsets
+    arg_max = highs.reshape(n_buckets, size).argmax(axis=1) + offsets
+    picked = np.concatenate([arg_min[np.isfinite(lows[arg_min])], arg_max[np.isfinite(highs[arg_max])]])
+    valid_idx = np.flatnonzero(valid)
+    if len(valid_idx):
+        picked = np.concatenate([picked, valid_idx[[0, -1]]])
+    return np.unique(picked)
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets selection of n_out points from (x, y).
+
+    NaN samples are skipped. x must be numeric and ascending.
+    """
+    valid_idx = np.flatnonzero(~np.isnan(y))
+    n = len(valid_idx)
+    if n_out >= n or n_out < 3:
+        return valid_idx
+    xv = np.asarray(x, dtype=float)[valid_idx]
+    yv = np.asarray(y, dtype=float)[valid_idx]
+    # Bucket edges over the interior points (first and last are always kept)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    picked = np.empty(n_out, dtype=np.int64)
+    picked[0] = 0
+    picked[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        if i + 2 < len(edges):
+            nxt = slice(edges[i + 1], edges[i + 2])
+            avg_x, avg_y = xv[nxt].mean(), yv[nxt].mean()
+        else:
+            avg_x, avg_y = xv[-1], yv[-1]
+        bx, by = xv[start:stop], yv[start:stop]
+        area = np.abs((xv[a] - avg_x) * (by - yv[a]) - (xv[a] - bx) * (avg_y - yv[a]))
+        a = start + int(area.argmax())
+        picked[i + 1] = a
+    return valid_idx[picked]
+
+
+def select_indices(x, columns, max_points, method='minmax'):
+    """Sorted row indices to plot for all columns so each keeps ~max_points points.
+
+    x is the numeric x axis (e.g. epoch ns), columns a list of float arrays.
+    Returns every row when the data already fits or method is 'none'.
+    """
+    n = len(x)
+    if method == 'none' or n <= max_points:
+        return np.arange(n)
+    if method == 'minmax':
+        chosen = [minmax_indices(y, max(1, max_points // 2)) for y in columns]
+    elif method == 'lttb':
+        chosen = [lttb_indices(x, y, max_points) for y in columns]
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    if not chosen:
+        return np.arange(0)
+    return np.unique(np.concatenate(chosen))
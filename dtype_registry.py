@@ -0,0 +1,185 @@
+"""
+Compact in-memory dtypes for loaded historian data.
+
+A sidecar "<file>.dtypes.json" records, per column, the smallest dtype
+that holds its values without loss:
+- for Parquet/Feather sources and plant folders, the float and integer
+  widths of the file's schema (float32 stays float32, float64 is kept)
+- for CSV, float32 when every value's text is the shortest repr of a
+  32-bit float, as pandas and the converter's CSV writer print them (PI
+  archives store most points that way), so the text reads back unchanged;
+  int8/16/32 for integer columns that fit
+- category for status/text tags with few distinct values
+- datetime64 for the timestamp column, parsed once at load (tools that
+  write the rows back out load it unparsed, so its text is kept)
+
+The registry comes from the first full load of a file (no extra scan).
+Later loads convert those columns in Arrow before they reach pandas
+(table_io.read_dataframe), so they are never held as float64 or Python
+strings; loaded frames take roughly half the memory or less. A column
+whose values no longer fit its registered dtype is loaded as it is.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import table_io
+
+SIDECAR_SUFFIX = '.dtypes.json'
+REGISTRY_VERSION = 2
+
+# Distinct values checked per step when testing CSV text for float32 (stops at the first misfit)
+FLOAT32_CHECK_CHUNK = 100_000
+
+# Text columns become categoricals when they have at most this many distinct values...
+MAX_CATEGORIES = 10_000
+# ...and the distinct values are at most this fraction of the rows
+MAX_CATEGORY_RATIO = 0.5
+
+
+def _is_timestamp(name, series):
+    return pd.api.types.is_datetime64_any_dtype(series) or name.lstrip('\ufeff').lower() == 'timestamp'
+
+
+def _float32_text(values):
+    """True if every finite value reads back from the shortest repr of its float32 (CSV text written from float32)"""
+    distinct = np.unique(values[np.isfinite(values)])
+    for i in range(0, len(distinct), FLOAT32_CHECK_CHUNK):
+        chunk = distinct[i:i + FLOAT32_CHECK_CHUNK]
+        with np.errstate(over='ignore'):
+            narrow = chunk.astype(np.float32)
+        if not np.array_equal(narrow.astype(str).astype(float), chunk):
+            return False
+    return True
+
+
+def infer_dtypes(df, from_text=False):
+    """{column: dtype name} for the compact representation of a loaded frame.
+
+    from_text: the frame was parsed from CSV, so number widths come from the
+    values; otherwise they are the source schema's, as loaded.
+    """
+    dtypes = {}
+    for name in df.columns:
+        series = df[name]
+        if _is_timestamp(name, series):
+            dtypes[name] = 'datetime64'
+        elif pd.api.types.is_bool_dtype(series):
+            dtypes[name] = 'bool'
+        elif not from_text and pd.api.types.is_numeric_dtype(series):
+            dtypes[name] = str(series.dtype)
+        elif pd.api.types.is_integer_dtype(series):
+            values = series.to_numpy()
+            lo, hi = (int(values.min()), int(values.max())) if len(values) else (0, 0)
+            dtypes[name] = next(t for t in ('int8', 'int16', 'int32', 'int64')
+                                if np.iinfo(t).min <= lo and hi <= np.iinfo(t).max)
+        elif pd.api.types.is_float_dtype(series):
+            values = series.to_numpy(dtype=float, na_value=np.nan)
+            dtypes[name] = 'float32' if _float32_text(values) else 'float64'
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            dtypes[name] = 'category'
+        else:
+            distinct = series.nunique()
+            few = distinct <= MAX_CATEGORIES and distinct <= MAX_CATEGORY_RATIO * max(len(series), 1)
+            dtypes[name] = 'category' if few else 'object'
+    return dtypes
+
+
+def compact(df, dtypes):
+    """df with its columns converted to the registry's dtypes (columns it does not list are kept)"""
+    converted = {}
+    for name, dtype in dtypes.items():
+        if name not in df.columns or dtype == 'object':
+            continue
+        series = df[name]
+        try:
+            if dtype == 'datetime64':
+                if not pd.api.types.is_datetime64_any_dtype(series):
+                    converted[name] = pd.to_datetime(series)
+            elif dtype == 'category':
+                if not isinstance(series.dtype, pd.CategoricalDtype):
+                    converted[name] = series.astype('category')
+            elif series.dtype != dtype:
+                converted[name] = series.astype(dtype)
+        except (TypeError, ValueError):
+            continue  # the file no longer matches the registry for this column; keep it as read
+    return df.assign(**converted) if converted else df
+
+
+def _parse_hints(dtypes, columns=None):
+    """dtype= argument for table_io.read_dataframe (timestamps are converted after loading)"""
+    return {name: dtype for name, dtype in dtypes.items()
+            if dtype not in ('datetime64', 'object') and (columns is None or name in columns)}
+
+
+def memory_mb(df):
+    """In-memory size of a DataFrame in MB"""
+    return df.memory_usage(deep=True).sum() / (1024 ** 2)
+
+
+# ===========================
+# SIDECAR FILES
+# ===========================
+
+def sidecar_path(path):
+    return Path(str(path) + SIDECAR_SUFFIX)
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def write_dtypes(path, dtypes):
+    """Persist a registry next to path, tagged with path's current size/mtime"""
+    content = {'version': REGISTRY_VERSION, 'source': _signature(path), 'columns': dtypes}
+    target = sidecar_path(path)
+    # Unique per process and thread: the Flask servers may write the same sidecar from two requests at once
+    tmp_path = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(content, f)
+    os.replace(tmp_path, target)
+
+
+def load_dtypes(path):
+    """path's registry, or None if it is missing or the file has changed since"""
+    try:
+        with open(sidecar_path(path), 'r', encoding='utf-8') as f:
+            content = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if content.get('version') != REGISTRY_VERSION or content.get('source') != _signature(path):
+        return None
+    return content['columns']
+
+
+def read_dataframe(path, columns=None, parse_dates=True):
+    """Load a table file in its compact dtypes (see table_io.read_dataframe).
+
+    The first load of a file reads it with default dtypes, builds the
+    registry from the result and saves it; later loads parse straight into
+    the compact dtypes. A plant folder's files can change independently, so
+    its dtypes are inferred on every load instead of stored. With
+    parse_dates=False the timestamp column is left as read (CSV text as
+    written), for tools that write the rows back out.
+    """
+    if Path(path).is_dir():
+        df = table_io.read_dataframe(path, columns)
+        dtypes = infer_dtypes(df)
+    else:
+        dtypes = load_dtypes(path)
+        if dtypes is None:
+            df = table_io.read_dataframe(path, columns)
+            dtypes = infer_dtypes(df, from_text=table_io.detect_format(path) in table_io.CSV_COMPRESSION)
+            if columns is None:
+                write_dtypes(path, dtypes)
+        else:
+            df = table_io.read_dataframe(path, columns, dtype=_parse_hints(dtypes, columns))
+    if not parse_dates:
+        dtypes = {name: dtype for name, dtype in dtypes.items() if dtype != 'datetime64'}
+    return compact(df, dtypes)
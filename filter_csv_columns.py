@@ -1,21 +1,23 @@
 ﻿import os
-import pandas as pd
 from pathlib import Path
-from datetime import datetime
+
+import table_io
+import log_writer
+import dtype_registry
+import plant_dataset
 
 # Configuration
 BASE_DIR = Path(r"c:\Users\EvanJacobs\Documents\OmniaOffline\Data Cleaning")
 CSV_OUTPUT = BASE_DIR / "csv_output"
+PARQUET_SOURCE = BASE_DIR / "parquet_source"
 FILTERED_OUTPUT = BASE_DIR / "csv_filtered"
 ERROR_LOG = BASE_DIR / "error_log.txt"
 
+logger = log_writer.get_logger(ERROR_LOG, source="filter_csv_columns")
+
 def log_to_file(message):
-    """Log to error_log.txt"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    log_line = f"[{timestamp}] {message}"
-    print(log_line)
-    with open(ERROR_LOG, 'a', encoding='utf-8') as f:
-        f.write(log_line + "\n")
+    """Log to error_log.txt (queued; written in batches by a background thread)"""
+    logger.log(message)
 
 class CSVColumnFilter:
     def __init__(self):
@@ -26,14 +28,16 @@ class CSVColumnFilter:
         log_to_file("[INFO] CSV Column Filter initialized")
     
     def find_csv_files(self):
-        """Find all CSV files in csv_output folder"""
+        """Find all CSV files (or other table_io formats) in csv_output folder,
+        plus the plant folders in parquet_source (each read as one dataset)"""
         try:
-            csv_files = list(CSV_OUTPUT.glob("**/*.csv"))
-            if not csv_files:
+            csv_files = table_io.find_data_files(CSV_OUTPUT)
+            plants = plant_dataset.find_plants(PARQUET_SOURCE)
+            if not csv_files and not plants:
                 log_to_file("[ERROR] No CSV files found in csv_output/")
                 return False
             
-            self.csv_files = sorted(csv_files)
+            self.csv_files = plants + sorted(csv_files)
             log_to_file(f"[INFO] Found {len(self.csv_files)} CSV file(s)")
             return True
         except Exception as e:
@@ -47,8 +51,11 @@ class CSVColumnFilter:
         print("="*60)
         
         for i, csv_file in enumerate(self.csv_files, 1):
-            size_mb = csv_file.stat().st_size / (1024 * 1024)
-            print(f"{i}. {csv_file.parent.name}/{csv_file.name} ({size_mb:.1f} MB)")
+            size_mb = table_io.data_size(csv_file) / (1024 * 1024)
+            if csv_file.is_dir():
+                print(f"{i}. {csv_file.name} (all Parquet files, {size_mb:.1f} MB)")
+            else:
+                print(f"{i}. {csv_file.parent.name}/{csv_file.name} ({size_mb:.1f} MB)")
         
         while True:
             try:
@@ -71,8 +78,9 @@ class CSVColumnFilter:
         """Load the selected CSV file"""
         try:
             print(f"\nLoading {self.selected_file.name}...")
-            self.df = pd.read_csv(self.selected_file, encoding='utf-8')
-            log_to_file(f"[INFO] Loaded CSV: {self.selected_file.name} ({len(self.df)} rows, {len(self.df.columns)} columns)")
+            # Timestamps stay as written: the filtered CSV reproduces the source's text
+            self.df = dtype_registry.read_dataframe(self.selected_file, parse_dates=False)
+            log_to_file(f"[INFO] Loaded CSV: {self.selected_file.name} ({len(self.df)} rows, {len(self.df.columns)} columns, {dtype_registry.memory_mb(self.df):.1f} MB in memory)")
             return True
         except Exception as e:
             log_to_file(f"[ERROR] Failed to load CSV: {str(e)}")
@@ -177,7 +185,7 @@ class CSVColumnFilter:
         
         try:
             # Get the parent folder name (ANP2 for July - Nov 2025, etc)
-            source_folder = self.selected_file.parent.name
+            source_folder = self.selected_file.name if self.selected_file.is_dir() else self.selected_file.parent.name
             
             # Create filtered output folder with matching subfolder structure
             filtered_subfolder = FILTERED_OUTPUT / source_folder
@@ -187,11 +195,12 @@ class CSVColumnFilter:
             filtered_df = self.df[self.selected_columns]
             
             # Generate output filename
-            original_name = self.selected_file.stem
+            original_name = table_io.data_stem(self.selected_file)
             filtered_name = f"{original_name}_filtered.csv"
             output_path = filtered_subfolder / filtered_name
             
             # Save
+            # float32 columns print their shortest repr, which is the source's text
             filtered_df.to_csv(output_path, index=False, encoding='utf-8')
             
             file_size = output_path.stat().st_size / (1024 * 1024)
@@ -15,51 +15,70 @@ def check_and_install(package):
             print(f"Failed to install '{package}'. Please install it manually and run the script again.")
             sys.exit(1)
 
-# Check for required packages before proceeding
-required_packages = ['pandas', 'flask']
-for pkg in required_packages:
-    check_and_install(pkg)
+# Check for required packages before proceeding (only when run as the server: save
+# workers, spawned on Windows, re-import this script as __mp_main__)
+required_packages = ['pandas', 'flask', 'pyarrow']
+if __name__ == '__main__':
+    for pkg in required_packages:
+        check_and_install(pkg)
 
 import os
-import pandas as pd
 from pathlib import Path
-from datetime import datetime
 import webbrowser
 import threading
 from flask import Flask, render_template, request, jsonify
 import json
+from concurrent.futures import ProcessPoolExecutor
+import table_io
+import derived_tags
+import resample
+import log_writer
+import plant_dataset
 
 # Configuration
 BASE_DIR = Path(r"c:\Users\EvanJacobs\Documents\OmniaOffline\Parquet-to-CSV-and-Clean")
 CSV_OUTPUT = BASE_DIR / "csv_output"
+PARQUET_SOURCE = BASE_DIR / "parquet_source"
 FILTERED_OUTPUT = BASE_DIR / "csv_filtered"
 ERROR_LOG = BASE_DIR / "error_log.txt"
 TEMPLATES_DIR = BASE_DIR / "templates"
+SAVE_WORKERS = 2  # Files filtered in parallel by /api/save-filtered (one pool shared by all requests)
+DERIVED_TAGS = derived_tags.DEFINITIONS_FILE  # Derived tag expressions offered as extra columns
+
+logger = log_writer.get_logger(ERROR_LOG, source="filter_csv_web")
 
 def log_to_file(message):
-    """Log to error_log.txt"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    log_line = f"[{timestamp}] {message}"
-    print(log_line)
-    with open(ERROR_LOG, 'a', encoding='utf-8') as f:
-        f.write(log_line + "\n")
+    """Log to error_log.txt (queued; written in batches by a background thread)"""
+    logger.log(message)
 
 # Flask app
 app = Flask(__name__, template_folder=str(TEMPLATES_DIR))
 app.config['TEMPLATES_AUTO_RELOAD'] = True
 
+# Process pool for saving, started on first use; concurrent saves queue on it
+_save_pool = None
+_save_pool_lock = threading.Lock()
+
+def get_save_pool():
+    global _save_pool
+    with _save_pool_lock:
+        if _save_pool is None:
+            _save_pool = ProcessPoolExecutor(max_workers=SAVE_WORKERS)
+        return _save_pool
+
 # Global state
 csv_files = []
-selected_csvs = []  # List of selected CSV files
-current_dfs = {}  # Dict of filename to dataframe
+selected_csvs = []  # List of selected CSV files (data is only loaded on save)
 current_columns = []
 
 def find_csv_files():
-    """Find all CSV files"""
+    """Find all CSV files (and other table_io formats: csv.gz, csv.zst, feather, parquet),
+    plus each plant folder of Parquet exports as one whole-plant dataset"""
     global csv_files
     try:
-        csv_files = sorted(list(CSV_OUTPUT.glob("**/*.csv")))
-        log_to_file(f"[INFO] Found {len(csv_files)} CSV file(s)")
+        plants = plant_dataset.find_plants(PARQUET_SOURCE)
+        csv_files = plants + table_io.find_data_files(CSV_OUTPUT)
+        log_to_file(f"[INFO] Found {len(csv_files) - len(plants)} CSV file(s) and {len(plants)} plant folder(s)")
         return True
     except Exception as e:
         log_to_file(f"[ERROR] Failed to find CSV files: {str(e)}")
@@ -87,7 +106,17 @@ def index():
     """Main page"""
     file_list = []
     for i, csv_file in enumerate(csv_files):
-        size_mb = csv_file.stat().st_size / (1024 * 1024)
+        size_mb = table_io.data_size(csv_file) / (1024 * 1024)
+        if csv_file.is_dir():
+            # Whole plant: all of its Parquet exports
+            file_list.append({
+                'index': i,
+                'name': csv_file.name,
+                'parent': csv_file.name,
+                'size': f"{size_mb:.1f} MB",
+                'display': f"{csv_file.name} (all Parquet files)"
+            })
+            continue
         file_list.append({
             'index': i,
             'name': csv_file.name,
@@ -131,8 +160,12 @@ def get_folders():
 
 @app.route('/api/validate-files', methods=['POST'])
 def validate_files():
-    """Validate selected files have matching columns"""
-    global selected_csvs, current_dfs, current_columns
+    """Validate selected files have matching columns.
+
+    Only the header line (or Parquet/Feather schema) of each file is read;
+    the data itself is loaded by /api/save-filtered.
+    """
+    global selected_csvs, current_columns
     
     try:
         file_indices = request.json.get('indices', [])
@@ -140,27 +173,25 @@ def validate_files():
             return jsonify({'success': False, 'error': 'No files selected'})
         
         selected_csvs = [csv_files[i] for i in file_indices]
-        current_dfs = {}
-        column_sets = []
+        column_lists = []
         
         for csv_file in selected_csvs:
             log_to_file(f"[VALIDATING] {csv_file.name}")
-            df = pd.read_csv(csv_file, encoding='utf-8-sig')
-            current_dfs[csv_file.name] = df
-            columns = list(df.columns)
-            column_sets.append(set(columns))
+            column_lists.append(table_io.read_columns(csv_file))
         
         # Check if all files have the same columns
-        first_columns = column_sets[0]
-        all_match = all(cols == first_columns for cols in column_sets)
+        first_columns = set(column_lists[0])
+        all_match = all(set(cols) == first_columns for cols in column_lists)
         
         if not all_match:
+            selected_csvs = []
             return jsonify({
                 'success': False, 
                 'error': 'Selected files have different column structures. Please select files with matching headers.'
             })
         
-        current_columns = list(first_columns)
+        # Keep the first file's column order
+        current_columns = list(column_lists[0])
         hierarchy = build_column_hierarchy(current_columns)
         
         processed_items = set()
@@ -195,6 +226,12 @@ def validate_files():
                 structured_columns.append({'id': col, 'type': 'standalone'})
                 processed_items.add(col)
 
+        # Derived tags computable from these columns are offered like raw tags
+        definitions = derived_tags.load_definitions(DERIVED_TAGS)
+        for name in derived_tags.available(current_columns, definitions):
+            structured_columns.append({'id': name, 'type': 'standalone', 'derived': True,
+                                       'expression': definitions[name].expression})
+
         log_to_file(f"[SUCCESS] Validated {len(selected_csvs)} files with matching columns: {len(current_columns)} columns")
         
         return jsonify({
@@ -212,15 +249,19 @@ def validate_files():
 
 @app.route('/api/save-filtered', methods=['POST'])
 def save_filtered():
-    """Save filtered CSVs for all selected files"""
-    global selected_csvs, current_dfs
+    """Save filtered CSVs for all selected files.
+
+    Each file is streamed in chunks parsing only the selected columns, and
+    several files are processed at once in worker processes, so memory
+    stays flat however many large files are selected.
+    """
+    global selected_csvs, current_columns
     
     log_to_file(f"[DEBUG] save-filtered called with method: {request.method}")
     log_to_file(f"[DEBUG] Content-Type: {request.headers.get('Content-Type')}")
-    log_to_file(f"[DEBUG] Request data: {request.get_data()}")
     
     try:
-        if not current_dfs:
+        if not selected_csvs:
             raise ValueError("No files loaded")
         
         selected_columns = request.json.get('selected_columns', [])
@@ -231,7 +272,7 @@ def save_filtered():
 
         # --- Enforce Timestamp as First Column ---
         timestamp_col = None
-        for col in list(current_dfs.values())[0].columns:  # Use first df to find timestamp
+        for col in current_columns:  # Validated header of the selected files
             if col.lstrip('\ufeff').lower() == 'timestamp':
                 timestamp_col = col
                 break
@@ -244,14 +285,28 @@ def save_filtered():
             final_columns.insert(0, timestamp_col)
         # --- End of Timestamp Logic ---
         
-        results = []
-        total_saved = 0
+        final_columns_unique = list(dict.fromkeys(final_columns))
+        
+        # Optional resampling onto a regular time grid: {interval, agg, ffill_limit}
+        resample_options = request.json.get('resample')
+        if resample_options:
+            if not timestamp_col:
+                raise ValueError("Resampling needs a timestamp column")
+            resample_options = {
+                'interval': resample_options['interval'],
+                'agg': resample_options.get('agg', 'mean'),
+                'ffill_limit': int(resample_options.get('ffill_limit') or 0),
+                'timestamp_col': timestamp_col,
+            }
+            resample.Resampler(**resample_options)  # report a bad interval before any file is written
+            log_to_file(f"[INFO] Resampling to {resample_options['interval']} ({resample_options['agg']}, ffill limit {resample_options['ffill_limit']})")
+        jobs = []
         
         for csv_file in selected_csvs:
             # Determine output directory
             if output_path is None:
                 # Default behavior
-                source_folder = csv_file.parent.name
+                source_folder = csv_file.name if csv_file.is_dir() else csv_file.parent.name
                 output_dir = FILTERED_OUTPUT / source_folder
                 log_to_file(f"[DEBUG] Using default output dir: {output_dir}")
             elif isinstance(output_path, str):
@@ -280,17 +335,26 @@ def save_filtered():
             log_to_file(f"[DEBUG] Creating directory: {output_dir}")
             output_dir.mkdir(parents=True, exist_ok=True)
             
-            # Create filtered dataframe
-            final_columns_unique = list(dict.fromkeys(final_columns))
-            filtered_df = current_dfs[csv_file.name][final_columns_unique]
-            
-            # Save
-            original_name = csv_file.stem
-            filtered_name = f"{original_name}_filtered.csv"
-            output_file_path = output_dir / filtered_name
-            
-            filtered_df.to_csv(output_file_path, index=False, encoding='utf-8')
-            
+            original_name = table_io.data_stem(csv_file)
+            jobs.append((csv_file, output_dir / f"{original_name}_filtered.csv"))
+        
+        # Stream each file's selected columns to its output
+        workers = min(SAVE_WORKERS, len(jobs))
+        if workers > 1:
+            pool = get_save_pool()
+            futures = [pool.submit(table_io.write_projected_csv, src, dst, final_columns_unique, definitions_file=DERIVED_TAGS,
+                                   resample_options=resample_options)
+                       for src, dst in jobs]
+            timings = [future.result() for future in futures]
+        else:
+            timings = [table_io.write_projected_csv(src, dst, final_columns_unique, definitions_file=DERIVED_TAGS,
+                                                  resample_options=resample_options) for src, dst in jobs]
+        
+        results = []
+        total_saved = 0
+        
+        for (csv_file, output_file_path), timing in zip(jobs, timings):
+            filtered_name = output_file_path.name
             file_size = output_file_path.stat().st_size / (1024 * 1024)
             
             # Determine display path
@@ -299,14 +363,18 @@ def save_filtered():
             except ValueError:
                 display_path = output_file_path
             
-            log_to_file(f"[SUCCESS] Saved: {display_path} ({len(filtered_df)} rows, {len(final_columns_unique)} columns, {file_size:.2f} MB)")
+            if timing['late_rows']:
+                log_to_file(f"[WARNING] {timing['late_rows']:,} out-of-order rows in {csv_file.name} were dropped while resampling")
+            log_to_file(f"[SUCCESS] Saved: {display_path} ({timing['rows']} rows, {len(final_columns_unique)} columns, {file_size:.2f} MB, {timing['seconds']:.2f}s)")
             
             results.append({
                 'filename': filtered_name,
                 'path': str(display_path),
-                'rows': len(filtered_df),
+                'rows': timing['rows'],
                 'columns': len(final_columns_unique),
-                'size': f"{file_size:.2f} MB"
+                'size': f"{file_size:.2f} MB",
+                'seconds': round(timing['seconds'], 3),
+                'late_rows': timing['late_rows']
             })
             total_saved += 1
         
@@ -0,0 +1,125 @@
+"""
+Buffered log writer shared by the converter, the filter tools and the plotter.
+
+- log() prints the line and queues a record; a background thread writes
+  queued records in batches, so callers never wait on file I/O
+- One open/append/close per batch instead of per line, and each batch is a
+  single write, so lines from separate processes do not interleave mid-line
+- Records are JSON lines: time, level (from a leading "[TAG]"), source
+  tool, process id and message
+- The file is rotated by size (error_log.txt -> error_log.txt.1 -> ...)
+- Queued records are flushed at exit; flush() waits for them explicitly
+"""
+
+import atexit
+import json
+import os
+import queue
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+
+DEFAULT_MAX_BYTES = 10 * 1024 ** 2
+DEFAULT_BACKUPS = 3
+FLUSH_INTERVAL = 0.5  # seconds the writer waits to gather a batch
+MAX_BATCH = 1000
+
+_LEVEL_PATTERN = re.compile(r"^\[([A-Z]+)\]")
+_ROTATE = object()  # queue marker: rotate the file before the records after it
+
+
+class LogWriter:
+    def __init__(self, path, source=None, max_bytes=DEFAULT_MAX_BYTES, backups=DEFAULT_BACKUPS, echo=True):
+        """path is the log file; source names the tool in every record; echo also prints each line"""
+        # Resolved now: records flushed at exit must not follow a later change of working directory
+        self.path = Path(path).resolve()
+        self.source = source
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.echo = echo
+        self.dropped = 0  # records lost because the file could not be written
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"log-writer-{self.path.name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def log(self, message, timestamp=None, **fields):
+        """Queue one record; timestamp defaults to now, extra fields are stored with it"""
+        timestamp = timestamp or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if self.echo:
+            print(f"[{timestamp}] {message}")
+        level = _LEVEL_PATTERN.match(message)
+        record = {'time': timestamp, 'level': level.group(1) if level else 'INFO', 'source': self.source,
+                  'pid': os.getpid(), 'message': message, **fields}
+        self._queue.put(record)
+
+    def rotate(self):
+        """Start a new file after the records queued so far (the current one becomes .1)"""
+        self._queue.put(_ROTATE)
+
+    def flush(self):
+        """Block until every record queued so far is on disk"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                # Gather what arrives within the flush interval into one write
+                while len(batch) < MAX_BATCH:
+                    batch.append(self._queue.get(timeout=FLUSH_INTERVAL))
+            except queue.Empty:
+                pass
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        lines = []
+        for item in batch + [None]:
+            if item is _ROTATE or item is None:
+                if lines:
+                    self._append(''.join(lines))
+                    lines = []
+                if item is _ROTATE:
+                    self._rotate()
+            else:
+                lines.append(json.dumps(item, ensure_ascii=False, default=str) + '\n')
+
+    def _append(self, text):
+        data = text.encode('utf-8')
+        try:
+            if self.path.exists() and self.path.stat().st_size + len(data) > self.max_bytes:
+                self._rotate()
+            with open(self.path, 'ab') as f:
+                f.write(data)
+        except OSError:
+            self.dropped += text.count('\n')
+
+    def _rotate(self):
+        """Shift error_log.txt.N-1 -> .N ... and the live file to .1 (another process may already have)"""
+        try:
+            for i in range(self.backups - 1, 0, -1):
+                older = self.path.with_name(f"{self.path.name}.{i}")
+                if older.exists():
+                    os.replace(older, self.path.with_name(f"{self.path.name}.{i + 1}"))
+            if self.path.exists():
+                os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        except OSError:
+            pass
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_logger(path, source=None, **options):
+    """The process-wide LogWriter for path (one background thread per file)"""
+    key = str(Path(path).resolve())
+    with _writers_lock:
+        if key not in _writers:
+            _writers[key] = LogWriter(path, source, **options)
+        return _writers[key]
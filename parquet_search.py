@@ -1,18 +1,179 @@
 ﻿import argparse
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 try:
     import pyarrow.parquet as pq
     import pyarrow as pa
+    import pyarrow.compute as pc
 except Exception:
     pq = None
     pa = None
+    pc = None
+
+PARQUET_EXTS = ('.parquet', '.pq')
+CATALOG_NAME = '.parquet_catalog.json'
+CATALOG_VERSION = 1
+# Concurrent footer reads; mostly waiting on I/O, so this pays off on network shares
+DEFAULT_SCAN_THREADS = 8
+
+def _to_timestamp(value):
+    import pandas as pd
+    return pd.Timestamp(value)
+
+def scan_file_metadata(full):
+    """Summarise one parquet file from its footer alone.
+
+    Row counts, per-column null counts, min/max and sizes come from the
+    row-group statistics, so no data pages are decoded. A timestamp column
+    is only read (that column alone) when its statistics are incomplete.
+    """
+    pf = pq.ParquetFile(full)
+    md = pf.metadata
+    schema = pf.schema_arrow
+    columns = {}
+    # Per row group: row count and time coverage of the first timestamp column
+    row_groups = [{'num_rows': md.row_group(rg).num_rows, 'min_time': None, 'max_time': None}
+                  for rg in range(md.num_row_groups)]
+    range_column = None
+    for i in range(md.num_columns):
+        name = md.schema.column(i).path
+        field_index = schema.get_field_index(name)
+        arrow_type = schema.field(field_index).type if field_index >= 0 else None
+        is_time = arrow_type is not None and pa.types.is_timestamp(arrow_type)
+        col = {
+            'type': str(arrow_type) if arrow_type is not None else md.schema.column(i).physical_type,
+            'null_count': 0,
+            'min': None,
+            'max': None,
+            'compressed_bytes': 0,
+            'uncompressed_bytes': 0,
+        }
+        complete = True
+        for rg in range(md.num_row_groups):
+            chunk = md.row_group(rg).column(i)
+            col['compressed_bytes'] += chunk.total_compressed_size
+            col['uncompressed_bytes'] += chunk.total_uncompressed_size
+            stats = chunk.statistics
+            if stats is None:
+                complete = False
+                col['null_count'] = None
+                continue
+            if col['null_count'] is not None:
+                col['null_count'] = col['null_count'] + stats.null_count if stats.has_null_count else None
+            if not stats.has_min_max:
+                # An all-null row group has no min/max but leaves the others valid
+                if not (stats.has_null_count and stats.null_count == chunk.num_values):
+                    complete = False
+                continue
+            col['min'] = stats.min if col['min'] is None else min(col['min'], stats.min)
+            col['max'] = stats.max if col['max'] is None else max(col['max'], stats.max)
+            if is_time and range_column in (None, name):
+                range_column = name
+                row_groups[rg]['min_time'] = _to_timestamp(stats.min)
+                row_groups[rg]['max_time'] = _to_timestamp(stats.max)
+        if not complete:
+            col['min'] = col['max'] = None
+            if is_time and md.num_rows > 0:
+                # Statistics missing: fall back to decoding just this column
+                bounds = pc.min_max(pq.read_table(full, columns=[name]).column(0))
+                col['min'], col['max'] = bounds['min'].as_py(), bounds['max'].as_py()
+        if is_time and col['min'] is not None:
+            col['min'], col['max'] = _to_timestamp(col['min']), _to_timestamp(col['max'])
+        col['is_time'] = is_time
+        col['from_statistics'] = complete
+        columns[name] = col
+    time_ranges = [(col['min'], col['max']) for col in columns.values() if col['is_time'] and col['min'] is not None]
+    return {
+        'path': full,
+        'size_bytes': os.path.getsize(full),
+        'metadata_bytes': md.serialized_size,
+        'num_rows': md.num_rows,
+        'num_row_groups': md.num_row_groups,
+        'row_groups': row_groups,
+        'columns': columns,
+        'min_time': min((lo for lo, _ in time_ranges), default=None),
+        'max_time': max((hi for _, hi in time_ranges), default=None),
+    }
+
+def list_parquet_files(root):
+    """Sorted paths of all parquet files under root"""
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        for fn in filenames:
+            if fn.lower().endswith(PARQUET_EXTS):
+                paths.append(os.path.join(dirpath, fn))
+    return sorted(paths)
+
+def _scan_one(full):
+    try:
+        return scan_file_metadata(full)
+    except Exception as e:
+        return {'path': full, 'error': f'{type(e).__name__}: {e}'}
+
+def scan_files(paths, max_workers=DEFAULT_SCAN_THREADS):
+    """Read footers for paths across a bounded thread pool.
+
+    Returns (files, throughput). files is in the same order as paths no
+    matter which read finishes first; throughput has the file count,
+    elapsed seconds, files/s and bytes of footer metadata read.
+    """
+    started = time.perf_counter()
+    if len(paths) > 1 and max_workers > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as pool:
+            files = list(pool.map(_scan_one, paths))
+    else:
+        files = [_scan_one(full) for full in paths]
+    seconds = time.perf_counter() - started
+    # Footer = serialized FileMetaData + 4-byte length + 4-byte magic
+    metadata_bytes = sum(info['metadata_bytes'] + 8 for info in files if 'error' not in info)
+    throughput = {
+        'files': len(files),
+        'seconds': seconds,
+        'files_per_second': len(files) / seconds if seconds > 0 else 0.0,
+        'metadata_bytes': metadata_bytes,
+    }
+    return files, throughput
+
+def scan_parquet_metadata(root, max_workers=DEFAULT_SCAN_THREADS):
+    """Footer summaries (see scan_file_metadata) for every parquet file under root.
+
+    Files that cannot be opened are returned as {'path': ..., 'error': ...}.
+    """
+    return scan_files(list_parquet_files(root), max_workers)[0]
+
+def merge_file_metadata(files):
+    """Build the column -> files map and overall time range from footer summaries"""
+    result = {}
+    min_time = None
+    max_time = None
+    for info in files:
+        rel = os.path.relpath(info['path'], start=os.getcwd())
+        if 'error' in info:
+            cols = [f"__error__:{info['error']}"]
+        else:
+            cols = list(info['columns'])
+            if info['min_time'] is not None and (min_time is None or info['min_time'] < min_time):
+                min_time = info['min_time']
+            if info['max_time'] is not None and (max_time is None or info['max_time'] > max_time):
+                max_time = info['max_time']
+        for col in cols:
+            if col not in result:
+                result[col] = []
+            result[col].append(rel)
+    return dict(sorted(result.items())), min_time, max_time
 
 def scan_parquet_files(root):
+    if pq is not None:
+        # Metadata-only path: footers and row-group statistics
+        return merge_file_metadata(scan_parquet_metadata(root))
     result = {}
     min_time = None
     max_time = None
-    exts = ('.parquet', '.pq')
+    exts = PARQUET_EXTS
     for dirpath, _, filenames in os.walk(root):
         for fn in filenames:
             if not fn.lower().endswith(exts):
@@ -21,37 +182,19 @@ def scan_parquet_files(root):
             rel = os.path.relpath(full, start=os.getcwd())
             cols = []
             try:
-                if pq is not None:
-                    pf = pq.ParquetFile(full)
-                    cols = list(pf.schema.names)
-                    # Find datetime columns
-                    schema = pf.schema_arrow
-                    datetime_cols = [field.name for field in schema if pa and pa.types.is_timestamp(field.type)]
-                    if datetime_cols:
-                        table = pq.read_table(full, columns=datetime_cols)
-                        df = table.to_pandas()
-                        for col in datetime_cols:
-                            if not df[col].empty:
-                                col_min = df[col].min()
-                                col_max = df[col].max()
-                                if min_time is None or col_min < min_time:
-                                    min_time = col_min
-                                if max_time is None or col_max > max_time:
-                                    max_time = col_max
-                else:
-                    import pandas as pd
-                    df = pd.read_parquet(full)
-                    cols = list(df.columns.astype(str))
-                    # Find datetime columns
-                    datetime_cols = df.select_dtypes(include=['datetime64']).columns.tolist()
-                    for col in datetime_cols:
-                        if not df[col].empty:
-                            col_min = df[col].min()
-                            col_max = df[col].max()
-                            if min_time is None or col_min < min_time:
-                                min_time = col_min
-                            if max_time is None or col_max > max_time:
-                                max_time = col_max
+                import pandas as pd
+                df = pd.read_parquet(full)
+                cols = list(df.columns.astype(str))
+                # Find datetime columns
+                datetime_cols = df.select_dtypes(include=['datetime64']).columns.tolist()
+                for col in datetime_cols:
+                    if not df[col].empty:
+                        col_min = df[col].min()
+                        col_max = df[col].max()
+                        if min_time is None or col_min < min_time:
+                            min_time = col_min
+                        if max_time is None or col_max > max_time:
+                            max_time = col_max
             except Exception as e:
                 cols = [f'__error__:{type(e).__name__}: {e}']
             for col in cols:
@@ -60,15 +203,225 @@ def scan_parquet_files(root):
                 result[col].append(rel)
     return dict(sorted(result.items())), min_time, max_time
 
+# ===========================
+# PERSISTENT CATALOG
+# ===========================
+
+def default_catalog_path(root):
+    return os.path.join(root, CATALOG_NAME)
+
+def _encode_value(value):
+    """JSON-friendly form of a statistics value (timestamps as ISO strings)"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+def _encode_entry(info, stat):
+    """Catalog entry for one file: footer summary plus the size/mtime it was taken at"""
+    entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if 'error' in info:
+        entry['error'] = info['error']
+        return entry
+    entry.update({key: info[key] for key in ('metadata_bytes', 'num_rows', 'num_row_groups')})
+    entry['min_time'] = _encode_value(info['min_time'])
+    entry['max_time'] = _encode_value(info['max_time'])
+    entry['row_groups'] = [{key: _encode_value(value) for key, value in rg.items()} for rg in info['row_groups']]
+    entry['columns'] = {name: {key: _encode_value(value) for key, value in col.items()}
+                        for name, col in info['columns'].items()}
+    return entry
+
+def _decode_entry(path, entry):
+    """Inverse of _encode_entry: a footer summary as scan_file_metadata returns it"""
+    if 'error' in entry:
+        return {'path': path, 'error': entry['error']}
+    def as_time(value):
+        return _to_timestamp(value) if value is not None else None
+    columns = {}
+    for name, col in entry['columns'].items():
+        col = dict(col)
+        if col['is_time']:
+            col['min'], col['max'] = as_time(col['min']), as_time(col['max'])
+        columns[name] = col
+    return {
+        'path': path,
+        'size_bytes': entry['size'],
+        'metadata_bytes': entry['metadata_bytes'],
+        'num_rows': entry['num_rows'],
+        'num_row_groups': entry['num_row_groups'],
+        'row_groups': [dict(rg, min_time=as_time(rg['min_time']), max_time=as_time(rg['max_time']))
+                       for rg in entry['row_groups']],
+        'columns': columns,
+        'min_time': as_time(entry['min_time']),
+        'max_time': as_time(entry['max_time']),
+    }
+
+def load_catalog(catalog_path):
+    """Read the on-disk catalog; a missing, unreadable or old-version catalog starts empty"""
+    try:
+        with open(catalog_path, 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+        if catalog.get('version') == CATALOG_VERSION:
+            return catalog
+    except (OSError, ValueError):
+        pass
+    return {'version': CATALOG_VERSION, 'files': {}}
+
+def refresh_catalog(root, catalog_path=None, max_workers=DEFAULT_SCAN_THREADS):
+    """Bring the catalog for root up to date and return (files, counts).
+
+    Only files whose size or mtime changed since they were catalogued have
+    their footers re-read (in parallel, see scan_files); entries for deleted
+    files are dropped. files is the list of footer summaries (as
+    scan_file_metadata returns), sorted by path. counts reports cached,
+    refreshed and removed entries plus the throughput of the refresh scan.
+    """
+    catalog_path = catalog_path or default_catalog_path(root)
+    catalog = load_catalog(catalog_path)
+    entries = catalog['files']
+    counts = {'cached': 0, 'refreshed': 0, 'removed': 0}
+    seen = set()
+    stale = {}
+    for full in map(os.path.abspath, list_parquet_files(root)):
+        try:
+            stat = os.stat(full)
+        except FileNotFoundError:
+            continue  # deleted since it was listed: its entry is dropped below
+        seen.add(full)
+        entry = entries.get(full)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            counts['cached'] += 1
+        else:
+            stale[full] = stat
+    scanned, throughput = scan_files(list(stale), max_workers)
+    for info in scanned:
+        entries[info['path']] = _encode_entry(info, stale[info['path']])
+    counts['refreshed'] = len(scanned)
+    counts.update(throughput)
+    for path in [path for path in entries if path not in seen]:
+        del entries[path]
+        counts['removed'] += 1
+    if counts['refreshed'] or counts['removed']:
+        # Unique per process and thread: the web app and a CLI run may refresh the catalog at once
+        tmp_path = f"{catalog_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(catalog, f, default=str)
+        os.replace(tmp_path, catalog_path)
+    files = [_decode_entry(path, entries[path]) for path in sorted(entries)]
+    return files, counts
+
+def align_time(bound, reference):
+    """bound made comparable with reference: read as UTC if naive (utc_bound),
+    converted to naive UTC for naive data"""
+    if bound is None or reference is None:
+        return bound
+    bound = utc_bound(bound)
+    return bound if reference.tzinfo is not None else bound.tz_convert(None)
+
+def utc_bound(value):
+    """A start/end given by a user or request as an aware UTC Timestamp (naive values are UTC).
+
+    Every tool reads start/end this way (converter, tag search, plotter,
+    plant comparison), so the same string selects the same instant whatever
+    the data's timezone.
+    """
+    if value is None:
+        return None
+    bound = _to_timestamp(value)
+    return bound.tz_localize('UTC') if bound.tzinfo is None else bound.tz_convert('UTC')
+
+def _outside(min_time, max_time, start, end):
+    """True if [min_time, max_time] lies entirely before start or after end"""
+    return ((start is not None and max_time is not None and max_time < align_time(start, max_time))
+            or (end is not None and min_time is not None and min_time > align_time(end, min_time)))
+
+def find_tag_files(files, tag, start=None, end=None):
+    """Files containing tag whose time coverage overlaps [start, end].
+
+    Returns dicts with path, dtype, the file's time range and the indices of
+    the row groups that overlap the window (all row groups if no window).
+    Naive start/end are UTC (utc_bound).
+    """
+    start, end = utc_bound(start), utc_bound(end)
+    matches = []
+    for info in files:
+        if 'error' in info or tag not in info['columns']:
+            continue
+        if _outside(info['min_time'], info['max_time'], start, end):
+            continue
+        row_groups = [i for i, rg in enumerate(info['row_groups'])
+                      if not _outside(rg['min_time'], rg['max_time'], start, end)]
+        matches.append({
+            'path': info['path'],
+            'dtype': info['columns'][tag]['type'],
+            'min_time': info['min_time'],
+            'max_time': info['max_time'],
+            'row_groups': row_groups,
+        })
+    return matches
+
+def print_file_details(files, query=''):
+    """Print per-file sizes/time range and per-column min/max/nulls (columns filtered by query)"""
+    for info in files:
+        rel = os.path.relpath(info['path'], start=os.getcwd())
+        if 'error' in info:
+            print(f"\n{rel}\n  ERROR: {info['error']}")
+            continue
+        print(f"\n{rel}")
+        print(f"  Size: {info['size_bytes'] / (1024 * 1024):.2f} MB, rows: {info['num_rows']:,}, "
+              f"row groups: {info['num_row_groups']}, footer: {info['metadata_bytes']:,} bytes")
+        if info['min_time'] is not None:
+            print(f"  Time range: {info['min_time']} to {info['max_time']}")
+        for name, col in info['columns'].items():
+            if query and query not in name.lower():
+                continue
+            nulls = 'n/a' if col['null_count'] is None else f"{col['null_count']:,}"
+            bounds = 'n/a' if col['min'] is None else f"{col['min']} .. {col['max']}"
+            print(f"    {name} [{col['type']}] min/max: {bounds}, nulls: {nulls}, "
+                  f"{col['compressed_bytes'] / 1024:.1f} KB compressed")
+
 def main():
     p = argparse.ArgumentParser(description='Search Parquet column headers')
     p.add_argument('--root', default='parquet_source', help='Root folder to scan')
     p.add_argument('--search', default='', help='Search query (substring, case-insensitive)')
+    p.add_argument('--details', action='store_true',
+                   help='Show per-file and per-column min/max, null counts and sizes (from footer statistics)')
+    p.add_argument('--tag', default='', help='Exact tag: list the files/row groups that contain it (use with --start/--end)')
+    p.add_argument('--start', default=None, help='Start of the time window for --tag (naive = UTC)')
+    p.add_argument('--end', default=None, help='End of the time window for --tag (naive = UTC)')
+    p.add_argument('--catalog', default=None, help=f'Catalog file (default: <root>/{CATALOG_NAME})')
+    p.add_argument('--no-catalog', action='store_true', help='Ignore the catalog and re-read every footer')
+    p.add_argument('--threads', type=int, default=DEFAULT_SCAN_THREADS,
+                   help=f'Maximum concurrent footer reads (default: {DEFAULT_SCAN_THREADS})')
     args = p.parse_args()
     if not os.path.isdir(args.root):
         print(f'Root folder not found: {args.root}')
         return
-    cache, min_time, max_time = scan_parquet_files(args.root)
+    files = None
+    throughput = None
+    threads = max(1, args.threads)
+    if pq is not None and not args.no_catalog:
+        files, throughput = refresh_catalog(args.root, args.catalog, threads)
+        print(f"Catalog: {throughput['cached']} cached, {throughput['refreshed']} refreshed, {throughput['removed']} removed")
+    elif pq is not None:
+        files, throughput = scan_files(list_parquet_files(args.root), threads)
+    if throughput is not None and throughput['files']:
+        print(f"Scanned {throughput['files']} footer(s) in {throughput['seconds']:.2f}s "
+              f"({throughput['files_per_second']:.1f} files/s, {throughput['metadata_bytes']:,} bytes of metadata)")
+    if files is not None:
+        cache, min_time, max_time = merge_file_metadata(files)
+    else:
+        cache, min_time, max_time = scan_parquet_files(args.root)
+    if args.tag:
+        if files is None:
+            print('Tag lookup needs pyarrow (pip install pyarrow).')
+            return
+        matches = find_tag_files(files, args.tag, args.start, args.end)
+        print(f'Files containing {args.tag} ({len(matches)}):')
+        for match in matches:
+            rel = os.path.relpath(match['path'], start=os.getcwd())
+            print(f"  {rel} [{match['dtype']}] {match['min_time']} to {match['max_time']}, "
+                  f"row groups: {match['row_groups']}")
+        return
     query = args.search.strip().lower()
     if query:
         matches = [col for col in cache if query in col.lower()]
@@ -83,6 +436,11 @@ def main():
         print(f'Data time range: {min_time} to {max_time}')
     else:
         print('No datetime data found.')
+    if args.details:
+        if files is None:
+            print('Details need pyarrow (pip install pyarrow).')
+        else:
+            print_file_details(files, query)
 
 if __name__ == '__main__':
     main()
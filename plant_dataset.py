@@ -0,0 +1,190 @@
+"""
+One plant's historian exports as a single time-ordered table.
+
+A plant folder (e.g. parquet_source/NAP2 for July - Nov 2025) holds several
+pi_data_*.parquet files; PlantDataset reads them as one dataset:
+- a time index of the files (from the parquet_search footer catalog, so
+  opening a plant reads no data) orders them and picks the files that
+  overlap a query's start/end
+- inside a file, row groups outside the window are skipped using their
+  timestamp statistics and only the requested columns are decoded
+  (row_groups.py, shared with the converter)
+- data arrives lazily, one record batch at a time, with the union of all
+  files' columns (tags missing from a file are empty)
+- files are read one after another, not merged: files whose time ranges
+  overlap are listed in overlaps, since streaming consumers (resampling,
+  plant comparison) would drop the rows that arrive out of order
+
+table_io treats a plant folder like any table file, so the converter's
+outputs, the filter tools and the plotter all accept one.
+"""
+
+import warnings
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import parquet_search
+import row_groups
+import summary_stats
+
+DEFAULT_BATCH_ROWS = 100_000
+
+
+def is_plant(path):
+    """True for a folder that contains parquet exports"""
+    return Path(path).is_dir() and bool(parquet_search.list_parquet_files(str(path)))
+
+
+def find_plants(root):
+    """Plant folders directly under root (those holding parquet files), sorted"""
+    root = Path(root)
+    if not root.is_dir():
+        return []
+    return sorted(path for path in root.iterdir() if is_plant(path))
+
+
+_align = parquet_search.align_time
+
+
+def signature(path):
+    """Changes whenever a file of the plant is added, removed or rewritten"""
+    stats = [Path(full).stat() for full in parquet_search.list_parquet_files(str(path))]
+    return len(stats), sum(stat.st_size for stat in stats), max((stat.st_mtime_ns for stat in stats), default=0)
+
+
+class PlantDataset:
+    def __init__(self, root, catalog_path=None):
+        """root is the plant folder; its footer catalog is refreshed (only changed files are re-read)"""
+        self.root = Path(root)
+        files, _ = parquet_search.refresh_catalog(str(self.root), catalog_path)
+        readable = [info for info in files if 'error' not in info and info['num_rows']]
+        # Time index: files in order of their first timestamp (files without one last)
+        self.files = sorted(readable, key=lambda info: (info['min_time'] is None, info['min_time'] or pd.Timestamp.min, info['path']))
+        self.errors = [info for info in files if 'error' in info]
+        self.overlaps = self._find_overlaps()
+
+    def _find_overlaps(self):
+        """[earlier_path, later_path] for files that start before an earlier file has ended"""
+        overlaps = []
+        latest = None  # catalog entry with the latest end so far
+        for info in self.files:
+            if info['min_time'] is None or info['max_time'] is None:
+                continue
+            if latest is not None and info['min_time'] < _align(latest['max_time'], info['min_time']):
+                overlaps.append([latest['path'], info['path']])
+            if latest is None or info['max_time'] > _align(latest['max_time'], info['max_time']):
+                latest = info
+        return overlaps
+
+    @property
+    def paths(self):
+        return [info['path'] for info in self.files]
+
+    @property
+    def columns(self):
+        """Union of the files' columns in first-seen order, timestamp first"""
+        names = list(dict.fromkeys(name for info in self.files for name in info['columns']))
+        timestamps = [name for name in names if name.lstrip('\ufeff').lower() == 'timestamp']
+        return timestamps + [name for name in names if name not in timestamps and not name.startswith('__index_level_')]
+
+    @property
+    def numeric_columns(self):
+        """Columns stored as integers or floats in every file that has them (from the catalog)"""
+        def numeric(type_name):
+            try:
+                data_type = pa.type_for_alias(type_name)
+            except ValueError:
+                return False
+            return pa.types.is_integer(data_type) or pa.types.is_floating(data_type)
+
+        return [name for name in self.columns
+                if all(numeric(info['columns'][name]['type']) for info in self.files if name in info['columns'])]
+
+    @property
+    def num_rows(self):
+        return sum(info['num_rows'] for info in self.files)
+
+    @property
+    def min_time(self):
+        return min((info['min_time'] for info in self.files if info['min_time'] is not None), default=None)
+
+    @property
+    def max_time(self):
+        return max((info['max_time'] for info in self.files if info['max_time'] is not None), default=None)
+
+    def files_for(self, start=None, end=None):
+        """Catalog entries of the files whose time range overlaps [start, end]"""
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        return [info for info in self.files
+                if not ((start is not None and info['max_time'] is not None and info['max_time'] < _align(start, info['max_time']))
+                        or (end is not None and info['min_time'] is not None and info['min_time'] > _align(end, info['min_time'])))]
+
+    def iter_frames(self, columns=None, start=None, end=None, chunksize=DEFAULT_BATCH_ROWS):
+        """Yield DataFrame chunks file by file (in time order unless overlaps),
+        only from files and row groups overlapping [start, end]"""
+        wanted = self.columns if columns is None else list(columns)
+        for info in self.files_for(start, end):
+            yield from self._iter_file(info, wanted, start, end, chunksize)
+
+    def _iter_file(self, info, wanted, start=None, end=None, chunksize=DEFAULT_BATCH_ROWS):
+        """Chunks of one file, read straight from its row groups"""
+        parquet = pq.ParquetFile(info['path'])
+        schema = parquet.schema_arrow
+        timestamp_col = row_groups.timestamp_column(schema)
+        lo = hi = None
+        if timestamp_col is None and (start is not None or end is not None):
+            # Its rows cannot be placed in the window; reading them all would put them in every window
+            warnings.warn(f"{Path(info['path']).name} has no timestamp column, skipped for the time window")
+            return
+        if timestamp_col is not None:
+            ts_type = schema.field(timestamp_col).type
+            lo = row_groups.time_bound(start, ts_type) if start is not None else None
+            hi = row_groups.time_bound(end, ts_type) if end is not None else None
+        groups = row_groups.row_groups_in_range(parquet, timestamp_col, lo, hi)
+        present = [name for name in wanted if name in schema.names]
+        if not groups or not present:
+            return
+        if (lo is not None or hi is not None) and timestamp_col not in present:
+            present.append(timestamp_col)  # needed for the row filter, dropped again below
+        for batch in parquet.iter_batches(batch_size=chunksize, row_groups=groups, columns=present):
+            batch = row_groups.filter_batch(batch, timestamp_col, lo, hi)
+            if batch.num_rows:
+                yield batch.to_pandas().reindex(columns=wanted)
+
+    def summaries(self):
+        """Column summaries of the whole plant, merged from each file's sidecar.
+
+        A missing sidecar is built from the file's own batches, not through
+        the columnar cache, so no Arrow copy of the export is written.
+        """
+        per_file = []
+        for info in self.files:
+            columns = [name for name in self.columns if name in info['columns']]
+            per_file.append(summary_stats.ensure_summary(info['path'], frames=self._iter_file(info, columns)))
+        return summary_stats.merge_summaries(per_file)
+
+    def read(self, columns=None, start=None, end=None):
+        """The (windowed) dataset as one DataFrame, sorted by timestamp"""
+        wanted = self.columns if columns is None else list(columns)
+        frames = list(self.iter_frames(wanted, start, end))
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=wanted)
+        if 'timestamp' in df.columns and not df['timestamp'].is_monotonic_increasing:
+            df = df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+        return df
+
+    def describe(self):
+        """Summary for listings: files, rows, columns and time coverage"""
+        return {
+            'name': self.root.name,
+            'path': str(self.root),
+            'files': [Path(path).name for path in self.paths],
+            'rows': self.num_rows,
+            'columns': len(self.columns),
+            'min_time': self.min_time.isoformat() if self.min_time is not None else None,
+            'max_time': self.max_time.isoformat() if self.max_time is not None else None,
+            'overlaps': [[Path(a).name, Path(b).name] for a, b in self.overlaps],
+        }
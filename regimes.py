@@ -0,0 +1,186 @@
+"""
+Operating-regime detection (analysis plan step 1.4 and steady-state filtering).
+
+- Rolling mean/std over selected tags, vectorized with cumulative sums
+  (centred window, missing values skipped)
+- Steady state: every tag's rolling std is below its limit (absolute, or
+  relative to the rolling mean)
+- Load level: rolling mean of a load tag as a fraction of design load,
+  binned into low / normal / high (<80%, 80-100%, >100% by default)
+
+The result is stored as a compact interval index next to the data file
+("<file>.regimes.json"): regime ids plus [start, end, regime] runs. Other
+tools turn matching intervals into time windows, so filtering a dataset to
+"steady" or "normal-steady" is a handful of binary searches, not a mask.
+Interval times of timezone-aware data are stored in UTC with their offset.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import parquet_search
+import plant_dataset
+
+SIDECAR_SUFFIX = '.regimes.json'
+# Bumped when stored intervals change meaning (2: aware times kept as UTC with offset)
+INDEX_VERSION = 2
+DEFAULT_MAX_REL_STD = 0.01
+DEFAULT_LOAD_BINS = (0.8, 1.0)
+DEFAULT_LOAD_LABELS = ('low', 'normal', 'high')
+
+
+def rolling_mean_std(values, window, min_periods=None):
+    """Centred rolling mean and sample std over window samples, skipping NaNs"""
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    window = max(1, int(window))
+    min_periods = window // 2 + 1 if min_periods is None else min_periods
+    valid = np.isfinite(values)
+    # Centre first so the cumulative sums stay small
+    centre = values[valid].mean() if valid.any() else 0.0
+    z = np.where(valid, values - centre, 0.0)
+    half = window // 2
+    lo = np.clip(np.arange(n) - half, 0, n)
+    hi = np.clip(np.arange(n) - half + window, 0, n)
+
+    def window_sum(a):
+        cumulative = np.concatenate([[0.0], np.cumsum(a)])
+        return cumulative[hi] - cumulative[lo]
+
+    count = window_sum(valid.astype(float))
+    total = window_sum(z)
+    total_sq = window_sum(z * z)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        var = np.maximum(total_sq / count - mean * mean, 0.0) * count / (count - 1)
+    enough = count >= max(min_periods, 2)
+    return np.where(enough, mean + centre, np.nan), np.where(enough, np.sqrt(var), np.nan)
+
+
+def _runs(labels):
+    """(start_row, end_row, label) for each run of equal labels"""
+    if len(labels) == 0:
+        return []
+    edges = np.flatnonzero(labels[1:] != labels[:-1]) + 1
+    starts = np.concatenate([[0], edges])
+    ends = np.concatenate([edges, [len(labels)]]) - 1
+    return list(zip(starts.tolist(), ends.tolist(), labels[starts].tolist()))
+
+
+def detect_regimes(df, tags, window, max_rel_std=DEFAULT_MAX_REL_STD, max_std=None,
+                   load_tag=None, design_load=None, load_bins=DEFAULT_LOAD_BINS, load_labels=DEFAULT_LOAD_LABELS):
+    """Regime interval index for a time-sorted DataFrame with a timestamp column.
+
+    tags are tested for steady state over window samples; max_std maps a
+    tag to an absolute std limit, other tags use max_rel_std * |mean|.
+    With load_tag, each row is also binned by its rolling mean load as a
+    fraction of design_load, which is then required. Regime ids
+    look like 'normal-steady' or, without a load tag, 'steady'/'transient'.
+    """
+    max_std = max_std or {}
+    steady = np.ones(len(df), dtype=bool)
+    for tag in tags:
+        values = pd.to_numeric(df[tag], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        mean, std = rolling_mean_std(values, window)
+        limit = max_std[tag] if tag in max_std else max_rel_std * np.abs(mean)
+        with np.errstate(invalid='ignore'):
+            steady &= std <= limit
+    labels = np.where(steady, 'steady', 'transient').astype(object)
+
+    parameters = {'tags': list(tags), 'window': int(window), 'max_rel_std': max_rel_std, 'max_std': max_std}
+    if load_tag is not None:
+        if design_load is None or float(design_load) <= 0:
+            raise ValueError(f"Load regimes need the design load of {load_tag} (a positive design_load)")
+        design_load = float(design_load)
+        load = pd.to_numeric(df[load_tag], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        load_mean, _ = rolling_mean_std(load, window)
+        level = np.asarray(load_labels, dtype=object)[np.digitize(load_mean / design_load, load_bins)]
+        level[~np.isfinite(load_mean)] = 'unknown'
+        labels = level + '-' + labels
+        parameters.update({'load_tag': load_tag, 'design_load': design_load,
+                           'load_bins': list(load_bins), 'load_labels': list(load_labels)})
+
+    regime_ids = sorted(set(labels.tolist()))
+    codes = np.searchsorted(np.asarray(regime_ids, dtype=object), labels)
+    times = pd.to_datetime(df['timestamp'])
+    if times.dt.tz is not None:
+        # Keep the instant: other tools read naive bounds as UTC (parquet_search.utc_bound)
+        times = times.dt.tz_convert('UTC')
+    times = times.dt.strftime('%Y-%m-%dT%H:%M:%S.%f%z').to_numpy()
+    intervals = [[times[start], times[end], code] for start, end, code in _runs(codes)]
+    rows = np.bincount(codes, minlength=len(regime_ids)).tolist()
+    return {'parameters': parameters, 'regimes': regime_ids, 'rows': rows, 'intervals': intervals}
+
+
+def matching_windows(index, wanted):
+    """[start, end] windows of the intervals whose regime matches any of wanted.
+
+    A wanted value matches a regime id exactly or one of its parts, so
+    'steady' selects 'low-steady', 'normal-steady', ...
+    """
+    wanted = [wanted] if isinstance(wanted, str) else list(wanted)
+    chosen = {i for i, regime in enumerate(index['regimes'])
+              if any(w == regime or w in regime.split('-') for w in wanted)}
+    return [[start, end] for start, end, code in index['intervals'] if code in chosen]
+
+
+def intersect_windows(a, b):
+    """Overlap of two lists of [start, end] windows (None = open end; naive bounds are UTC)"""
+    def bounds(window):
+        start, end = window
+        return (parquet_search.utc_bound(start) if start is not None else pd.Timestamp.min.tz_localize('UTC'),
+                parquet_search.utc_bound(end) if end is not None else pd.Timestamp.max.tz_localize('UTC'))
+
+    result = []
+    for window_a in a:
+        start_a, end_a = bounds(window_a)
+        for window_b in b:
+            start_b, end_b = bounds(window_b)
+            start, end = max(start_a, start_b), min(end_a, end_b)
+            if start <= end:
+                result.append([start.isoformat(), end.isoformat()])
+    return result
+
+
+# ===========================
+# SIDECAR FILES
+# ===========================
+
+def sidecar_path(path):
+    return Path(str(path) + SIDECAR_SUFFIX)
+
+
+def _signature(path):
+    """Size/mtime of a file; for a plant folder, of all its Parquet files (a rewritten file changes it)"""
+    if Path(path).is_dir():
+        count, size, mtime_ns = plant_dataset.signature(path)
+        return {'files': count, 'size': size, 'mtime_ns': mtime_ns}
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def save_index(path, index):
+    """Store a regime index next to path (a file or plant folder), tagged with its size/mtime"""
+    target = sidecar_path(path)
+    # Unique per process and thread: the Flask servers may write the same sidecar from two requests at once
+    tmp_path = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': INDEX_VERSION, 'source': _signature(path), **index}, f)
+    os.replace(tmp_path, target)
+
+
+def load_index(path):
+    """The stored regime index for path, or None if missing or the file changed since"""
+    try:
+        with open(sidecar_path(path), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.pop('version', None) != INDEX_VERSION or index.pop('source', None) != _signature(path):
+        return None
+    return index
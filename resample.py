@@ -0,0 +1,112 @@
+"""
+Streaming resampling of historian exports onto a regular time grid.
+
+- Buckets are the timestamps floored to the interval, so files resampled
+  with the same interval (e.g. ANP2 and NAP2) share one grid
+- Aggregation per tag: mean, last, first, min, max, sum or median
+  (text columns default to last)
+- Empty buckets are kept as gaps; ffill_limit fills up to that many
+  intervals from the last value
+- Input arrives in chunks sorted by time. Only the newest, possibly
+  incomplete bucket (and ffill_limit rows of fill context) is held back
+  between chunks, so memory stays at one chunk however long the range is
+"""
+
+import pandas as pd
+
+AGGREGATIONS = ('mean', 'last', 'first', 'min', 'max', 'sum', 'median')
+
+
+class Resampler:
+    def __init__(self, interval, agg='mean', column_aggs=None, ffill_limit=0, timestamp_col='timestamp'):
+        """interval is a fixed duration ('1min', '10s', '1h'); column_aggs overrides agg per tag"""
+        self.interval = pd.Timedelta(interval)
+        if self.interval <= pd.Timedelta(0):
+            raise ValueError(f"Resample interval must be positive: {interval}")
+        self.agg = agg
+        self.column_aggs = dict(column_aggs or {})
+        for name in [agg] + list(self.column_aggs.values()):
+            if name not in AGGREGATIONS:
+                raise ValueError(f"Unknown aggregation {name!r} (choose from {', '.join(AGGREGATIONS)})")
+        self.ffill_limit = int(ffill_limit or 0)
+        self.timestamp_col = timestamp_col
+        self._carry = None    # rows of the newest bucket, which the next chunk may extend
+        self._context = None  # last unfilled output rows, for forward fill across chunks
+        self._next = None     # first bucket not yet emitted
+        self.rows_in = 0
+        self.rows_out = 0
+        self.late_rows = 0    # rows older than buckets already emitted (input not sorted)
+
+    def feed(self, frame):
+        """Add a chunk; returns the buckets it completed as a DataFrame, or None"""
+        if frame.empty:
+            return None
+        self.rows_in += len(frame)
+        frame = frame.copy(deep=False)
+        if not pd.api.types.is_datetime64_any_dtype(frame[self.timestamp_col]):
+            frame[self.timestamp_col] = pd.to_datetime(frame[self.timestamp_col])
+        if self._carry is not None:
+            frame = pd.concat([self._carry, frame], ignore_index=True)
+        if self._next is not None:
+            late = (frame[self.timestamp_col] < self._next).to_numpy()
+            if late.any():
+                self.late_rows += int(late.sum())
+                frame = frame[~late]
+        frame = frame[frame[self.timestamp_col].notna()]
+        if frame.empty:
+            self._carry = None
+            return None
+        buckets = frame[self.timestamp_col].dt.floor(self.interval)
+        complete = (buckets < buckets.max()).to_numpy()
+        self._carry = frame[~complete]
+        return self._emit(frame[complete], buckets[complete])
+
+    def finish(self):
+        """Emit the last bucket held back by feed; returns a DataFrame or None"""
+        carry, self._carry = self._carry, None
+        if carry is None or carry.empty:
+            return None
+        return self._emit(carry, carry[self.timestamp_col].dt.floor(self.interval))
+
+    def _aggregation(self, column, values):
+        if column in self.column_aggs:
+            return self.column_aggs[column]
+        return self.agg if pd.api.types.is_numeric_dtype(values) else 'last'
+
+    def _emit(self, rows, buckets):
+        if rows.empty:
+            return None
+        values = rows.drop(columns=self.timestamp_col)
+        aggs = {col: self._aggregation(col, values[col]) for col in values.columns}
+        out = values.groupby(buckets.to_numpy()).agg(aggs) if aggs else pd.DataFrame(index=buckets.unique())
+
+        # Regular grid from the first bucket not yet emitted; empty buckets become gaps
+        start = self._next if self._next is not None else out.index[0]
+        out = out.reindex(pd.date_range(start, out.index[-1], freq=self.interval))
+        self._next = out.index[-1] + self.interval
+
+        if self.ffill_limit:
+            unfilled = out
+            context = self._context if self._context is not None else out.iloc[0:0]
+            out = pd.concat([context, out]).ffill(limit=self.ffill_limit).iloc[len(context):]
+            # Keep earlier context too: an emit shorter than ffill_limit must not cut the fill short
+            self._context = pd.concat([context, unfilled]).iloc[-self.ffill_limit:]
+
+        out.index.name = self.timestamp_col
+        self.rows_out += len(out)
+        return out.reset_index()
+
+
+def resample_frames(frames, resampler=None, **options):
+    """Resample an iterable of time-sorted DataFrame chunks; yields the resampled chunks.
+
+    Pass a Resampler to read its counters (e.g. late_rows) afterwards.
+    """
+    resampler = resampler or Resampler(**options)
+    for frame in frames:
+        out = resampler.feed(frame)
+        if out is not None:
+            yield out
+    out = resampler.finish()
+    if out is not None:
+        yield out
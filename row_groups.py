@@ -0,0 +1,74 @@
+"""
+Row-group pruning for time-windowed Parquet reads.
+
+Shared by the converter (transform_parquet.py) and plant folders
+(plant_dataset.py):
+- the timestamp column of a schema is the one called 'timestamp', else the
+  first timestamp-typed field
+- row groups whose min/max timestamp statistics lie outside [start, end]
+  are skipped without decoding them
+- the rows of the remaining record batches are filtered exactly
+
+Naive bounds are UTC (parquet_search.utc_bound), as everywhere else in the
+tools, so a start/end selects the same instant whatever the column's
+timezone; they are converted to naive UTC for naive columns.
+"""
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import parquet_search
+
+
+def timestamp_column(schema):
+    """Name of the timestamp column: one called 'timestamp', else the first timestamp-typed field"""
+    for field in schema:
+        if field.name.lstrip('\ufeff').lower() == 'timestamp':
+            return field.name
+    for field in schema:
+        if pa.types.is_timestamp(field.type):
+            return field.name
+    return None
+
+
+def time_bound(value, arrow_type):
+    """Convert a user/statistics timestamp to a pandas Timestamp comparable with arrow_type (naive = UTC)"""
+    bound = parquet_search.utc_bound(value)
+    tz = getattr(arrow_type, 'tz', None)
+    return bound.tz_convert(tz) if tz else bound.tz_convert(None)
+
+
+def row_groups_in_range(parquet, timestamp_col, start=None, end=None):
+    """Indices of row groups whose timestamp statistics overlap [start, end].
+
+    Row groups without min/max statistics are kept and filtered row by row.
+    """
+    row_groups = list(range(parquet.metadata.num_row_groups))
+    if timestamp_col is None or (start is None and end is None):
+        return row_groups
+    ts_type = parquet.schema_arrow.field(timestamp_col).type
+    col_index = parquet.schema_arrow.get_field_index(timestamp_col)
+    kept = []
+    for i in row_groups:
+        stats = parquet.metadata.row_group(i).column(col_index).statistics
+        if stats is not None and stats.has_min_max:
+            if start is not None and time_bound(stats.max, ts_type) < start:
+                continue
+            if end is not None and time_bound(stats.min, ts_type) > end:
+                continue
+        kept.append(i)
+    return kept
+
+
+def filter_batch(batch, timestamp_col, start=None, end=None):
+    """Drop rows of a record batch outside [start, end]"""
+    if timestamp_col is None or (start is None and end is None):
+        return batch
+    ts = batch.column(batch.schema.get_field_index(timestamp_col))
+    mask = None
+    if start is not None:
+        mask = pc.greater_equal(ts, pa.scalar(start, type=ts.type))
+    if end is not None:
+        upper = pc.less_equal(ts, pa.scalar(end, type=ts.type))
+        mask = upper if mask is None else pc.and_(mask, upper)
+    return batch.filter(mask)
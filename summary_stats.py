@@ -0,0 +1,218 @@
+"""
+Per-column summary statistics persisted next to a data file.
+
+A sidecar "<file>.summary.json" holds, for every numeric column:
+- count, sum, min, max
+- mean and M2 (sum of squared deviations), merged with Chan's formula so
+  variance stays accurate for large offsets like flow totals
+- a t-digest style quantile sketch (centroid means and weights)
+
+Everything is mergeable: chunks of one file, or summaries of several files,
+combine without touching the data again. Mean/std/variance/min/max/count
+are exact; median and quartiles come from the sketch (well under 1% rank
+error at the default compression).
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+import table_io
+
+SIDECAR_SUFFIX = '.summary.json'
+SUMMARY_VERSION = 1
+DEFAULT_COMPRESSION = 400
+
+# Statistic names understood by ColumnSummary.result (same as the plotter UI)
+STAT_TYPES = ('mean', 'median', 'std', 'min', 'max', 'count', 'variance', 'q25', 'q75')
+
+
+def _compress(means, weights, compression):
+    """Merge centroids so at most ~compression/2 remain, finest at the tails"""
+    if len(means) == 0:
+        return means, weights
+    order = np.argsort(means, kind='mergesort')
+    means, weights = means[order], weights[order]
+    total = weights.sum()
+    mid_q = (np.cumsum(weights) - weights / 2) / total
+    # k1 scale function: equal steps in k are narrow near q=0 and q=1
+    k = compression / (2 * np.pi) * np.arcsin(np.clip(2 * mid_q - 1, -1, 1))
+    bucket = np.floor(k - k.min()).astype(np.int64)
+    merged_w = np.bincount(bucket, weights=weights)
+    keep = merged_w > 0
+    merged_m = np.bincount(bucket, weights=weights * means)[keep] / merged_w[keep]
+    return merged_m, merged_w[keep]
+
+
+class ColumnSummary:
+    """Mergeable summary of one numeric column"""
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.count = 0
+        self.sum = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.centroids = np.empty(0)
+        self.weights = np.empty(0)
+
+    def update(self, values):
+        """Add a chunk of values (NaN and infinities are ignored)"""
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        chunk = ColumnSummary(self.compression)
+        chunk.count = len(values)
+        chunk.sum = float(values.sum())
+        chunk.mean = chunk.sum / chunk.count
+        chunk.m2 = float(((values - chunk.mean) ** 2).sum())
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        chunk.centroids, chunk.weights = _compress(values, np.ones(len(values)), self.compression)
+        self.merge(chunk)
+
+    def merge(self, other):
+        """Fold another summary of the same column into this one"""
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.sum, self.mean, self.m2 = other.count, other.sum, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            self.centroids, self.weights = other.centroids.copy(), other.weights.copy()
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.centroids, self.weights = _compress(np.concatenate([self.centroids, other.centroids]),
+                                                 np.concatenate([self.weights, other.weights]),
+                                                 self.compression)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return float('nan')
+        # Centroid i sits at the middle of its cumulative weight; min/max anchor the ends
+        positions = np.cumsum(self.weights) - self.weights / 2
+        positions = np.concatenate([[0.0], positions, [float(self.count)]])
+        values = np.concatenate([[self.min], self.centroids, [self.max]])
+        return float(np.interp(q * self.count, positions, values))
+
+    def result(self, stats_types):
+        """Requested statistics as floats (count as int), like the plotter's per-column loop"""
+        nan = float('nan')
+        variance = self.m2 / (self.count - 1) if self.count > 1 else nan
+        available = {
+            'mean': lambda: self.mean if self.count else nan,
+            'median': lambda: self.quantile(0.5),
+            'std': lambda: float(np.sqrt(variance)),
+            'min': lambda: self.min if self.count else nan,
+            'max': lambda: self.max if self.count else nan,
+            'count': lambda: int(self.count),
+            'variance': lambda: variance,
+            'q25': lambda: self.quantile(0.25),
+            'q75': lambda: self.quantile(0.75),
+        }
+        return {stat: available[stat]() for stat in stats_types if stat in available}
+
+    def to_dict(self):
+        return {
+            'count': self.count, 'sum': self.sum, 'mean': self.mean, 'm2': self.m2,
+            'min': self.min, 'max': self.max,
+            'centroids': self.centroids.tolist(), 'weights': self.weights.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data, compression=DEFAULT_COMPRESSION):
+        summary = cls(compression)
+        summary.count, summary.sum, summary.mean, summary.m2 = data['count'], data['sum'], data['mean'], data['m2']
+        summary.min, summary.max = data['min'], data['max']
+        summary.centroids = np.asarray(data['centroids'], dtype=float)
+        summary.weights = np.asarray(data['weights'], dtype=float)
+        return summary
+
+
+def summarise_frame(df, summaries=None):
+    """Update (or create) {column: ColumnSummary} from the numeric columns of a DataFrame chunk"""
+    summaries = {} if summaries is None else summaries
+    for col in df.select_dtypes(include=[np.number]).columns:
+        summaries.setdefault(col, ColumnSummary()).update(df[col].to_numpy(dtype=float, na_value=np.nan))
+    return summaries
+
+
+def merge_summaries(summary_sets):
+    """Combine several {column: ColumnSummary} dicts (e.g. one per file) column by column"""
+    combined = {}
+    for summaries in summary_sets:
+        for col, summary in summaries.items():
+            combined.setdefault(col, ColumnSummary(summary.compression)).merge(summary)
+    return combined
+
+
+# ===========================
+# SIDECAR FILES
+# ===========================
+
+def sidecar_path(path):
+    return Path(str(path) + SIDECAR_SUFFIX)
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def write_summary(path, summaries):
+    """Persist summaries next to path, tagged with path's current size/mtime"""
+    content = {
+        'version': SUMMARY_VERSION,
+        'source': _signature(path),
+        'columns': {col: summary.to_dict() for col, summary in summaries.items()},
+    }
+    target = sidecar_path(path)
+    # Unique per process and thread: the Flask servers may write the same sidecar from two requests at once
+    tmp_path = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(content, f)
+    os.replace(tmp_path, target)
+
+
+def load_summary(path):
+    """Summaries from path's sidecar, or None if it is missing or the file has changed since"""
+    try:
+        with open(sidecar_path(path), 'r', encoding='utf-8') as f:
+            content = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if content.get('version') != SUMMARY_VERSION or content.get('source') != _signature(path):
+        return None
+    return {col: ColumnSummary.from_dict(data) for col, data in content['columns'].items()}
+
+
+def ensure_summary(path, df=None, frames=None):
+    """Load path's summary, computing and persisting it first if needed.
+
+    Uses df when the caller already has the file in memory, or frames (an
+    iterable of chunks, only consumed if needed) when the caller reads the
+    file its own way; otherwise streams the file in chunks.
+    """
+    summaries = load_summary(path)
+    if summaries is not None:
+        return summaries
+    if df is not None:
+        summaries = summarise_frame(df)
+    else:
+        summaries = {}
+        for chunk in (frames if frames is not None else table_io.iter_frames(path)):
+            summarise_frame(chunk, summaries)
+    write_summary(path, summaries)
+    return summaries
@@ -0,0 +1,329 @@
+"""
+Table readers and writers shared by the conversion, filter and plotter tools.
+
+Output formats (selected per run with --format):
+- csv       plain UTF-8 CSV (the original export)
+- csv.gz    gzip-compressed CSV
+- csv.zst   zstd-compressed CSV
+- feather   Arrow IPC file (lz4), loads without any text parsing
+- parquet   cleaned Parquet (zstd)
+
+Writers take pyarrow record batches so the conversion can stream; readers
+return pandas DataFrames for the Flask apps. CSV and Parquet files are read
+through their memory-mapped Arrow copy (columnar_cache.py), so each file
+is parsed once, not once per load and per app. A plant folder of Parquet
+exports (plant_dataset.py) reads like one table file.
+"""
+
+import csv
+import io
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+import columnar_cache
+import derived_tags
+import plant_dataset
+import resample
+import summary_stats
+
+# Format name -> file extension
+FORMATS = {
+    'csv': '.csv',
+    'csv.gz': '.csv.gz',
+    'csv.zst': '.csv.zst',
+    'feather': '.feather',
+    'parquet': '.parquet',
+}
+
+# Compression codec for compressed CSV formats
+CSV_COMPRESSION = {'csv': None, 'csv.gz': 'gzip', 'csv.zst': 'zstd'}
+
+DEFAULT_FORMAT = 'csv'
+
+# Rows per chunk when streaming a table through pandas
+DEFAULT_CHUNK_ROWS = 100_000
+
+
+def detect_format(path):
+    """Return the format name for a file path, or None if it is not a known table file"""
+    name = Path(path).name.lower()
+    # Longest extension first so .csv.gz is not mistaken for .gz/.csv
+    for fmt, ext in sorted(FORMATS.items(), key=lambda item: -len(item[1])):
+        if name.endswith(ext):
+            return fmt
+    return None
+
+
+def data_stem(path):
+    """File name without its (possibly compound) table extension"""
+    path = Path(path)
+    fmt = detect_format(path)
+    if fmt is None:
+        return path.name if path.is_dir() else path.stem
+    return path.name[:-len(FORMATS[fmt])]
+
+
+def data_size(path):
+    """Size in bytes of a table file, or of all Parquet files of a plant folder"""
+    if Path(path).is_dir():
+        return plant_dataset.signature(path)[1]
+    return Path(path).stat().st_size
+
+
+def output_path(directory, stem, fmt):
+    """Path of an output file named stem in directory for the given format"""
+    return Path(directory) / f"{stem}{FORMATS[fmt]}"
+
+
+def find_data_files(root, suffix=''):
+    """All table files (any known format) under root, sorted; optionally only stems ending in suffix"""
+    root = Path(root)
+    if not root.exists():
+        return []
+    return sorted(path for path in root.glob("**/*")
+                  if path.is_file() and detect_format(path) is not None and data_stem(path).endswith(suffix))
+
+
+# ===========================
+# WRITERS
+# ===========================
+
+class _TableWriter:
+    """Base class: context manager around an open output file"""
+
+    # Bytes held outside Arrow's memory pool for the last batch (pandas copy for CSV)
+    last_frame_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CSVTableWriter(_TableWriter):
+    """Append record batches to a (optionally compressed) UTF-8 CSV"""
+
+    def __init__(self, path, schema, compression=None, float_precision=None):
+        self.columns = list(schema.names)
+        self.float_format = f"%.{float_precision}g" if float_precision else None
+        if compression:
+            self._handle = io.TextIOWrapper(pa.output_stream(str(path), compression=compression),
+                                            encoding='utf-8', newline='')
+        else:
+            self._handle = open(path, 'w', encoding='utf-8', newline='')
+        self._header_written = False
+
+    def write_frame(self, df):
+        self.last_frame_bytes = int(df.memory_usage(index=False).sum())
+        df.to_csv(self._handle, index=False, header=not self._header_written, float_format=self.float_format)
+        self._header_written = True
+
+    def write_batch(self, batch):
+        self.write_frame(batch.to_pandas())
+
+    def close(self):
+        if not self._header_written:
+            self.write_frame(pd.DataFrame(columns=self.columns))
+        self._handle.close()
+
+
+class FeatherTableWriter(_TableWriter):
+    """Write record batches to an Arrow IPC (Feather v2) file"""
+
+    def __init__(self, path, schema, compression='lz4'):
+        self.schema = schema.remove_metadata()
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        self._writer = pa.ipc.new_file(str(path), self.schema, options=options)
+
+    def write_batch(self, batch):
+        self._writer.write_batch(batch.replace_schema_metadata(None))
+
+    def close(self):
+        self._writer.close()
+
+
+class ParquetTableWriter(_TableWriter):
+    """Write record batches to a Parquet file"""
+
+    def __init__(self, path, schema, compression='zstd'):
+        self.schema = schema.remove_metadata()
+        self._writer = pq.ParquetWriter(str(path), self.schema, compression=compression)
+
+    def write_batch(self, batch):
+        self._writer.write_batch(batch.replace_schema_metadata(None))
+
+    def close(self):
+        self._writer.close()
+
+
+def open_writer(path, fmt, schema, float_precision=None):
+    """Open a writer for fmt; float_precision (significant digits) applies to text formats only"""
+    if fmt in CSV_COMPRESSION:
+        return CSVTableWriter(path, schema, compression=CSV_COMPRESSION[fmt], float_precision=float_precision)
+    if fmt == 'feather':
+        return FeatherTableWriter(path, schema)
+    if fmt == 'parquet':
+        return ParquetTableWriter(path, schema)
+    raise ValueError(f"Unknown output format: {fmt}")
+
+
+# ===========================
+# READERS
+# ===========================
+
+def _open_text(path, fmt):
+    """Text stream over a (possibly compressed) CSV, BOM stripped"""
+    compression = CSV_COMPRESSION[fmt]
+    if compression:
+        return io.TextIOWrapper(pa.input_stream(str(path), compression=compression), encoding='utf-8-sig')
+    return open(path, 'r', encoding='utf-8-sig', newline='')
+
+
+def _plant(path):
+    """PlantDataset for a plant folder, or None for a file"""
+    if not Path(path).is_dir():
+        return None
+    return plant_dataset.PlantDataset(path)
+
+
+def read_columns(path):
+    """Column names of a table file (or plant folder) without reading its data"""
+    plant = _plant(path)
+    if plant is not None:
+        return plant.columns
+    fmt = detect_format(path)
+    if fmt in CSV_COMPRESSION:
+        with _open_text(path, fmt) as f:
+            return next(csv.reader(f), [])
+    if fmt == 'feather':
+        with pa.memory_map(str(path), 'r') as source:
+            return list(pa.ipc.open_file(source).schema.names)
+    if fmt == 'parquet':
+        return list(pq.read_schema(path).names)
+    raise ValueError(f"Unsupported file type: {path}")
+
+
+def read_dataframe(path, columns=None, dtype=None):
+    """Load a table file (any known format) into pandas, optionally only some columns.
+
+    dtype ({column: dtype}) converts columns in Arrow, before pandas sees
+    them, so they are never materialised in a wider type first. Timestamp
+    text from CSV sources arrives unparsed (columnar_cache keeps it as
+    written); callers that need datetimes convert it.
+    """
+    plant = _plant(path)
+    fmt = detect_format(path)
+    if plant is not None:
+        df = plant.read(columns)
+        return df.astype({name: kind for name, kind in dtype.items() if name in df.columns}) if dtype else df
+    if fmt in CSV_COMPRESSION or fmt == 'parquet':
+        table = columnar_cache.read_table(path, fmt, columns)
+    elif fmt == 'feather':
+        table = feather.read_table(str(path), columns=columns, memory_map=True)
+    else:
+        raise ValueError(f"Unsupported file type: {path}")
+    if dtype:
+        table = _cast_columns(table, dtype)
+    # split_blocks avoids consolidating columns into one block (a full copy)
+    return table.to_pandas(split_blocks=True)
+
+
+def _cast_columns(table, dtype):
+    """table with the columns named in dtype ({column: numpy dtype or 'category'}) converted.
+
+    A column whose values no longer fit its dtype is left as it is.
+    """
+    for name, kind in dtype.items():
+        index = table.schema.get_field_index(name)
+        if index < 0:
+            continue
+        column = table.column(index)
+        try:
+            if kind == 'category':
+                converted = column if pa.types.is_dictionary(column.type) else pc.dictionary_encode(column)
+            else:
+                converted = column.cast(pa.from_numpy_dtype(np.dtype(kind)))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, TypeError):
+            continue
+        table = table.set_column(index, name, converted)
+    return table
+
+
+def iter_frames(path, columns=None, chunksize=DEFAULT_CHUNK_ROWS):
+    """Yield a table file as DataFrame chunks, parsing only the requested columns.
+
+    Chunks come back with columns in the requested order (CSV usecols would
+    otherwise return them in file order).
+    """
+    plant = _plant(path)
+    fmt = detect_format(path)
+    if plant is not None:
+        frames = plant.iter_frames(columns, chunksize=chunksize)
+    elif fmt in CSV_COMPRESSION or fmt == 'parquet':
+        table = columnar_cache.read_table(path, fmt, columns)
+        frames = (batch.to_pandas() for batch in table.to_batches(max_chunksize=chunksize))
+    elif fmt == 'feather':
+        frames = _iter_feather_frames(path, columns)
+    else:
+        raise ValueError(f"Unsupported file type: {path}")
+    for frame in frames:
+        yield frame[columns] if columns is not None else frame
+
+
+def _iter_feather_frames(path, columns):
+    with pa.memory_map(str(path), 'r') as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(columns)
+            yield batch.to_pandas()
+
+
+def write_projected_csv(src, dst, columns, chunksize=DEFAULT_CHUNK_ROWS, definitions_file=None, resample_options=None):
+    """Stream the given columns of src into a new CSV at dst, one chunk at a time.
+
+    Memory stays at one chunk regardless of file size. Module-level so it
+    can run in a worker process. Columns that are not in src but are
+    derived tags in definitions_file are computed per chunk, and
+    resample_options (resample.Resampler keyword arguments) puts the output
+    on a regular time grid. The numeric columns are summarised on the way
+    (summary_stats.py) into dst's summary sidecar, so the plotter, which
+    lists these outputs, answers statistics without reading them again.
+    Returns {'rows', 'seconds', 'late_rows'}; late_rows counts out-of-order
+    rows the resampler had to drop.
+    """
+    started = time.perf_counter()
+    rows = 0
+    header = True
+    summaries = {}
+    definitions = derived_tags.load_definitions(definitions_file) if definitions_file else {}
+    derived = [col for col in derived_tags.available(read_columns(src), definitions) if col in columns]
+    needed = list(dict.fromkeys([col for col in columns if col not in derived] +
+                                derived_tags.required_columns(derived, definitions)))
+    chunks = iter_frames(src, needed, chunksize)
+    if derived:
+        chunks = (derived_tags.add_derived(chunk, derived, definitions)[columns] for chunk in chunks)
+    resampler = None
+    if resample_options:
+        resampler = resample.Resampler(**resample_options)
+        chunks = resample.resample_frames(chunks, resampler)
+    with open(dst, 'w', encoding='utf-8', newline='') as f:
+        for chunk in chunks:
+            chunk.to_csv(f, index=False, header=header)
+            summary_stats.summarise_frame(chunk, summaries)
+            header = False
+            rows += len(chunk)
+        if header:
+            pd.DataFrame(columns=columns).to_csv(f, index=False)
+    summary_stats.write_summary(dst, summaries)
+    return {'rows': rows, 'seconds': time.perf_counter() - started,
+            'late_rows': resampler.late_rows if resampler is not None else 0}
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The tools are top-level modules in the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# The tools log to error_log.txt in the working directory; keep test runs out of the repo's log
+os.chdir(tempfile.mkdtemp(prefix='parquet_tools_tests_'))
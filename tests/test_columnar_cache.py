@@ -0,0 +1,96 @@
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+import columnar_cache
+import table_io
+
+ROWS = 200_000  # well past the first 1 MB block (INFER_BYTES is lowered to that below)
+
+
+def _mixed_csv(path):
+    lines = ["timestamp,counter,flow,status"]
+    for i in range(ROWS):
+        lines.append(f"2025-07-01T00:00:{i % 60:02d},{i},{i}.5,{i % 3}")
+    # PI exports: an int-looking tag that turns float, and error text in a numeric tag
+    lines.append("2025-07-01T00:00:00,1.25,Bad Input,2")
+    path.write_text("\n".join(lines) + "\n", encoding='utf-8')
+
+
+def test_later_block_widens_columns_without_whole_file_read(tmp_path, monkeypatch):
+    src = tmp_path / 'pi_data.csv'
+    _mixed_csv(src)
+    monkeypatch.setattr(columnar_cache, 'INFER_BYTES', 1 << 20)
+
+    def no_whole_file_read(*args, **kwargs):
+        raise AssertionError("whole-file CSV read")
+    monkeypatch.setattr(pa_csv, 'read_csv', no_whole_file_read)
+
+    table = columnar_cache.read_table(src, 'csv')
+    assert table.num_rows == ROWS + 1
+    assert table.schema.field('counter').type == pa.float64()
+    assert table.schema.field('flow').type == pa.string()
+    assert table.schema.field('status').type == pa.int64()
+    assert table.column('counter')[-1].as_py() == 1.25
+    assert table.column('flow')[-1].as_py() == 'Bad Input'
+    assert columnar_cache.cache_path(src).exists()
+
+
+def test_many_widened_columns_take_one_extra_pass(tmp_path, monkeypatch):
+    src = tmp_path / 'pi_data.csv'
+    lines = ["timestamp," + ",".join(f"tag{j}" for j in range(6))]
+    lines += [f"2025-07-01T00:00:{i % 60:02d}," + ",".join(str(i + j) for j in range(6)) for i in range(ROWS)]
+    lines.append("2025-07-01T00:00:00," + ",".join(['0.5', 'Bad Input'] * 3))
+    src.write_text("\n".join(lines) + "\n", encoding='utf-8')
+    monkeypatch.setattr(columnar_cache, 'INFER_BYTES', 1 << 20)
+    passes = []
+    real_open_csv = pa_csv.open_csv
+
+    def open_csv(*args, **kwargs):
+        passes.append(1)
+        return real_open_csv(*args, **kwargs)
+    monkeypatch.setattr(pa_csv, 'open_csv', open_csv)
+
+    table = columnar_cache.read_table(src, 'csv')
+    # inference, first attempt, re-typing pass, final write - not one re-parse per widened column
+    assert len(passes) == 4
+    assert [table.schema.field(f"tag{j}").type for j in range(6)] == [pa.float64(), pa.string()] * 3
+
+
+def test_disabled_cache_reads_directly(tmp_path, monkeypatch):
+    src = tmp_path / 'pi_data.csv'
+    _mixed_csv(src)
+    monkeypatch.setattr(columnar_cache, 'ENABLED', False)
+    monkeypatch.setattr(columnar_cache, 'INFER_BYTES', 1 << 20)
+
+    table = columnar_cache.read_table(src, 'csv', ['timestamp', 'flow'])
+    assert table.num_rows == ROWS + 1
+    assert table.column('flow')[-1].as_py() == 'Bad Input'
+    assert not list(tmp_path.glob('*.arrow'))
+
+
+def test_mixed_column_text_survives_filtering(tmp_path):
+    src = tmp_path / 'pi_data.csv'
+    _mixed_csv(src)
+    dst = tmp_path / 'pi_data_filtered.csv'
+    table_io.write_projected_csv(src, dst, ['timestamp', 'flow'])
+    expected = [','.join(line.split(',')[0:3:2]) for line in src.read_text(encoding='utf-8').splitlines()]
+    assert dst.read_text(encoding='utf-8').splitlines() == expected
+
+
+def test_unwritable_folder_uses_fallback_copy(tmp_path, monkeypatch):
+    src = tmp_path / 'pi_data.csv'
+    src.write_text("timestamp,x\n2025-07-01T00:00:00,1\n", encoding='utf-8')
+    monkeypatch.setattr(columnar_cache, 'FALLBACK_DIR', tmp_path / 'fallback')
+    monkeypatch.setattr(columnar_cache, 'cache_path', lambda path: tmp_path / 'missing' / 'x' / 'copy.arrow')
+    real_mkdir = Path.mkdir
+
+    def mkdir(self, *args, **kwargs):
+        if 'missing' in self.parts:
+            raise PermissionError(self)
+        return real_mkdir(self, *args, **kwargs)
+    monkeypatch.setattr(Path, 'mkdir', mkdir)
+
+    assert columnar_cache.read_table(src, 'csv').num_rows == 1
+    assert list((tmp_path / 'fallback').glob('*.arrow'))
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+import compare_plants
+
+
+def _local_data(rows=600):
+    timestamps = pd.date_range('2025-07-01 00:00', periods=rows, freq='min', tz='Europe/Berlin')
+    return pd.DataFrame({'timestamp': timestamps, 'flow': np.arange(rows, dtype=float)})
+
+
+def _rows(path, start, end):
+    frames = list(compare_plants._source_frames(path, ['flow'], start, end))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def test_plant_and_file_windows_read_naive_bounds_as_utc(tmp_path):
+    df = _local_data()
+    plant = tmp_path / 'ANP2'
+    plant.mkdir()
+    df.to_parquet(plant / 'pi_data_0.parquet', row_group_size=100)
+    csv = tmp_path / 'pi_data.csv'
+    df.to_csv(csv, index=False)
+
+    # Naive bounds are UTC, as in the plotter: 23:00-00:00 UTC is 01:00-02:00 local (+02:00), rows 60..120
+    for path in (plant, csv):
+        rows = _rows(path, '2025-06-30 23:00', '2025-07-01 00:00')
+        assert rows['flow'].tolist() == list(np.arange(60.0, 121.0))
+        # Timestamps come out as naive UTC
+        assert rows['timestamp'].iloc[0] == pd.Timestamp('2025-06-30 23:00')
+
+
+def test_aware_bounds_select_the_same_instant(tmp_path):
+    csv = tmp_path / 'pi_data.csv'
+    _local_data().to_csv(csv, index=False)
+    rows = _rows(csv, '2025-07-01T01:00:00+02:00', None)
+    assert rows['flow'].iloc[0] == 60.0
+    assert rows['flow'].tolist() == _rows(csv, '2025-06-30 23:00', None)['flow'].tolist()
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import correlation
+
+
+def _frame(rows=3000):
+    rng = np.random.default_rng(11)
+    base = rng.normal(size=rows)
+    df = pd.DataFrame({
+        'flow': 1e6 + 50 * base,                          # large offset, small spread
+        'temp': 0.8 * base + rng.normal(size=rows),
+        'press': -base + 0.1 * rng.normal(size=rows),
+        'late': rng.normal(size=rows),
+        'const': np.full(rows, 7.0),
+    })
+    # Gaps of different lengths, some crossing chunk boundaries
+    df.loc[df.index % 7 == 0, 'temp'] = np.nan
+    df.loc[500:1400, 'press'] = np.nan
+    df.loc[:1100, 'late'] = np.nan                        # missing from the whole first chunk
+    return df
+
+
+@pytest.mark.parametrize('chunk_rows', [1000, 333, 3000])
+def test_chunked_matrix_matches_pandas(chunk_rows):
+    df = _frame()
+    columns = list(df.columns)
+    accumulator = correlation.CorrelationAccumulator(columns)
+    for i in range(0, len(df), chunk_rows):
+        accumulator.update(df.iloc[i:i + chunk_rows])
+    matrix, counts = accumulator.result()
+
+    expected = df.corr(min_periods=correlation.MIN_PERIODS)
+    np.testing.assert_allclose(matrix, expected.to_numpy(), atol=1e-9, equal_nan=True)
+    present = df.notna().to_numpy(dtype=int)
+    np.testing.assert_array_equal(counts, present.T @ present)
+    assert accumulator.rows == len(df)
+
+
+def test_constant_column_has_no_correlation():
+    df = _frame()
+    accumulator = correlation.CorrelationAccumulator(df.columns)
+    accumulator.update(df)
+    matrix, counts = accumulator.result()
+    k = list(df.columns).index('const')
+    assert np.isnan(matrix[k]).all() and np.isnan(matrix[:, k]).all()
+    assert counts[k, k] == len(df)
+
+
+def test_text_and_absent_columns_count_as_missing():
+    df = pd.DataFrame({'a': np.arange(10.0), 'b': np.arange(10.0) ** 2, 'status': ['ok'] * 10})
+    accumulator = correlation.CorrelationAccumulator(['a', 'b', 'status', 'absent'])
+    accumulator.update(df)
+    matrix, counts = accumulator.result()
+    assert matrix[0, 1] == pytest.approx(df['a'].corr(df['b']))
+    assert np.isnan(matrix[2:]).all() and (counts[2:] == 0).all()
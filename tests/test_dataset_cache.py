@@ -0,0 +1,98 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset_cache import DatasetCache
+
+ROWS = 1000
+
+
+def _frame():
+    return pd.DataFrame({'x': np.zeros(ROWS)})
+
+
+FRAME_BYTES = int(_frame().memory_usage(deep=True).sum())
+
+
+def _files(tmp_path, *names):
+    paths = []
+    for name in names:
+        path = tmp_path / f"{name}.csv"
+        path.write_text(name, encoding='utf-8')
+        paths.append(str(path))
+    return paths
+
+
+def test_least_recently_used_frames_are_evicted_by_bytes(tmp_path):
+    a, b, c = _files(tmp_path, 'a', 'b', 'c')
+    loads = []
+    cache = DatasetCache(lambda path: loads.append(path) or _frame(), max_bytes=int(2.5 * FRAME_BYTES))
+    cache.get(a)
+    cache.get(b)
+    cache.get(a)  # a is now more recently used than b
+    cache.get(c)
+    assert cache.peek(b) is None
+    assert cache.peek(a) is not None and cache.peek(c) is not None
+    stats = cache.stats()
+    assert [entry['dataset_id'] for entry in stats['entries']] == [c, a]
+    assert (stats['misses'], stats['evictions']) == (3, 1)
+    cache.get(b)
+    assert loads == [a, b, c, b]
+
+
+def test_frame_larger_than_the_budget_is_still_kept(tmp_path):
+    a, b = _files(tmp_path, 'a', 'b')
+    cache = DatasetCache(lambda path: _frame(), max_bytes=FRAME_BYTES // 2)
+    cache.get(a)
+    frame = cache.get(b)
+    assert cache.peek(a) is None and cache.peek(b) is frame
+
+
+def test_changed_file_is_reloaded(tmp_path):
+    a, = _files(tmp_path, 'a')
+    cache = DatasetCache(lambda path: pd.read_csv(path, header=None), max_bytes=10 ** 6)
+    assert cache.get(a).iloc[0, 0] == 'a'
+    with open(a, 'w', encoding='utf-8') as f:
+        f.write('changed')
+    assert cache.get(a).iloc[0, 0] == 'changed'
+
+
+def test_failing_loader_leaves_no_lock_and_is_retried(tmp_path):
+    a, = _files(tmp_path, 'a')
+    attempts = []
+
+    def loader(path):
+        attempts.append(path)
+        if len(attempts) == 1:
+            raise OSError("file in use")
+        return _frame()
+    cache = DatasetCache(loader, max_bytes=10 ** 6)
+    with pytest.raises(OSError, match="file in use"):
+        cache.get(a)
+    assert cache._loading == {}
+    assert cache.peek(a) is None
+    assert len(cache.get(a)) == ROWS
+    assert cache._loading == {} and len(attempts) == 2
+
+
+def test_concurrent_requests_share_one_load(tmp_path):
+    a, = _files(tmp_path, 'a')
+    loads = []
+
+    def loader(path):
+        loads.append(path)
+        time.sleep(0.2)
+        return _frame()
+    cache = DatasetCache(loader, max_bytes=10 ** 6)
+    frames = []
+    threads = [threading.Thread(target=lambda: frames.append(cache.get(a))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+    assert all(frame is frames[0] for frame in frames)
+    assert cache._loading == {}
@@ -0,0 +1,87 @@
+import json
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import derived_tags
+from derived_tags import DerivedTag
+
+EXPRESSION = "where(`a` > 0, sqrt(abs(`a`)) + log10(`b`), -`a` * exp(`b` / 100)) % 7 - `b` ** 2"
+
+
+def _frame():
+    rng = np.random.default_rng(3)
+    a = rng.normal(0, 10, 1000)
+    a[::50] = np.nan
+    return pd.DataFrame({'a': a, 'b': rng.uniform(1, 100, 1000)})
+
+
+@pytest.mark.parametrize('expression, message', [
+    ("`a`.real", "Attribute is not allowed"),
+    ("`a`.__class__", "Attribute is not allowed"),
+    ("__import__('os')", "only abs, sqrt, exp, log, log10, where can be called"),
+    ("max(`a`, 1)", "only abs, sqrt, exp, log, log10, where can be called"),
+    ("open", "unknown name 'open'"),
+    ("a + 1", "unknown name 'a' (put tag names in backticks)"),
+    ("`a` + 'text'", "only numeric constants are allowed"),
+    ("[`a`][0]", "Subscript is not allowed"),
+    ("lambda: 1", "Lambda is not allowed"),
+    ("`a` +", "invalid expression"),
+])
+def test_expressions_outside_the_whitelist_are_rejected(expression, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        DerivedTag('bad', expression)
+
+
+@pytest.mark.parametrize('raw, chain', [
+    ({'a2': "`a1` + 1", 'a1': "`a2` * 2"}, "a2 -> a1 -> a2"),
+    ({'a1': "`a1` + `x`"}, "a1 -> a1"),
+])
+def test_cycles_are_rejected_when_definitions_load(tmp_path, raw, chain):
+    path = tmp_path / 'derived_tags.json'
+    path.write_text(json.dumps(raw), encoding='utf-8')
+    with pytest.raises(ValueError, match=f"Derived tags depend on each other: {chain}"):
+        derived_tags.load_definitions(path)
+
+
+def test_cyclic_tags_are_not_offered():
+    definitions = {'loop': DerivedTag('loop', "`loop` + `x`"), 'twice': DerivedTag('twice', "2 * `x`")}
+    assert derived_tags.available(['x'], definitions) == ['twice']
+
+
+def test_derived_tags_are_evaluated_in_dependency_order():
+    definitions = {'ratio': DerivedTag('ratio', "`total` / `b`"), 'total': DerivedTag('total', "`a` + `b`")}
+    df = _frame()
+    assert derived_tags.required_columns(['ratio'], definitions) == ['a', 'b']
+    result = derived_tags.add_derived(df, ['ratio'], definitions)
+    assert list(result.columns) == ['a', 'b', 'ratio']  # the intermediate tag is not added
+    np.testing.assert_allclose(result['ratio'], (df['a'] + df['b']) / df['b'])
+
+
+def test_numpy_result_matches_a_direct_calculation(monkeypatch):
+    monkeypatch.setattr(derived_tags, 'numexpr', None)
+    df = _frame()
+    a, b = df['a'].to_numpy(), df['b'].to_numpy()
+    with np.errstate(invalid='ignore'):
+        expected = np.where(a > 0, np.sqrt(np.abs(a)) + np.log10(b), -a * np.exp(b / 100)) % 7 - b ** 2
+    result = derived_tags.evaluate(df, ['x'], {'x': DerivedTag('x', EXPRESSION)})['x']
+    np.testing.assert_allclose(result, expected, equal_nan=True)
+
+
+def test_numexpr_and_numpy_give_the_same_result(monkeypatch):
+    numexpr = pytest.importorskip('numexpr')
+    df = _frame()
+    definitions = {'x': DerivedTag('x', EXPRESSION)}
+    monkeypatch.setattr(derived_tags, 'numexpr', numexpr)
+    fast = derived_tags.evaluate(df, ['x'], definitions)['x']
+    monkeypatch.setattr(derived_tags, 'numexpr', None)
+    fallback = derived_tags.evaluate(df, ['x'], definitions)['x']
+    np.testing.assert_allclose(fast, fallback, rtol=1e-12, equal_nan=True)
+
+
+def test_text_in_an_input_counts_as_missing():
+    df = pd.DataFrame({'a': ['1.5', 'Bad Input', '2'], 'b': [1.0, 1.0, 1.0]})
+    result = derived_tags.evaluate(df, ['s'], {'s': DerivedTag('s', "`a` + `b`")})['s']
+    np.testing.assert_array_equal(result, [2.5, np.nan, 3.0])
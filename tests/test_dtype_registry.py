@@ -0,0 +1,102 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import dtype_registry
+import table_io
+import transform_parquet
+
+
+def _write_source(path):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'timestamp': pd.date_range('2025-07-01', periods=500, freq='min').strftime('%Y-%m-%dT%H:%M:%S'),
+        'flow': rng.random(500).astype(np.float32),  # written as its shortest repr, like the converter's CSVs
+        'precise': rng.random(500),
+        'counter': np.arange(500) % 100,
+        'status': rng.choice(['Good', 'Bad Input'], 500),
+    })
+    df.to_csv(path, index=False)
+    return df
+
+
+def test_registered_columns_load_compact_without_astype(tmp_path, monkeypatch):
+    src = tmp_path / 'pi_data.csv'
+    source = _write_source(src)
+    first = dtype_registry.read_dataframe(src)
+    assert dtype_registry.load_dtypes(src) is not None
+
+    # The second load converts in Arrow; pandas never holds a wide copy to narrow
+    def no_astype(*args, **kwargs):
+        raise AssertionError("astype on load")
+    monkeypatch.setattr(pd.DataFrame, 'astype', no_astype)
+    monkeypatch.setattr(pd.Series, 'astype', no_astype)
+    second = dtype_registry.read_dataframe(src)
+    monkeypatch.undo()
+
+    assert second['flow'].dtype == np.float32
+    assert second['precise'].dtype == np.float64
+    assert second['counter'].dtype == np.int8
+    assert isinstance(second['status'].dtype, pd.CategoricalDtype)
+    assert (second.dtypes == first.dtypes).all()
+    assert np.allclose(second['flow'].astype(float), source['flow'], rtol=1e-6)
+    assert second['status'].astype(str).tolist() == source['status'].tolist()
+
+
+def test_values_that_no_longer_fit_are_kept(tmp_path):
+    src = tmp_path / 'pi_data.csv'
+    source = _write_source(src)
+    dtype_registry.read_dataframe(src)
+    dtypes = dtype_registry.load_dtypes(src)
+    dtypes['precise'] = 'int8'  # stale registry entry
+    df = table_io.read_dataframe(src, dtype=dtype_registry._parse_hints(dtypes))
+    assert df['precise'].dtype == np.float64
+    assert np.allclose(df['precise'], source['precise'])
+
+
+def test_unparsed_timestamps_are_written_back_as_in_the_source(tmp_path):
+    src = tmp_path / 'pi_data.csv'
+    text = ['2025-07-01T00:00:00.500+02:00', '2025-07-01T00:00:01.250+02:00', '2025-07-01T00:00:02+02:00']
+    pd.DataFrame({'timestamp': text, 'flow': [0.1, 0.2, 0.3]}).to_csv(src, index=False)
+    for _ in range(2):  # first load builds the registry, the second uses it
+        df = dtype_registry.read_dataframe(src, parse_dates=False)
+        out = tmp_path / 'out.csv'
+        df.to_csv(out, index=False)
+        assert pd.read_csv(out, dtype=str)['timestamp'].tolist() == text
+    assert dtype_registry.load_dtypes(src)['timestamp'] == 'datetime64'
+
+
+def test_converter_csv_output_registers_float32(tmp_path):
+    rng = np.random.default_rng(0)
+    plant = tmp_path / 'ANP2'
+    plant.mkdir()
+    source = pd.DataFrame({
+        'timestamp': pd.date_range('2025-07-01', periods=500, freq='min', tz='UTC'),
+        'flow': (rng.random(500) * 100).astype(np.float32),
+        'level': np.float32([0.1, 0.2, 12.5, -3.75, 1e-7] * 100),
+        'precise': rng.random(500),
+        'counter': (np.arange(500) % 100).astype(np.int32),
+    })
+    source.to_parquet(plant / 'pi_data_0.parquet')
+    _, info, _ = transform_parquet._convert_file(plant / 'pi_data_0.parquet', output_dir=tmp_path / 'csv_output')
+    csv = Path(info['output_path'])
+
+    dtype_registry.read_dataframe(csv)
+    dtypes = dtype_registry.load_dtypes(csv)
+    assert (dtypes['flow'], dtypes['level'], dtypes['precise']) == ('float32', 'float32', 'float64')
+    df = dtype_registry.read_dataframe(csv)
+    assert df['flow'].dtype == np.float32
+    assert np.array_equal(df['flow'].to_numpy(), source['flow'].to_numpy())
+    assert np.array_equal(df['level'].to_numpy(), source['level'].to_numpy())
+    # Written back out, the float32 columns print as the converter wrote them
+    out = tmp_path / 'out.csv'
+    df.to_csv(out, index=False)
+    assert pd.read_csv(out, dtype=str)[['flow', 'level']].equals(pd.read_csv(csv, dtype=str)[['flow', 'level']])
+
+
+def test_parquet_sources_keep_their_schema_widths(tmp_path):
+    path = tmp_path / 'pi_data.parquet'
+    pd.DataFrame({'half': np.float32([0.5, 1.5]), 'double': [0.5, 1.5], 'small': np.int64([1, 2])}).to_parquet(path)
+    dtype_registry.read_dataframe(path)
+    assert dtype_registry.load_dtypes(path) == {'half': 'float32', 'double': 'float64', 'small': 'int64'}
@@ -0,0 +1,85 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import log_writer
+from log_writer import LogWriter
+
+REPO = Path(__file__).resolve().parent.parent
+
+# A child process logging lines and exiting without flush(): the atexit flush must write them all
+CHILD = """
+import sys
+from log_writer import get_logger
+logger = get_logger(sys.argv[1], source='child', echo=False)
+for i in range(int(sys.argv[2])):
+    logger.log(f"[INFO] line {i}", i=i)
+"""
+
+
+def _records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def _children(path, count, lines):
+    env = {**os.environ, 'PYTHONPATH': str(REPO)}
+    return [subprocess.Popen([sys.executable, '-c', CHILD, str(path), str(lines)], env=env) for _ in range(count)]
+
+
+def test_records_are_json_lines_and_none_are_lost(tmp_path):
+    path = tmp_path / 'error_log.txt'
+    writer = LogWriter(path, source='test', echo=False)
+    for i in range(2500):  # more than one batch
+        writer.log("[ERROR] bad file" if i % 10 == 0 else f"line {i}", timestamp='2025-07-01 00:00:00', i=i)
+    writer.flush()
+
+    records = _records(path)
+    assert [record['i'] for record in records] == list(range(2500))
+    assert records[0] == {'time': '2025-07-01 00:00:00', 'level': 'ERROR', 'source': 'test', 'pid': os.getpid(),
+                          'message': '[ERROR] bad file', 'i': 0}
+    assert records[1]['level'] == 'INFO'
+    assert writer.dropped == 0
+
+
+def test_file_is_rotated_by_size_and_on_request(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_writer, 'FLUSH_INTERVAL', 0.01)
+    path = tmp_path / 'error_log.txt'
+    writer = LogWriter(path, echo=False, max_bytes=1000, backups=2)
+    for i in range(40):
+        writer.log(f"line {i}", i=i)
+        writer.flush()  # one record per batch, so each append checks the size
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['error_log.txt', 'error_log.txt.1', 'error_log.txt.2']
+    assert all(p.stat().st_size <= 1000 for p in tmp_path.iterdir())
+    kept = [record['i'] for name in ('error_log.txt.2', 'error_log.txt.1', 'error_log.txt')
+            for record in _records(tmp_path / name)]
+    assert kept == list(range(40 - len(kept), 40))  # only the oldest records were rotated away
+
+    writer.log("before", i=40)
+    writer.rotate()
+    writer.log("after", i=41)
+    writer.flush()
+    assert [record['message'] for record in _records(path)] == ['after']
+    assert _records(tmp_path / 'error_log.txt.1')[-1]['message'] == 'before'
+
+
+def test_queued_records_are_written_at_exit(tmp_path):
+    path = tmp_path / 'error_log.txt'
+    child, = _children(path, 1, 3000)
+    assert child.wait(timeout=60) == 0
+    assert [record['i'] for record in _records(path)] == list(range(3000))
+
+
+def test_processes_writing_at_once_do_not_interleave_lines(tmp_path):
+    path = tmp_path / 'error_log.txt'
+    children = _children(path, 4, 2000)
+    assert [child.wait(timeout=60) for child in children] == [0] * 4
+
+    records = _records(path)  # every line parses: no line was split by another process's write
+    by_pid = {}
+    for record in records:
+        by_pid.setdefault(record['pid'], []).append(record['i'])
+    assert sorted(by_pid) == sorted(child.pid for child in children)
+    assert all(lines == list(range(2000)) for lines in by_pid.values())
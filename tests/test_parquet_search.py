@@ -0,0 +1,68 @@
+from pathlib import Path
+
+import pandas as pd
+
+import parquet_search
+
+
+def _export(path, rows=240):
+    timestamps = pd.date_range('2025-07-01 00:00', periods=rows, freq='min', tz='Europe/Berlin')
+    pd.DataFrame({'timestamp': timestamps, 'x': range(rows)}).to_parquet(path, row_group_size=60)
+
+
+def test_tag_search_reads_naive_bounds_as_utc(tmp_path):
+    path = tmp_path / 'pi_data_0.parquet'
+    _export(path)
+    files = [parquet_search.scan_file_metadata(str(path))]
+    # 23:30-00:10 UTC is 01:30-02:10 local (+02:00): the second and third hour's row groups
+    matches = parquet_search.find_tag_files(files, 'x', '2025-06-30T23:30:00', '2025-07-01T00:10:00')
+    assert matches[0]['row_groups'] == [1, 2]
+    aware = parquet_search.find_tag_files(files, 'x', '2025-07-01T01:30:00+02:00', '2025-07-01T02:10:00+02:00')
+    assert aware[0]['row_groups'] == [1, 2]
+
+
+def _plant(tmp_path):
+    plant = tmp_path / 'ANP2'
+    plant.mkdir()
+    for i in range(3):
+        _export(plant / f"pi_data_{i}.parquet")
+    return plant
+
+
+def test_catalog_rereads_only_changed_files(tmp_path, monkeypatch):
+    plant = _plant(tmp_path)
+    files, counts = parquet_search.refresh_catalog(str(plant))
+    assert (counts['cached'], counts['refreshed'], counts['removed']) == (0, 3, 0)
+    catalog = plant / parquet_search.CATALOG_NAME
+    written = catalog.stat().st_mtime_ns
+
+    def no_footer_read(path):
+        raise AssertionError(f"footer of {path} read again")
+    monkeypatch.setattr(parquet_search, 'scan_file_metadata', no_footer_read)
+    reused, counts = parquet_search.refresh_catalog(str(plant))
+    assert (counts['cached'], counts['refreshed'], counts['removed']) == (3, 0, 0)
+    assert reused == files
+    assert catalog.stat().st_mtime_ns == written  # nothing changed, nothing rewritten
+    monkeypatch.undo()
+
+    _export(plant / 'pi_data_1.parquet', rows=120)
+    (plant / 'pi_data_2.parquet').unlink()
+    files, counts = parquet_search.refresh_catalog(str(plant))
+    assert (counts['cached'], counts['refreshed'], counts['removed']) == (1, 1, 1)
+    assert [info['num_rows'] for info in files] == [240, 120]
+
+
+def test_file_deleted_during_a_refresh_is_dropped(tmp_path, monkeypatch):
+    plant = _plant(tmp_path)
+    parquet_search.refresh_catalog(str(plant))
+    listed = parquet_search.list_parquet_files(str(plant))
+    gone = plant / 'pi_data_0.parquet'
+
+    def list_then_delete(root):
+        # Deleted after the listing, before its stat
+        gone.unlink()
+        return listed
+    monkeypatch.setattr(parquet_search, 'list_parquet_files', list_then_delete)
+    files, counts = parquet_search.refresh_catalog(str(plant))
+    assert counts['removed'] == 1
+    assert [Path(info['path']).name for info in files] == ['pi_data_1.parquet', 'pi_data_2.parquet']
@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+
+import plant_dataset
+
+
+def _plant(tmp_path):
+    plant = tmp_path / 'ANP2'
+    plant.mkdir()
+    pd.DataFrame({'timestamp': pd.date_range('2025-07-01', periods=120, freq='min'),
+                  'x': range(120)}).to_parquet(plant / 'pi_data_0.parquet', row_group_size=30)
+    # A lab export without timestamps next to the historian files
+    pd.DataFrame({'x': [-1, -2, -3]}).to_parquet(plant / 'pi_data_1.parquet')
+    return plant
+
+
+def test_file_without_timestamps_is_skipped_for_a_window(tmp_path):
+    plant = plant_dataset.PlantDataset(_plant(tmp_path))
+    with pytest.warns(UserWarning, match="pi_data_1.parquet has no timestamp column"):
+        df = plant.read(['timestamp', 'x'], '2025-07-01T00:10:00', '2025-07-01T00:19:00')
+    assert df['x'].tolist() == list(range(10, 20))
+
+
+def test_file_without_timestamps_is_read_without_a_window(tmp_path):
+    plant = plant_dataset.PlantDataset(_plant(tmp_path))
+    assert sorted(plant.read(['x'])['x']) == [-3, -2, -1] + list(range(120))
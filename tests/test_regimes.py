@@ -0,0 +1,21 @@
+import os
+
+import pandas as pd
+
+import regimes
+
+
+def test_plant_index_is_dropped_when_a_file_is_rewritten(tmp_path):
+    plant = tmp_path / 'ANP2'
+    plant.mkdir()
+    export = plant / 'pi_data_0.parquet'
+    pd.DataFrame({'timestamp': pd.date_range('2025-07-01', periods=10, freq='min'), 'x': range(10)}).to_parquet(export)
+    index = {'parameters': {}, 'regimes': ['steady'], 'rows': [10], 'intervals': []}
+    regimes.save_index(plant, index)
+    assert regimes.load_index(plant) == index
+
+    # Same files, one rewritten: the folder's own mtime does not change
+    pd.DataFrame({'timestamp': pd.date_range('2025-07-02', periods=10, freq='min'), 'x': range(10)}).to_parquet(export)
+    stat = export.stat()
+    os.utime(export, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert regimes.load_index(plant) is None
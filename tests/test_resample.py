@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+import resample
+
+
+def _frame(values):
+    return pd.DataFrame({'timestamp': pd.date_range('2025-07-01', periods=len(values), freq='1min'), 'x': values})
+
+
+def test_ffill_one_row_per_chunk_matches_whole_frame():
+    df = _frame([1.0, np.nan, np.nan, np.nan, np.nan, 5.0])
+    options = {'interval': '1min', 'ffill_limit': 3}
+    whole = pd.concat(resample.resample_frames([df], **options), ignore_index=True)
+    chunked = pd.concat(resample.resample_frames([df.iloc[[i]] for i in range(len(df))], **options),
+                        ignore_index=True)
+    assert whole['x'].tolist()[:4] == [1.0, 1.0, 1.0, 1.0]
+    pd.testing.assert_frame_equal(chunked, whole)
+
+
+def test_late_rows_are_counted():
+    df = _frame([1.0, 2.0, 3.0, 4.0])
+    resampler = resample.Resampler('1min')
+    out = list(resample.resample_frames([df.iloc[2:], df.iloc[:2]], resampler))
+    assert resampler.late_rows == 2
+    assert sum(len(chunk) for chunk in out) == 2
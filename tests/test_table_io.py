@@ -0,0 +1,26 @@
+import table_io
+
+SOURCE = (
+    "timestamp,95FI003A/PV,local_time,status\n"
+    "2025-07-01T00:00:00,10052.126667336352,2025-07-01 00:00:00+02:00,Good\n"
+    "2025-07-01T00:01:00,,2025-07-01 00:01:00+02:00,\n"
+    "2025-07-01T00:02:00,0.1,2025-07-01 00:02:00+02:00,Bad\n"
+)
+
+
+def test_filtered_output_keeps_source_text(tmp_path):
+    src = tmp_path / 'pi_data.csv'
+    src.write_text(SOURCE, encoding='utf-8')
+    for _ in range(2):  # first run builds the columnar cache copy, the second reads it
+        dst = tmp_path / 'pi_data_filtered.csv'
+        table_io.write_projected_csv(src, dst, ['timestamp', '95FI003A/PV', 'local_time', 'status'])
+        assert dst.read_text(encoding='utf-8') == SOURCE
+
+
+def test_filtered_output_keeps_selected_columns_text(tmp_path):
+    src = tmp_path / 'pi_data.csv'
+    src.write_text(SOURCE, encoding='utf-8')
+    dst = tmp_path / 'pi_data_filtered.csv'
+    table_io.write_projected_csv(src, dst, ['local_time', '95FI003A/PV'])
+    expected = [','.join([line.split(',')[2], line.split(',')[1]]) for line in SOURCE.splitlines()]
+    assert dst.read_text(encoding='utf-8').splitlines() == expected
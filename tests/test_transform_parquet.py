@@ -0,0 +1,90 @@
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+import derived_tags
+import transform_parquet
+import web_plotter
+
+
+def _export(tmp_path, rows=240):
+    plant = tmp_path / 'ANP2'
+    plant.mkdir()
+    timestamps = pd.date_range('2025-07-01 00:00', periods=rows, freq='min', tz='Europe/Berlin')
+    pq_file = plant / 'pi_data_0.parquet'
+    pd.DataFrame({'timestamp': timestamps, 'x': range(rows)}).to_parquet(pq_file, row_group_size=50)
+    return pq_file
+
+
+def test_converter_and_plotter_read_a_naive_window_alike(tmp_path):
+    pq_file = _export(tmp_path)
+    start, end = '2025-06-30T23:00:00', '2025-07-01T00:00:00'
+    _, info, _ = transform_parquet._convert_file(pq_file, start=start, end=end, output_dir=tmp_path / 'csv_output')
+    converted = pd.read_csv(info['output_path'])['x'].tolist()
+
+    df = pd.read_parquet(pq_file)
+    lo, hi = web_plotter._row_window(df, [start, end])
+    assert converted == df['x'].iloc[lo:hi].tolist() == list(range(60, 121))
+
+
+def _source(tmp_path):
+    source = tmp_path / 'source'
+    source.mkdir()
+    return source
+
+
+def _run(tmp_path, monkeypatch, **options):
+    """results of one converter run over tmp_path/'source' (serial, all paths inside tmp_path)"""
+    for name, path in (('PARQUET_SOURCE', 'source'), ('CSV_OUTPUT', 'csv_output'), ('AI_MEMORY', 'AI_MEMORY.md'),
+                       ('ERROR_LOG', 'error_log.txt'), ('MANIFEST', 'conversion_manifest.json')):
+        monkeypatch.setattr(transform_parquet, name, tmp_path / path)
+    transformer = transform_parquet.ParquetTransformer(workers=1, **options)
+    transformer.transform_all()
+    return transformer.results
+
+
+def _statuses(results):
+    return {key: info['status'] for key, info in results['datasets'].items()}
+
+
+def test_second_run_skips_unchanged_files(tmp_path, monkeypatch):
+    pq_file = _export(_source(tmp_path))
+    assert _statuses(_run(tmp_path, monkeypatch)) == {'ANP2/pi_data_0': 'success'}
+    assert _statuses(_run(tmp_path, monkeypatch)) == {'ANP2/pi_data_0': 'skipped'}
+
+    # Touched but unchanged: the content hash matches, so it is still skipped
+    os.utime(pq_file, ns=(pq_file.stat().st_atime_ns, pq_file.stat().st_mtime_ns + 10 ** 9))
+    assert _statuses(_run(tmp_path, monkeypatch)) == {'ANP2/pi_data_0': 'skipped'}
+
+    pd.DataFrame({'timestamp': pd.date_range('2025-07-01', periods=10, freq='min'), 'x': range(10)}).to_parquet(pq_file)
+    assert _statuses(_run(tmp_path, monkeypatch)) == {'ANP2/pi_data_0': 'success'}
+
+
+def test_corrupt_file_is_reported_failed_and_retried(tmp_path, monkeypatch):
+    _export(_source(tmp_path))
+    (tmp_path / 'source' / 'ANP2' / 'pi_data_1.parquet').write_bytes(b'not a parquet file')
+    expected = {'ANP2/pi_data_0': 'success', 'ANP2/pi_data_1': 'failed'}
+    results = _run(tmp_path, monkeypatch)
+    assert _statuses(results) == expected
+    assert (results['successful'], results['failed']) == (1, 1)
+    manifest = json.loads((tmp_path / 'conversion_manifest.json').read_text(encoding='utf-8'))['files']
+    assert [Path(path).name for path in manifest] == ['pi_data_0.parquet']
+    assert _statuses(_run(tmp_path, monkeypatch)) == {'ANP2/pi_data_0': 'skipped', 'ANP2/pi_data_1': 'failed'}
+
+
+def test_changed_columns_or_derived_tags_make_outputs_stale(tmp_path, monkeypatch):
+    _export(_source(tmp_path))
+    definitions = {'x_double': derived_tags.DerivedTag('x_double', '2 * `x`')}
+    monkeypatch.setattr(derived_tags, 'load_definitions', lambda path=None: definitions)
+    runs = [{}, {'columns': ['x']}, {'columns': ['x'], 'derived': ['x_double']}]
+    for options in runs:
+        assert _statuses(_run(tmp_path, monkeypatch, **options)) == {'ANP2/pi_data_0': 'success'}
+        assert _statuses(_run(tmp_path, monkeypatch, **options)) == {'ANP2/pi_data_0': 'skipped'}
+
+    # Editing the formula of an exported derived tag changes the output too
+    definitions['x_double'] = derived_tags.DerivedTag('x_double', '3 * `x`')
+    results = _run(tmp_path, monkeypatch, **runs[-1])
+    assert _statuses(results) == {'ANP2/pi_data_0': 'success'}
+    assert pd.read_csv(results['datasets']['ANP2/pi_data_0']['output_path'])['x_double'].iloc[1] == 3.0
@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import derived_tags
+import regimes
+import web_plotter
+
+
+def _local_frame():
+    timestamps = pd.date_range('2025-07-01 00:00', periods=240, freq='min', tz='Europe/Berlin')
+    return pd.DataFrame({'timestamp': timestamps, 'x': range(len(timestamps))})
+
+
+def test_naive_page_bounds_are_utc():
+    df = _local_frame()
+    # The page gets epoch ms in UTC, so a zoom to 22:30-23:00 UTC is 00:30-01:00 local (+02:00)
+    lo, hi = web_plotter._row_window(df, ['2025-06-30T22:30:00', '2025-06-30T23:00:00'])
+    assert (lo, hi) == (30, 61)
+    assert str(df['timestamp'].iloc[lo]) == '2025-07-01 00:30:00+02:00'
+
+
+def test_page_bounds_round_trip_epoch_x_values():
+    df = _local_frame()
+    ms = web_plotter._epoch_ns(df['timestamp']) // 1_000_000
+    start = pd.Timestamp(int(ms[100]), unit='ms').isoformat()
+    end = pd.Timestamp(int(ms[119]), unit='ms').isoformat()
+    assert web_plotter._row_window(df, [start, end]) == (100, 120)
+
+
+def test_aware_bounds_keep_their_offset():
+    df = _local_frame()
+    assert web_plotter._row_window(df, ['2025-07-01T01:00:00+02:00', None]) == (60, len(df))
+
+
+def test_endpoints_read_naive_start_end_as_utc(tmp_path):
+    df = _local_frame()
+    df['x'] = df['x'].astype(float)
+    a, b = tmp_path / 'a.csv', tmp_path / 'b.csv'
+    df.to_csv(a, index=False)
+    df.to_csv(b, index=False)
+    client = web_plotter.app.test_client()
+    # 23:00-00:00 UTC is 01:00-02:00 local (+02:00): rows 60..120
+    bounds = {'start': '2025-06-30T23:00:00', 'end': '2025-07-01T00:00:00'}
+    stats = client.post('/api/statistics', json={'dataset_id': str(a), 'columns': ['x'],
+                                                 'stats': ['count', 'min', 'max'], **bounds}).get_json()
+    assert stats['statistics']['x'] == {'count': 61, 'min': 60.0, 'max': 120.0}
+    comparison = client.post('/api/compare-plants', json={'dataset_a': str(a), 'dataset_b': str(b),
+                                                          'interval': '1min', **bounds}).get_json()
+    assert comparison['tags']['x']['pairs'] == 61
+    assert comparison['tags']['x']['mean_a'] == 90.0
+
+
+def test_regime_filter_selects_the_steady_rows_of_aware_data(tmp_path):
+    rows = 200
+    timestamps = pd.date_range('2025-07-01 00:00', periods=rows, freq='min', tz='Africa/Johannesburg')
+    # Flat for 100 rows, then swinging by +/-5 every sample
+    x = np.where(np.arange(rows) < 100, 50.0, 50.0 + 5.0 * (-1.0) ** np.arange(rows))
+    path = tmp_path / 'pi_data.csv'
+    pd.DataFrame({'timestamp': timestamps, 'x': x, 'row': np.arange(rows, dtype=float)}).to_csv(path, index=False)
+    _, std = regimes.rolling_mean_std(x, 5)
+    steady = np.flatnonzero(std <= regimes.DEFAULT_MAX_REL_STD * 50.0)
+    assert steady.tolist() == list(range(steady[-1] + 1))
+
+    client = web_plotter.app.test_client()
+    detected = client.post('/api/regimes', json={'dataset_id': str(path), 'tags': ['x'], 'window': 5}).get_json()
+    assert detected['success']
+    stats = client.post('/api/statistics', json={'dataset_id': str(path), 'columns': ['row'],
+                                                 'stats': ['count', 'min', 'max'], 'regime': 'steady'}).get_json()
+    assert stats['statistics']['row'] == {'count': len(steady), 'min': 0.0, 'max': float(steady[-1])}
+
+
+def test_cross_correlation_does_not_pair_samples_across_window_gaps(tmp_path):
+    rows, lag = 1000, 3
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=rows)
+    y = np.roll(x, lag) + 0.1 * rng.normal(size=rows)
+    timestamps = pd.date_range('2025-07-01', periods=rows, freq='min')
+    path = tmp_path / 'pi_data.csv'
+    pd.DataFrame({'timestamp': timestamps, 'x': x, 'y': y}).to_csv(path, index=False)
+    windows = [[str(timestamps[0]), str(timestamps[199])], [str(timestamps[600]), str(timestamps[799])]]
+
+    client = web_plotter.app.test_client()
+    result = client.post('/api/cross-correlation', json={'dataset_id': str(path), 'columns': ['x', 'y'],
+                                                         'windows': windows, 'max_lag': 10, 'curves': True}).get_json()
+    assert result['rows'] == 400
+    pair = result['pairs'][0]
+    assert pair['peak_lag'] == lag
+    inside = np.zeros(rows, dtype=bool)
+    inside[0:200] = inside[600:800] = True
+    for k, r in zip(result['lags'], pair['r']):
+        t = np.arange(max(0, -k), min(rows, rows - k))
+        t = t[inside[t] & inside[t + k]]  # only pairs with both samples inside a window
+        assert r == pytest.approx(np.corrcoef(x[t], y[t + k])[0, 1], abs=1e-9)
+
+
+def _load_data(tmp_path):
+    rows = 120
+    load_tag = web_plotter.DEFAULT_LOAD_TAG + '.0c3f2d01-3c65-4797-aae4-a03019b061c1'
+    path = tmp_path / 'pi_data.csv'
+    pd.DataFrame({'timestamp': pd.date_range('2025-07-01', periods=rows, freq='min'),
+                  'x': np.full(rows, 50.0),
+                  load_tag: np.full(rows, 90.0)}).to_csv(path, index=False)
+    return path, load_tag
+
+
+def test_default_load_tag_matches_its_guid_suffixed_column(tmp_path):
+    path, load_tag = _load_data(tmp_path)
+    response = web_plotter.app.test_client().post('/api/regimes', json={
+        'dataset_id': str(path), 'tags': ['x'], 'window': 5, 'design_load': 100.0})
+    result = response.get_json()
+    assert result['success']
+    assert result['parameters']['load_tag'] == load_tag
+    assert [regime['id'] for regime in result['regimes']] == ['normal-steady']
+
+
+def test_unknown_load_tag_is_a_bad_request(tmp_path):
+    path, _ = _load_data(tmp_path)
+    response = web_plotter.app.test_client().post('/api/regimes', json={
+        'dataset_id': str(path), 'tags': ['x'], 'window': 5, 'load_tag': 'ANP2_Load', 'design_load': 100.0})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Load tag ANP2_Load is not in this dataset'
+
+
+def test_cached_frame_holds_raw_columns_and_derived_tags_are_per_request(tmp_path, monkeypatch):
+    definitions = {'x_double': derived_tags.DerivedTag('x_double', '2 * `x`')}
+    monkeypatch.setattr(derived_tags, 'load_definitions', lambda path=None: definitions)
+    path = tmp_path / 'pi_data.csv'
+    pd.DataFrame({'timestamp': pd.date_range('2025-07-01', periods=60, freq='min'),
+                  'x': np.arange(60, dtype=float)}).to_csv(path, index=False)
+    client = web_plotter.app.test_client()
+
+    loaded = client.post('/api/load-csv', json={'path': str(path)}).get_json()
+    assert loaded['columns'] == ['timestamp', 'x', 'x_double']
+    assert 'x_double' in loaded['numeric_columns']
+    assert list(web_plotter.dataset_cache.peek(str(path)).columns) == ['timestamp', 'x']
+
+    for bounds in ({}, {'start': '2025-07-01T00:10:00', 'end': '2025-07-01T00:20:00'}):
+        stats = client.post('/api/statistics', json={'dataset_id': str(path), 'columns': ['x_double'],
+                                                     'stats': ['max'], **bounds}).get_json()
+        assert stats['statistics']['x_double']['max'] == (40.0 if bounds else 118.0)
+    assert list(web_plotter.dataset_cache.peek(str(path)).columns) == ['timestamp', 'x']
@@ -1,8 +1,22 @@
 ﻿import os
+import argparse
+import time
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
 from datetime import datetime
 import json
+import hashlib
+import fnmatch
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import table_io
+import derived_tags
+import resample
+import log_writer
+import row_groups
 
 # Configuration
 BASE_DIR = Path(r"c:\Users\EvanJacobs\Documents\OmniaOffline\Data Cleaning")
@@ -10,29 +24,222 @@ PARQUET_SOURCE = BASE_DIR / "parquet_source"
 CSV_OUTPUT = BASE_DIR / "csv_output"
 AI_MEMORY = BASE_DIR / "AI_MEMORY.md"
 ERROR_LOG = BASE_DIR / "error_log.txt"
+MANIFEST = BASE_DIR / "conversion_manifest.json"
+
+# Rows decoded per record batch; bounds peak memory per file
+DEFAULT_BATCH_SIZE = 65536
+
+def _timestamp():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def _file_digest(path, chunk_size=8 * 1024 * 1024):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _dataset_key(pq_file):
+    return f"{pq_file.parent.name}/{pq_file.stem}"
+
+def _pandas_index_columns(schema):
+    """Names of stored pandas index columns (dropped on export, like to_csv(index=False))"""
+    metadata = schema.pandas_metadata or {}
+    return {col for col in metadata.get('index_columns', []) if isinstance(col, str)}
+
+def _select_columns(names, patterns, timestamp_col=None):
+    """Project names down to those matching any pattern (exact name or glob, e.g. 95FI00*/PV).
+
+    Source order is kept and the timestamp column always leads the result.
+    """
+    if not patterns:
+        return list(names)
+    selected = [name for name in names
+                if name != timestamp_col and any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)]
+    if timestamp_col is not None:
+        selected.insert(0, timestamp_col)
+    return selected
+
+def _convert_file(pq_file, batch_size=DEFAULT_BATCH_SIZE, columns=None, start=None, end=None, output_dir=None,
+                  output_format=table_io.DEFAULT_FORMAT, float_precision=None, derived=None,
+                  resample_options=None):
+    """Convert a single parquet file to CSV (or another table_io output format).
+
+    Runs inside a worker process when transform_all is parallel, so it never
+    touches the shared results or error log. Log lines are collected with
+    their timestamps and handed back to the parent to be written in order.
+
+    The file is streamed one record batch at a time, so peak memory is set
+    by batch_size rather than by the size of the file. Column patterns and
+    the start/end window are pushed into the read: only projected columns
+    are decoded, and row groups whose timestamp statistics fall outside the
+    window are never read.
+
+    derived lists derived tags (see derived_tags.py, "all" for every one the
+    file can provide) computed per batch and written after the raw columns.
+    resample_options (Resampler keyword arguments: interval, agg,
+    column_aggs, ffill_limit) puts the output on a regular time grid; the
+    resampler carries only the newest bucket from one batch to the next.
+    """
+    parent_folder = pq_file.parent.name
+    file_name = pq_file.stem
+    dataset_key = _dataset_key(pq_file)
+    messages = [(_timestamp(), f"[PROCESSING] {parent_folder}/{pq_file.name}...")]
+    
+    try:
+        # Open parquet (reads the footer only)
+        parquet = pq.ParquetFile(pq_file)
+        index_columns = _pandas_index_columns(parquet.schema_arrow)
+        timestamp_col = row_groups.timestamp_column(parquet.schema_arrow)
+        names = [name for name in parquet.schema_arrow.names if name not in index_columns]
+        selected = _select_columns(names, columns, timestamp_col)
+        if columns and not [name for name in selected if name != timestamp_col]:
+            raise ValueError(f"No columns match {', '.join(columns)}")
+        
+        # Derived tags and the raw inputs they need (read even if not exported)
+        definitions = derived_tags.load_definitions() if derived else {}
+        derivable = derived_tags.available(names, definitions)
+        derived_names = derivable if derived and 'all' in derived else [name for name in derived or [] if name in derivable]
+        for name in derived or []:
+            if name != 'all' and name not in derivable:
+                messages.append((_timestamp(), f"[WARNING] Derived tag {name} is not defined or its inputs are missing in {pq_file.name}"))
+        derived_inputs = derived_tags.required_columns(derived_names, definitions)
+        read_columns = list(dict.fromkeys(selected + derived_inputs))
+        
+        # Resolve the time window against the file's timestamp type
+        if (start is not None or end is not None) and timestamp_col is None:
+            raise ValueError("A time range was given but the file has no timestamp column")
+        if timestamp_col is not None:
+            ts_type = parquet.schema_arrow.field(timestamp_col).type
+            start = row_groups.time_bound(start, ts_type) if start is not None else None
+            end = row_groups.time_bound(end, ts_type) if end is not None else None
+        groups = row_groups.row_groups_in_range(parquet, timestamp_col, start, end)
+        
+        # Create output directory organized by parent folder
+        output_dir = Path(output_dir or CSV_OUTPUT) / parent_folder
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Stream batches into the output file
+        out_path = table_io.output_path(output_dir, file_name, output_format)
+        schema = pa.schema([parquet.schema_arrow.field(name) for name in selected] +
+                           [pa.field(name, pa.float64()) for name in derived_names])
+        resampler = None
+        out_schema = schema
+        if resample_options:
+            if timestamp_col is None:
+                raise ValueError("Resampling needs a timestamp column")
+            resampler = resample.Resampler(timestamp_col=timestamp_col, **resample_options)
+            # Aggregated and gap-filled numeric tags come out as floats; text tags keep their type
+            out_schema = pa.schema([pa.field(field.name, pa.float64())
+                                    if field.name != timestamp_col and (pa.types.is_integer(field.type) or pa.types.is_boolean(field.type))
+                                    else field for field in schema])
+        rows = 0
+        rows_read = 0
+        peak_bytes = 0
+        started = time.perf_counter()
+        with table_io.open_writer(out_path, output_format, out_schema, float_precision=float_precision) as writer:
+            def write(batch):
+                nonlocal rows, peak_bytes
+                writer.write_batch(batch)
+                rows += batch.num_rows
+                # An estimate, not measured RSS: Arrow's allocations plus the writer's last pandas copy
+                peak_bytes = max(peak_bytes, pa.total_allocated_bytes() + writer.last_frame_bytes)
+            
+            def write_resampled(frame):
+                if frame is not None:
+                    write(pa.RecordBatch.from_pandas(frame, schema=out_schema, preserve_index=False))
+            
+            batches = parquet.iter_batches(batch_size=batch_size, row_groups=groups, columns=read_columns) if groups else []
+            for batch in batches:
+                batch = row_groups.filter_batch(batch, timestamp_col, start, end)
+                if derived_names:
+                    inputs = {name: batch.column(name).to_numpy(zero_copy_only=False) for name in derived_inputs}
+                    values = derived_tags.evaluate(inputs, derived_names, definitions)
+                    batch = pa.RecordBatch.from_arrays([batch.column(name) for name in selected] + [pa.array(values[name]) for name in derived_names],
+                                                       schema=schema)
+                elif read_columns != selected:
+                    batch = batch.select(selected)
+                rows_read += batch.num_rows
+                if resampler is None:
+                    write(batch)
+                else:
+                    write_resampled(resampler.feed(batch.to_pandas()))
+            if resampler is not None:
+                write_resampled(resampler.finish())
+                if resampler.late_rows:
+                    messages.append((_timestamp(), f"[WARNING] {resampler.late_rows:,} out-of-order rows in {pq_file.name} were dropped while resampling"))
+        elapsed = time.perf_counter() - started
+        
+        info = {
+            "status": "success",
+            "parent_folder": parent_folder,
+            "file_name": file_name,
+            "rows": rows,
+            "rows_read": rows_read,
+            "columns": len(out_schema),
+            "column_names": out_schema.names,
+            "file_size_mb": pq_file.stat().st_size / (1024 * 1024),
+            "output_path": str(out_path),
+            "output_format": output_format,
+            "source_sha256": _file_digest(pq_file),
+            "elapsed_seconds": elapsed,
+            "rows_per_second": rows_read / elapsed if elapsed > 0 else 0.0,
+            "peak_memory_mb": peak_bytes / (1024 * 1024),  # estimated, see write()
+            "row_groups_read": len(groups),
+            "row_groups_total": parquet.metadata.num_row_groups
+        }
+        messages.append((_timestamp(), f"[SUCCESS] Created: {out_path.name} ({rows:,} rows, {info['rows_per_second']:,.0f} rows/s, est. peak {info['peak_memory_mb']:.1f} MB)"))
+        
+    except Exception as e:
+        messages.append((_timestamp(), f"[ERROR] Failed to process {pq_file.name}: {str(e)}"))
+        info = {
+            "status": "failed",
+            "error": str(e)
+        }
+    
+    return dataset_key, info, messages
 
 class ParquetTransformer:
-    def __init__(self):
+    def __init__(self, workers=None, batch_size=DEFAULT_BATCH_SIZE, force=False,
+                 columns=None, start=None, end=None, output_dir=None,
+                 output_format=table_io.DEFAULT_FORMAT, float_precision=None, derived=None,
+                 resample_options=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.force = force
+        # Keyword arguments forwarded to _convert_file for every file
+        self.options = {
+            "batch_size": batch_size,
+            "columns": columns,
+            "start": pd.Timestamp(start).isoformat() if start is not None else None,
+            "end": pd.Timestamp(end).isoformat() if end is not None else None,
+            "output_dir": str(output_dir or CSV_OUTPUT),
+            "output_format": output_format,
+            "float_precision": float_precision,
+            "derived": derived,
+            "resample_options": resample_options
+        }
         self.error_log = []
         self.results = {
             "timestamp": datetime.now().isoformat(),
             "total_files": 0,
             "successful": 0,
             "failed": 0,
+            "skipped": 0,
             "datasets": {}
         }
-        # Clear previous error log on init
-        with open(ERROR_LOG, 'w', encoding='utf-8') as f:
-            f.write(f"=== Transformation Log Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ===\n\n")
-    
-    def _log_error(self, message):
-        """Log error to both console and file"""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        log_line = f"[{timestamp}] {message}"
-        self.error_log.append(log_line)
-        print(log_line)
-        with open(ERROR_LOG, 'a', encoding='utf-8') as f:
-            f.write(log_line + "\n")
+        self.manifest = {}
+        # Start a fresh log for this run (the previous one is kept as error_log.txt.1)
+        self.logger = log_writer.get_logger(ERROR_LOG, source="transform_parquet")
+        self.logger.rotate()
+        self.logger.log("=== Transformation Log Started ===")
+    
+    def _log_error(self, message, timestamp=None):
+        """Log a message of any level: kept in self.error_log, printed, and queued for
+        ERROR_LOG (written by a background thread, so it may reach the file later)"""
+        timestamp = timestamp or _timestamp()
+        self.error_log.append(f"[{timestamp}] {message}")
+        self.logger.log(message, timestamp)
     
     def transform_all(self):
         """Main transformation pipeline"""
@@ -41,8 +248,8 @@ class ParquetTransformer:
             self._log_error(error_msg)
             return
         
-        # Find all parquet files
-        parquet_files = list(PARQUET_SOURCE.glob("**/*.parquet"))
+        # Find all parquet files (sorted so results and logs are deterministic)
+        parquet_files = sorted(PARQUET_SOURCE.glob("**/*.parquet"))
         self.results["total_files"] = len(parquet_files)
         
         if not parquet_files:
@@ -52,60 +259,133 @@ class ParquetTransformer:
         
         self._log_error(f"[INFO] Found {len(parquet_files)} parquet file(s)")
         
-        # Transform each file
+        # Skip files whose output is already current
+        self.manifest = self._load_manifest()
+        pending = []
         for pq_file in parquet_files:
-            self._transform_file(pq_file)
+            entry = None if self.force else self._current_entry(pq_file)
+            if entry is None:
+                pending.append(pq_file)
+            else:
+                self._record_skipped(pq_file, entry)
+        
+        # Transform each remaining file
+        workers = min(self.workers, len(pending))
+        if workers > 1:
+            self._transform_parallel(pending, workers)
+        else:
+            for pq_file in pending:
+                self._transform_file(pq_file)
+        
+        # Keep the inventory in source order regardless of skips
+        datasets = self.results["datasets"]
+        self.results["datasets"] = {key: datasets[key] for key in map(_dataset_key, parquet_files)}
+        self._save_manifest(parquet_files)
         
         # Update AI memory
         self._update_ai_memory()
         self._print_summary()
     
+    def _transform_parallel(self, parquet_files, workers):
+        """Convert files concurrently in a process pool.
+
+        Results are merged back in source file order, not completion order,
+        so the results dict and error log are identical to a serial run.
+        """
+        self._log_error(f"[INFO] Converting with {workers} worker process(es)")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_convert_file, pq_file, **self.options) for pq_file in parquet_files]
+            for pq_file, future in zip(parquet_files, futures):
+                try:
+                    dataset_key, info, messages = future.result()
+                except Exception as e:
+                    # Worker died before it could report (e.g. out of memory)
+                    dataset_key = _dataset_key(pq_file)
+                    info = {"status": "failed", "error": str(e)}
+                    messages = [(_timestamp(), f"[ERROR] Failed to process {pq_file.name}: {str(e)}")]
+                self._record_result(pq_file, dataset_key, info, messages)
+    
     def _transform_file(self, pq_file):
         """Transform single parquet file to CSV"""
-        try:
-            # Extract parent folder name (ANP2, NAP2, etc) and file name
-            parent_folder = pq_file.parent.name
-            file_name = pq_file.stem
-            dataset_key = f"{parent_folder}/{file_name}"
-            
-            self._log_error(f"[PROCESSING] {parent_folder}/{pq_file.name}...")
-            
-            # Read parquet
-            df = pd.read_parquet(pq_file)
-            
-            # Create output directory organized by parent folder
-            output_dir = CSV_OUTPUT / parent_folder
-            output_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Write CSV
-            csv_path = output_dir / f"{file_name}.csv"
-            df.to_csv(csv_path, index=False, encoding='utf-8')
-            
-            # Log results
-            self.results["datasets"][dataset_key] = {
-                "status": "success",
-                "parent_folder": parent_folder,
-                "file_name": file_name,
-                "rows": len(df),
-                "columns": len(df.columns),
-                "column_names": list(df.columns),
-                "file_size_mb": pq_file.stat().st_size / (1024 * 1024),
-                "csv_path": str(csv_path)
-            }
+        self._record_result(pq_file, *_convert_file(pq_file, **self.options))
+    
+    def _record_result(self, pq_file, dataset_key, info, messages):
+        """Merge one file's conversion result into results, the log and the manifest"""
+        for timestamp, message in messages:
+            self._log_error(message, timestamp)
+        self.results["datasets"][dataset_key] = info
+        if info["status"] == "success":
             self.results["successful"] += 1
-            self._log_error(f"[SUCCESS] CSV created: {file_name}.csv")
-            
-        except Exception as e:
-            parent_folder = pq_file.parent.name
-            file_name = pq_file.stem
-            dataset_key = f"{parent_folder}/{file_name}"
-            error_msg = f"[ERROR] Failed to process {pq_file.name}: {str(e)}"
-            self._log_error(error_msg)
-            self.results["datasets"][dataset_key] = {
-                "status": "failed",
-                "error": str(e)
+            stat = pq_file.stat()
+            self.manifest[str(pq_file)] = {
+                "source_path": str(pq_file),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "sha256": info["source_sha256"],
+                "output_path": info["output_path"],
+                "options": self._output_options(),
+                "info": info
             }
+        else:
             self.results["failed"] += 1
+            self.manifest.pop(str(pq_file), None)
+    
+    def _record_skipped(self, pq_file, entry):
+        """Report a file whose existing output is still current"""
+        self._log_error(f"[SKIPPED] {pq_file.parent.name}/{pq_file.name} unchanged, output is current")
+        self.results["datasets"][_dataset_key(pq_file)] = dict(entry["info"], status="skipped")
+        self.results["skipped"] += 1
+    
+    def _output_options(self):
+        """Options that change the produced output (a change forces reconversion)"""
+        options = {key: value for key, value in self.options.items() if key != "batch_size"}
+        if options.get("derived"):
+            # Editing a formula in derived_tags.json changes the output too
+            options["derived_definitions"] = derived_tags.definitions_hash(derived_tags.load_definitions())
+        return options
+    
+    def _load_manifest(self):
+        """Load the conversion manifest, starting fresh if it is missing or unreadable"""
+        try:
+            with open(MANIFEST, 'r', encoding='utf-8') as f:
+                return json.load(f).get("files", {})
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self._log_error(f"[WARNING] Ignoring unreadable manifest {MANIFEST.name}: {str(e)}")
+            return {}
+    
+    def _save_manifest(self, parquet_files):
+        """Persist manifest entries for the files that still exist in the source tree"""
+        current = {str(pq_file) for pq_file in parquet_files}
+        files = {path: entry for path, entry in self.manifest.items() if path in current}
+        # Unique per process and thread, like the other sidecar writes
+        tmp_path = MANIFEST.with_name(f"{MANIFEST.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"updated": datetime.now().isoformat(), "files": files}, f, indent=2)
+        os.replace(tmp_path, MANIFEST)
+    
+    def _current_entry(self, pq_file):
+        """Return the manifest entry if pq_file's output is up to date, else None.
+
+        Size and mtime are checked first so an untouched file costs one stat().
+        The content hash is only computed when they differ, which catches
+        files that were copied or touched without changing.
+        """
+        entry = self.manifest.get(str(pq_file))
+        if entry is None or entry.get("options") != self._output_options():
+            return None
+        if not Path(entry["output_path"]).exists():
+            return None
+        stat = pq_file.stat()
+        if stat.st_size != entry["size"]:
+            return None
+        if stat.st_mtime_ns == entry["mtime_ns"]:
+            return entry
+        if _file_digest(pq_file) != entry["sha256"]:
+            return None
+        entry["mtime_ns"] = stat.st_mtime_ns
+        return entry
     
     def _update_ai_memory(self):
         """Update AI_MEMORY.md with latest results"""
@@ -116,21 +396,24 @@ class ParquetTransformer:
 ## Summary
 - Total Files: {self.results['total_files']}
 - Successful: {self.results['successful']}
+- Skipped (unchanged): {self.results['skipped']}
 - Failed: {self.results['failed']}
 
 ## Dataset Inventory
 
 """
         for dataset_key, info in self.results["datasets"].items():
-            if info["status"] == "success":
+            if info["status"] in ("success", "skipped"):
                 checkmark = "[OK]"
+                action = "Converted" if info["status"] == "success" else "Up to date (skipped)"
                 memory_content += f"""### {dataset_key}
-- **Status:** {checkmark} Converted
+- **Status:** {checkmark} {action}
 - **Records:** {info['rows']:,}
 - **Columns:** {info['columns']}
 - **Column Names:** {', '.join(info['column_names'])}
 - **Original Size:** {info['file_size_mb']:.2f} MB
-- **Output Location:** `csv_output/{info['parent_folder']}/{info['file_name']}.csv`
+- **Throughput:** {info['rows_per_second']:,.0f} rows/s (est. peak {info['peak_memory_mb']:.1f} MB of Arrow and writer buffers)
+- **Output Location:** `{info['output_path']}`
 
 """
             else:
@@ -160,9 +443,59 @@ class ParquetTransformer:
     
     def _print_summary(self):
         """Print transformation summary"""
-        summary = "\n" + "="*60 + "\nTRANSFORMATION SUMMARY\n" + "="*60 + f"\nTotal Files Processed: {self.results['total_files']}\nSuccessful: {self.results['successful']}\nFailed: {self.results['failed']}\nError Log: {ERROR_LOG}\n" + "="*60
+        summary = "\n" + "="*60 + "\nTRANSFORMATION SUMMARY\n" + "="*60 + f"\nTotal Files Processed: {self.results['total_files']}\nSuccessful: {self.results['successful']}\nSkipped (unchanged): {self.results['skipped']}\nFailed: {self.results['failed']}\nError Log: {ERROR_LOG}\n" + "="*60
         self._log_error(summary)
 
-if __name__ == "__main__":
-    transformer = ParquetTransformer()
+def main():
+    parser = argparse.ArgumentParser(description='Convert parquet_source/ files to CSV (or another table format)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Number of files to convert concurrently (default: CPU count, 1 = serial)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Rows per streamed record batch; bounds memory per file (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--force', action='store_true',
+                        help='Reconvert every file, ignoring the conversion manifest')
+    parser.add_argument('--columns', action='append', default=None,
+                        help='Columns or tag globs to export, comma separated or repeated (e.g. "95FI00*/PV"); timestamp is always kept')
+    parser.add_argument('--start', default=None, help='Only export rows at or after this timestamp (e.g. 2025-08-01; naive = UTC)')
+    parser.add_argument('--end', default=None, help='Only export rows at or before this timestamp (naive = UTC)')
+    parser.add_argument('--output-dir', default=None, help=f'Output root folder (default: {CSV_OUTPUT})')
+    parser.add_argument('--format', dest='output_format', choices=list(table_io.FORMATS), default=table_io.DEFAULT_FORMAT,
+                        help='Output format: csv, compressed csv (csv.gz/csv.zst), feather (Arrow IPC) or parquet')
+    parser.add_argument('--float-precision', type=int, default=None,
+                        help='Significant digits for floats in CSV outputs (default: full precision)')
+    parser.add_argument('--resample', default=None, metavar='INTERVAL',
+                        help='Resample onto a regular time grid with this interval (e.g. 1min, 10s, 1h)')
+    parser.add_argument('--agg', action='append', default=None,
+                        help=f'Resample aggregation: {"/".join(resample.AGGREGATIONS)} (default mean), or TAG=AGG for one tag; repeatable')
+    parser.add_argument('--ffill-limit', type=int, default=0,
+                        help='When resampling, forward-fill gaps of up to N intervals (default: leave gaps empty)')
+    parser.add_argument('--derived', action='append', default=None,
+                        help='Derived tags from derived_tags.json to add, comma separated or repeated ("all" = every one the file supports)')
+    args = parser.parse_args()
+    
+    columns = None
+    if args.columns:
+        columns = [pattern.strip() for value in args.columns for pattern in value.split(',') if pattern.strip()]
+    derived = None
+    if args.derived:
+        derived = [name.strip() for value in args.derived for name in value.split(',') if name.strip()]
+    
+    resample_options = None
+    if args.resample:
+        resample_options = {"interval": args.resample, "agg": "mean", "column_aggs": {}, "ffill_limit": args.ffill_limit}
+        for value in args.agg or []:
+            tag, _, agg = value.rpartition('=')
+            if tag:
+                resample_options["column_aggs"][tag.strip()] = agg.strip()
+            else:
+                resample_options["agg"] = agg.strip()
+        resample.Resampler(**resample_options)  # validate before starting workers
+    
+    transformer = ParquetTransformer(workers=max(1, args.workers), batch_size=max(1, args.batch_size), force=args.force,
+                                     columns=columns, start=args.start, end=args.end, output_dir=args.output_dir,
+                                     output_format=args.output_format, float_precision=args.float_precision,
+                                     derived=derived, resample_options=resample_options)
     transformer.transform_all()
+
+if __name__ == "__main__":
+    main()
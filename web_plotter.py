@@ -5,6 +5,11 @@ Web-based Interactive CSV Plotter with Statistics
 - Column selection
 - Statistical metrics calculation
 - Correlation analysis
+- Cross-lag correlation (time delays between tags)
+- Steady-state / load regime detection, usable as a filter for the above
+- Whole plants: all Parquet exports of a plant folder as one dataset, read
+  per request for just the requested tags and time window
+- Cross-plant comparison of common tags (compare_plants.py)
 """
 
 # ===========================
@@ -27,48 +32,62 @@ def install_if_missing(package_name, import_name=None):
         subprocess.check_call([sys.executable, "-m", "pip", "install", package_name])
         print(f"✓ {package_name} installed successfully")
 
-print("\n" + "=" * 60)
-print("CHECKING REQUIRED MODULES")
-print("=" * 60)
-
 required_packages = [
     ('flask', 'flask'),
     ('pandas', 'pandas'),
     ('numpy', 'numpy'),
+    ('pyarrow', 'pyarrow'),
 ]
 
-for package, import_name in required_packages:
-    install_if_missing(package, import_name)
-
-print("=" * 60 + "\n")
+# Only when run as the server: worker processes (spawned on Windows) re-import this
+# script as __mp_main__ and must not repeat the checks
+if __name__ == '__main__':
+    print("\n" + "=" * 60)
+    print("CHECKING REQUIRED MODULES")
+    print("=" * 60)
+    
+    for package, import_name in required_packages:
+        install_if_missing(package, import_name)
+    
+    print("=" * 60 + "\n")
 
 # ===========================
 # IMPORTS
 # ===========================
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from datetime import datetime
 import json
+import struct
 import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import table_io
+import summary_stats
+import downsample
+import correlation
+import derived_tags
+import resample
+import regimes
+import log_writer
+import dtype_registry
+import plant_dataset
+import parquet_search
+import compare_plants
+from dataset_cache import DatasetCache
 
 # ===========================
 # SETUP LOGGING
 # ===========================
 
 LOG_FILE = 'error_log.txt'
+logger = log_writer.get_logger(LOG_FILE, source='web_plotter')
 
 def log_message(msg):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"[{timestamp}] {msg}"
-    print(log_entry)
-    with open(LOG_FILE, 'a', encoding='utf-8') as f:
-        f.write(log_entry + '\n')
-
-log_message("=" * 80)
-log_message("WEB-BASED INTERACTIVE PLOTTER STARTED")
+    """Log to error_log.txt (queued; written in batches by a background thread)"""
+    logger.log(msg)
 
 # ===========================
 # FLASK APP SETUP
@@ -76,10 +95,247 @@ log_message("WEB-BASED INTERACTIVE PLOTTER STARTED")
 
 app = Flask(__name__)
 FILTERED_CSV_DIR = Path("csv_filtered")
+# Plant folders of Parquet exports, each offered as one dataset (plant_dataset.py)
+PARQUET_SOURCE_DIR = Path("parquet_source")
+
+# Memory budget for loaded datasets (least recently used are evicted beyond it)
+DATASET_CACHE_MB = 4096
+
+# Worker processes for /api/compare-plants; each streams the timestamps of both
+# sources again, so comparisons stay well below the machine's cores
+COMPARE_WORKERS = 2
+
+# One process pool for all comparison requests, started on first use (concurrent
+# requests queue on it instead of each starting their own)
+_compare_pool = None
+_compare_pool_lock = threading.Lock()
+
+def _get_compare_pool():
+    global _compare_pool
+    with _compare_pool_lock:
+        if _compare_pool is None:
+            _compare_pool = ProcessPoolExecutor(max_workers=COMPARE_WORKERS)
+        return _compare_pool
+
+def _load_dataset(csv_path):
+    """Read a file for plotting: compact dtypes (dtype_registry.py), timestamps parsed and sorted once, at load.
+
+    Only the file's own columns are cached; derived tags (derived_tags.json)
+    are computed per request for the tags asked for (_with_derived).
+    """
+    df = dtype_registry.read_dataframe(csv_path)
+    
+    # Convert timestamp if present
+    if 'timestamp' in df.columns:
+        try:
+            if not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
+                df['timestamp'] = pd.to_datetime(df['timestamp'])
+            # Exports are normally in time order already; sorting would copy every column
+            if not df['timestamp'].is_monotonic_increasing:
+                df = df.sort_values('timestamp').reset_index(drop=True)
+        except (ValueError, TypeError) as e:
+            log_message(f"[WARNING] Timestamps in {Path(csv_path).name} could not be parsed, plotting by sample index: {e}")
+    
+    return df
+
+def _with_derived(df, columns):
+    """A cached frame with the derived tags among columns appended, for this request only
+    (assign shares the cached columns instead of copying them)"""
+    definitions = derived_tags.load_definitions()
+    derived = [col for col in derived_tags.available(df.columns, definitions) if col in columns]
+    return derived_tags.add_derived(df, derived, definitions)
+
+def _stream_frames(dataset_id, columns):
+    """Chunks of a file that is not loaded: the requested columns it has, with derived tags computed per chunk"""
+    definitions = derived_tags.load_definitions()
+    header = table_io.read_columns(dataset_id)
+    derived = [col for col in derived_tags.available(header, definitions) if col in columns]
+    raw = [col for col in columns if col in header]
+    needed = list(dict.fromkeys(raw + derived_tags.required_columns(derived, definitions)))
+    for chunk in table_io.iter_frames(dataset_id, needed):
+        yield derived_tags.add_derived(chunk, derived, definitions)[raw + derived]
+
+def _windows_span(windows):
+    """(start, end) covering all windows as UTC bounds (parquet_search.utc_bound); None for an open side"""
+    utc = parquet_search.utc_bound
+    if not windows:
+        return None, None
+    starts = [window[0] for window in windows]
+    ends = [window[1] for window in windows]
+    start = None if any(value is None for value in starts) else min(utc(value) for value in starts)
+    end = None if any(value is None for value in ends) else max(utc(value) for value in ends)
+    return start, end
 
-# In-memory cache for loaded data
+def _plant_frame(dataset_id, columns, windows=None):
+    """The requested tags of a plant folder, read only from the files and row groups
+    within the windows' span (PlantDataset.read); derived tags among columns are
+    computed from their inputs. Plants are not kept in the dataset cache.
+    """
+    plant = plant_dataset.PlantDataset(dataset_id)
+    definitions = derived_tags.load_definitions()
+    derived = [col for col in derived_tags.available(plant.columns, definitions) if col in columns]
+    raw = [col for col in columns if col in plant.columns]
+    timestamp = ['timestamp'] if 'timestamp' in plant.columns else []
+    needed = list(dict.fromkeys(timestamp + raw + derived_tags.required_columns(derived, definitions)))
+    start, end = _windows_span(windows) if timestamp else (None, None)
+    df = plant.read(needed, start, end)
+    if timestamp and not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return derived_tags.add_derived(df, derived, definitions)
+
+def _dataset_frame(dataset_id, columns, windows=None):
+    """Frame to answer a request from: the cached file, or for a plant folder only
+    the requested columns within the windows (callers still slice the windows)"""
+    if Path(dataset_id).is_dir():
+        return _plant_frame(dataset_id, columns, windows)
+    return _with_derived(dataset_cache.get(dataset_id), columns)
+
+def _dataset_signature(dataset_id):
+    """Cache signature: the file's mtime/size, or for a plant folder those of all its files"""
+    if Path(dataset_id).is_dir():
+        return plant_dataset.signature(dataset_id)
+    stat = Path(dataset_id).stat()
+    return stat.st_mtime_ns, stat.st_size
+
+def _file_summary(dataset_id, columns):
+    """Column summaries for one file: raw tags from its sidecar, derived tags computed from the data.
+
+    A plant folder merges the summaries of its files, so each file is only
+    ever summarised once (plant_dataset.PlantDataset.summaries).
+    """
+    df = dataset_cache.peek(dataset_id)
+    if Path(dataset_id).is_dir():
+        plant = plant_dataset.PlantDataset(dataset_id)
+        derived = derived_tags.available(plant.columns, derived_tags.load_definitions())
+        summaries = plant.summaries()
+        df = None
+    elif df is not None:
+        derived = derived_tags.available(df.columns, derived_tags.load_definitions())
+        # Reuse the frame already in memory instead of reading the file again
+        summaries = summary_stats.ensure_summary(dataset_id, df)
+    else:
+        derived = derived_tags.available(table_io.read_columns(dataset_id), derived_tags.load_definitions())
+        summaries = summary_stats.ensure_summary(dataset_id)
+    wanted = [col for col in columns if col in derived]
+    if wanted:
+        for chunk in ([_with_derived(df, wanted)[wanted]] if df is not None else _stream_frames(dataset_id, wanted)):
+            summary_stats.summarise_frame(chunk, summaries)
+    return summaries
+
+# In-memory cache for loaded data, keyed by dataset id (the file path)
+dataset_cache = DatasetCache(_load_dataset, DATASET_CACHE_MB * 1024 ** 2, signature=_dataset_signature)
+# Most recently loaded dataset, used by requests that carry no dataset_id
 current_csv = None
-current_df = None
+
+def _request_dataset(data, columns, windows=None):
+    """DataFrame for the request's dataset_id (falls back to the last loaded file), see _dataset_frame"""
+    dataset_id = data.get('dataset_id') or current_csv
+    if dataset_id is None:
+        return None
+    try:
+        return _dataset_frame(dataset_id, columns, windows)
+    except OSError as e:
+        log_message(f"[ERROR] Dataset no longer available: {e}")
+        return None
+
+# Plot width (pixels) assumed when the browser does not send one
+DEFAULT_PLOT_WIDTH = 1200
+
+def _has_datetime_index(df):
+    return 'timestamp' in df.columns and pd.api.types.is_datetime64_any_dtype(df['timestamp'])
+
+def _pack_plot_payload(header, x, series):
+    """Pack plot data as little-endian typed arrays for the browser.
+
+    Layout: uint32 header length, UTF-8 JSON header, zero padding to an
+    8-byte boundary, then the shared x array followed by one array per
+    series, each header['n'] float64 values (NaN = missing).
+    """
+    header_bytes = json.dumps(header).encode('utf-8')
+    prefix = struct.pack('<I', len(header_bytes)) + header_bytes
+    prefix += b'\0' * (-len(prefix) % 8)
+    arrays = [np.ascontiguousarray(x, dtype='<f8')] + [np.ascontiguousarray(y, dtype='<f8') for y in series]
+    return prefix + b''.join(a.tobytes() for a in arrays)
+
+def _epoch_ns(timestamps):
+    """int64 nanoseconds since the epoch of a datetime Series, naive or timezone-aware (as UTC)"""
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_convert(None)
+    return timestamps.to_numpy(dtype='datetime64[ns]').view('int64')
+
+def _time_bound(value, timestamps):
+    """value as a Timestamp comparable with the timestamps Series.
+
+    Naive bounds are UTC (parquet_search.utc_bound), like the epoch x values
+    the page is sent (_epoch_ns); every endpoint's start/end, windows and
+    x_range go through here or _windows_span.
+    """
+    bound = parquet_search.utc_bound(value)
+    tz = timestamps.dt.tz
+    return bound.tz_convert(tz) if tz is not None else bound.tz_convert(None)
+
+def _row_window(df, x_range):
+    """Row bounds [lo, hi) covering x_range = [start, end] (either end may be None = open).
+
+    With a parsed timestamp column (sorted at load) this is a binary search;
+    otherwise x_range is in sample indices.
+    """
+    if not x_range:
+        return 0, len(df)
+    start, end = x_range
+    lo, hi = 0, len(df)
+    if _has_datetime_index(df):
+        ts = df['timestamp']
+        if start is not None:
+            lo = int(ts.searchsorted(_time_bound(start, ts), side='left'))
+        if end is not None:
+            hi = int(ts.searchsorted(_time_bound(end, ts), side='right'))
+    else:
+        if start is not None:
+            lo = max(0, int(np.floor(float(start))))
+        if end is not None:
+            hi = min(len(df), int(np.ceil(float(end))) + 1)
+    return lo, max(lo, hi)
+
+def _request_windows(data, dataset_id=None):
+    """Time windows of a request for one file; None = whole file.
+
+    windows=[[start, end], ...] or a single start/end, and/or regime (an id
+    or part of one such as 'steady', or a list of them) selecting intervals
+    from the file's regime index (see /api/regimes). Both together keep
+    only their overlap.
+    """
+    windows = data.get('windows')
+    if not windows and (data.get('start') is not None or data.get('end') is not None):
+        windows = [[data.get('start'), data.get('end')]]
+    windows = windows or None
+    if data.get('regime'):
+        dataset_id = dataset_id or data.get('dataset_id') or current_csv
+        index = regimes.load_index(dataset_id)
+        if index is None:
+            raise ValueError(f"No regime index for {Path(dataset_id).name}; detect regimes first")
+        regime_windows = regimes.matching_windows(index, data['regime'])
+        windows = regimes.intersect_windows(regime_windows, windows) if windows else regime_windows
+    return windows
+
+def _window_bounds(df, windows):
+    """Sorted, non-overlapping row bounds [(lo, hi), ...] of the windows in df"""
+    bounds = []
+    for lo, hi in sorted(_row_window(df, window) for window in windows):
+        if bounds and lo <= bounds[-1][1]:
+            bounds[-1] = (bounds[-1][0], max(bounds[-1][1], hi))
+        elif hi > lo:
+            bounds.append((lo, hi))
+    return bounds
+
+def _window_frame(df, windows, columns):
+    """Rows of df inside any of the windows (overlaps counted once), as slices of the sorted frame"""
+    bounds = _window_bounds(df, windows)
+    if len(bounds) == 1:
+        return df[columns].iloc[bounds[0][0]:bounds[0][1]]
+    # One gather instead of concatenating many slices (regime filters give hundreds of windows)
+    rows = np.concatenate([np.arange(lo, hi) for lo, hi in bounds]) if bounds else []
+    return df[columns].iloc[rows]
 
 # ===========================
 # API ENDPOINTS
@@ -92,105 +348,240 @@ def index():
 
 @app.route('/api/list-csvs', methods=['GET'])
 def list_csvs():
-    """Get list of available CSV files"""
+    """Get list of available filtered files (CSV or any other table_io format)"""
     csv_files = []
     
-    for folder in FILTERED_CSV_DIR.glob("*/"):
-        for csv in folder.glob("*_filtered.csv"):
-            size_mb = csv.stat().st_size / (1024**2)
-            csv_files.append({
-                'path': str(csv),
-                'name': f"{csv.parent.name}/{csv.name}",
-                'size': f"{size_mb:.1f} MB"
-            })
+    for csv in table_io.find_data_files(FILTERED_CSV_DIR, suffix='_filtered'):
+        size_mb = csv.stat().st_size / (1024**2)
+        csv_files.append({
+            'path': str(csv),
+            'name': f"{csv.parent.name}/{csv.name}",
+            'size': f"{size_mb:.1f} MB"
+        })
     
     csv_files.sort(key=lambda x: x['name'])
-    log_message(f"[INFO] Listed {len(csv_files)} CSV files")
+    
+    # Whole plants first: every export of the plant as one time-ordered dataset
+    plants = []
+    for folder in plant_dataset.find_plants(PARQUET_SOURCE_DIR):
+        info = plant_dataset.PlantDataset(folder).describe()
+        plants.append({
+            'path': str(folder),
+            'name': f"{info['name']} (all {len(info['files'])} files)",
+            'size': f"{info['rows']:,} rows, {(info['min_time'] or '')[:10]} to {(info['max_time'] or '')[:10]}",
+            'plant': True
+        })
+    csv_files = plants + csv_files
+    log_message(f"[INFO] Listed {len(plants)} plants and {len(csv_files) - len(plants)} CSV files")
     return jsonify({'files': csv_files})
 
 @app.route('/api/load-csv', methods=['POST'])
 def load_csv():
-    """Load a CSV file and return column information"""
-    global current_csv, current_df
+    """Load a CSV file (or reuse it from the dataset cache) and return column information.
+
+    The returned dataset_id must be sent with later requests so that
+    several browser tabs can work on different files at the same time.
+    """
+    global current_csv
     
     data = request.json
     csv_path = data.get('path')
     
     try:
-        df = pd.read_csv(csv_path, encoding='utf-8-sig')
-        
-        # Convert timestamp if present
-        if 'timestamp' in df.columns:
-            try:
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-                df = df.sort_values('timestamp').reset_index(drop=True)
-            except:
-                pass
-        
+        if Path(csv_path).is_dir():
+            info = _describe_plant(csv_path)
+        else:
+            info = _describe_dataset(csv_path, dataset_cache.get(csv_path))
         current_csv = csv_path
-        current_df = df
-        
-        # Get column info
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
         
         log_message(f"[USER] Loaded CSV: {Path(csv_path).name}")
-        log_message(f"  - Rows: {len(df):,}")
-        log_message(f"  - Columns: {len(df.columns)}")
-        log_message(f"  - Numeric columns: {len(numeric_cols)}")
-        
-        return jsonify({
-            'success': True,
-            'rows': len(df),
-            'columns': list(df.columns),
-            'numeric_columns': numeric_cols,
-            'has_timestamp': 'timestamp' in df.columns
-        })
+        return jsonify({'success': True, **info})
     except Exception as e:
         log_message(f"[ERROR] Failed to load CSV: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/api/plot-data', methods=['POST'])
-def plot_data():
-    """Generate plot data for selected columns"""
-    global current_df
+def _describe_dataset(csv_path, df):
+    """Column information returned when a dataset is loaded (derived tags are listed, not computed)"""
+    derived = derived_tags.available(df.columns, derived_tags.load_definitions())
+    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist() + derived
     
-    if current_df is None:
+    log_message(f"  - Rows: {len(df):,}")
+    log_message(f"  - Columns: {len(df.columns) + len(derived)}")
+    log_message(f"  - Numeric columns: {len(numeric_cols)}")
+    memory_mb = dtype_registry.memory_mb(df)
+    log_message(f"  - Memory: {memory_mb:.1f} MB")
+    
+    return {
+        'dataset_id': str(csv_path),
+        'rows': len(df),
+        'columns': list(df.columns) + derived,
+        'numeric_columns': numeric_cols,
+        'has_timestamp': 'timestamp' in df.columns,
+        'memory_mb': round(memory_mb, 2)
+    }
+
+def _describe_plant(dataset_id):
+    """Column information for a plant folder, from its footer catalog (no data is read)"""
+    plant = plant_dataset.PlantDataset(dataset_id)
+    derived = derived_tags.available(plant.columns, derived_tags.load_definitions())
+    
+    log_message(f"  - Rows: {plant.num_rows:,} in {len(plant.files)} files")
+    log_message(f"  - Columns: {len(plant.columns) + len(derived)}")
+    
+    return {
+        'dataset_id': str(dataset_id),
+        'rows': plant.num_rows,
+        'columns': plant.columns + derived,
+        'numeric_columns': plant.numeric_columns + derived,
+        'has_timestamp': 'timestamp' in plant.columns,
+        'memory_mb': 0
+    }
+
+@app.route('/api/resample', methods=['POST'])
+def resample_dataset():
+    """Resample a dataset onto a regular time grid and load the result.
+
+    Body: dataset_id, interval (e.g. '1min'), agg (mean/last/min/max/...),
+    optional column_aggs {tag: agg} and ffill_limit (intervals). The file is
+    streamed through resample.Resampler into
+    <stem>_<interval>_filtered.csv next to it (for a plant, in its
+    csv_filtered folder), so the result is listed and can be reloaded like
+    any filtered file. Derived tags are resampled from
+    their full-resolution values.
+    """
+    global current_csv
+    
+    data = request.json
+    dataset_id = data.get('dataset_id') or current_csv
+    if dataset_id is None:
         return jsonify({'success': False, 'error': 'No CSV loaded'})
     
+    try:
+        options = {
+            'interval': data.get('interval', '1min'),
+            'agg': data.get('agg', 'mean'),
+            'column_aggs': data.get('column_aggs') or {},
+            'ffill_limit': int(data.get('ffill_limit') or 0),
+        }
+        resample.Resampler(**options)  # validate before writing anything
+        
+        src = Path(dataset_id)
+        header = table_io.read_columns(src)
+        if 'timestamp' not in header:
+            return jsonify({'success': False, 'error': 'Resampling needs a timestamp column'})
+        columns = header + derived_tags.available(header, derived_tags.load_definitions())
+        stem = table_io.data_stem(src).removesuffix('_filtered')
+        label = ''.join(ch for ch in str(options['interval']) if ch.isalnum())
+        target_dir = FILTERED_CSV_DIR / src.name if src.is_dir() else src.parent
+        target_dir.mkdir(parents=True, exist_ok=True)
+        dst = target_dir / f"{stem}_{label}_filtered.csv"
+        
+        overlaps = plant_dataset.PlantDataset(src).overlaps if src.is_dir() else []
+        for earlier, later in overlaps:
+            log_message(f"[WARNING] {Path(later).name} overlaps {Path(earlier).name} in time; its out-of-order rows are dropped when resampling")
+        timing = table_io.write_projected_csv(src, dst, columns, definitions_file=derived_tags.DEFINITIONS_FILE,
+                                              resample_options=options)
+        df = dataset_cache.get(dst)
+        current_csv = str(dst)
+        
+        if timing['late_rows']:
+            log_message(f"[WARNING] {timing['late_rows']:,} out-of-order rows in {src.name} were dropped while resampling")
+        log_message(f"[USER] Resampled {src.name} to {options['interval']} ({options['agg']}): {dst.name} in {timing['seconds']:.2f}s")
+        return jsonify({'success': True, **_describe_dataset(dst, df), 'name': dst.name, 'seconds': round(timing['seconds'], 3),
+                        'late_rows': timing['late_rows'],
+                        'overlaps': [[Path(earlier).name, Path(later).name] for earlier, later in overlaps]})
+    except Exception as e:
+        log_message(f"[ERROR] Resampling failed: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/plot-data', methods=['POST'])
+def plot_data():
+    """Generate plot data for selected columns.
+
+    Series are downsampled server-side to about two points per pixel of the
+    requested plot width (min/max per bucket by default, so spikes survive).
+    An optional x_range limits the query to the visible window, which the
+    page sends on zoom to fetch that window at full resolution.
+
+    With format='binary' the response is packed float64 arrays (see
+    _pack_plot_payload) with the x axis sent once, instead of JSON lists.
+    """
     data = request.json
     selected_columns = data.get('columns', [])
+    x_range = data.get('x_range')
+    current_df = _request_dataset(data, selected_columns, [x_range] if x_range else None)
+    if current_df is None:
+        return jsonify({'success': False, 'error': 'No CSV loaded'})
+    
+    width = int(data.get('width') or DEFAULT_PLOT_WIDTH)
+    method = data.get('downsample', 'minmax')
     
     if not selected_columns:
         return jsonify({'success': False, 'error': 'No columns selected'})
+    if method not in downsample.METHODS:
+        return jsonify({'success': False, 'error': f'Unknown downsampling method: {method}'})
     
     try:
-        df = current_df.copy()
+        df = current_df
+        columns = [col for col in selected_columns if col in df.columns]
+        lo, hi = _row_window(df, x_range)
+        
+        # Pick the rows to send: union over series so they share one x axis
+        window = df.iloc[lo:hi]
+        values = [window[col].to_numpy(dtype=float, na_value=np.nan) for col in columns]
+        if _has_datetime_index(df):
+            x_numeric = _epoch_ns(window['timestamp'])
+        else:
+            x_numeric = np.arange(lo, hi)
+        idx = downsample.select_indices(x_numeric, values, max(2, 2 * width), method)
+        
+        if data.get('format') == 'binary':
+            if _has_datetime_index(df):
+                x_values = x_numeric[idx] // 1_000_000
+                x_kind = 'epoch_ms'
+            else:
+                x_values = idx + lo
+                x_kind = 'index'
+            header = {
+                'names': columns,
+                'n': int(len(idx)),
+                'x_kind': x_kind,
+                'x_label': 'Timestamp' if 'timestamp' in df.columns else 'Sample Index',
+                'total_points': hi - lo,
+                'returned_points': int(len(idx)),
+                'downsampled': int(len(idx)) < hi - lo
+            }
+            payload = _pack_plot_payload(header, x_values, [y[idx] for y in values])
+            log_message(f"[USER] Plotted {len(columns)} columns ({len(idx):,} of {hi - lo:,} points, {method}, binary {len(payload):,} bytes)")
+            return Response(payload, mimetype='application/octet-stream')
         
         # Prepare x-axis
         if 'timestamp' in df.columns:
-            x_data = df['timestamp'].astype(str).tolist()
+            x_data = window['timestamp'].iloc[idx].astype(str).tolist()
             x_label = 'Timestamp'
         else:
-            x_data = list(range(len(df)))
+            x_data = (idx + lo).tolist()
             x_label = 'Sample Index'
         
         # Prepare plot series
         plot_series = []
-        for col in selected_columns:
-            if col in df.columns:
-                y_data = df[col].fillna(None).tolist()
-                plot_series.append({
-                    'name': col,
-                    'x': x_data,
-                    'y': y_data
-                })
+        for col, y in zip(columns, values):
+            y_data = [None if np.isnan(v) else v for v in y[idx].tolist()]
+            plot_series.append({
+                'name': col,
+                'x': x_data,
+                'y': y_data
+            })
         
-        log_message(f"[USER] Plotted {len(plot_series)} columns")
+        log_message(f"[USER] Plotted {len(plot_series)} columns ({len(idx):,} of {hi - lo:,} points, {method})")
         
         return jsonify({
             'success': True,
             'series': plot_series,
-            'x_label': x_label
+            'x_label': x_label,
+            'total_points': hi - lo,
+            'returned_points': int(len(idx)),
+            'downsampled': int(len(idx)) < hi - lo
         })
     except Exception as e:
         log_message(f"[ERROR] Plot generation failed: {e}")
@@ -198,57 +589,53 @@ def plot_data():
 
 @app.route('/api/statistics', methods=['POST'])
 def get_statistics():
-    """Calculate statistics for selected columns"""
-    global current_df
-    
-    if current_df is None:
+    """Statistics for selected columns, answered from per-file summary sidecars.
+
+    The summary (see summary_stats.py) is computed once per file and saved
+    next to it, so repeat requests never rescan the data. Send dataset_ids
+    (a list) instead of dataset_id to get combined statistics across files.
+    With start/end (or windows=[[start, end], ...]) or regime only those
+    periods are summarised, sliced from the loaded data by binary search on
+    timestamp.
+    """
+    data = request.json
+    dataset_ids = data.get('dataset_ids') or [data.get('dataset_id') or current_csv]
+    if dataset_ids[0] is None:
         return jsonify({'success': False, 'error': 'No CSV loaded'})
     
-    data = request.json
     selected_columns = data.get('columns', [])
     stats_types = data.get('stats', [])
     
     if not selected_columns or not stats_types:
         return jsonify({'success': False, 'error': 'Columns or stats not selected'})
     
+    windowed = any(data.get(key) is not None for key in ('windows', 'start', 'end', 'regime'))
+    windows = None
+    
     try:
-        df = current_df[selected_columns].select_dtypes(include=[np.number])
+        if windowed:
+            summaries = {}
+            for dataset_id in dataset_ids:
+                windows = _request_windows(data, dataset_id)
+                df = _dataset_frame(dataset_id, selected_columns, windows)
+                columns = [col for col in selected_columns if col in df.columns]
+                summary_stats.summarise_frame(_window_frame(df, windows, columns) if windows is not None else df[columns], summaries)
+        else:
+            summaries = summary_stats.merge_summaries(_file_summary(dataset_id, selected_columns) for dataset_id in dataset_ids)
         
         results = {}
-        
         for col in selected_columns:
-            if col not in df.columns:
-                continue
-            
-            col_data = df[col].dropna()
-            col_stats = {}
-            
-            if 'mean' in stats_types:
-                col_stats['mean'] = float(col_data.mean())
-            if 'median' in stats_types:
-                col_stats['median'] = float(col_data.median())
-            if 'std' in stats_types:
-                col_stats['std'] = float(col_data.std())
-            if 'min' in stats_types:
-                col_stats['min'] = float(col_data.min())
-            if 'max' in stats_types:
-                col_stats['max'] = float(col_data.max())
-            if 'count' in stats_types:
-                col_stats['count'] = int(col_data.count())
-            if 'variance' in stats_types:
-                col_stats['variance'] = float(col_data.var())
-            if 'q25' in stats_types:
-                col_stats['q25'] = float(col_data.quantile(0.25))
-            if 'q75' in stats_types:
-                col_stats['q75'] = float(col_data.quantile(0.75))
-            
-            results[col] = col_stats
+            if col in summaries:
+                results[col] = summaries[col].result(stats_types)
         
-        log_message(f"[USER] Calculated statistics for {len(results)} columns")
+        log_message(f"[USER] Calculated statistics for {len(results)} columns across {len(dataset_ids)} file(s)")
         
         return jsonify({
             'success': True,
-            'statistics': results
+            'statistics': results,
+            'dataset_ids': dataset_ids,
+            'windows': windows,
+            'approximate': [stat for stat in ('median', 'q25', 'q75') if stat in stats_types]
         })
     except Exception as e:
         log_message(f"[ERROR] Statistics calculation failed: {e}")
@@ -256,40 +643,261 @@ def get_statistics():
 
 @app.route('/api/correlation', methods=['POST'])
 def get_correlation():
-    """Calculate correlation matrix between selected columns"""
-    global current_df
-    
-    if current_df is None:
+    """Correlation matrix between selected columns (optionally within start/end, windows or a regime).
+
+    Computed in row chunks by correlation.CorrelationAccumulator with
+    pairwise-complete semantics. Files that are not already loaded are
+    streamed rather than read whole, and dataset_ids (a list) correlates
+    across several files. The matrix is returned as one flat row-major array.
+    """
+    data = request.json
+    dataset_ids = data.get('dataset_ids') or [data.get('dataset_id') or current_csv]
+    if dataset_ids[0] is None:
         return jsonify({'success': False, 'error': 'No CSV loaded'})
     
-    data = request.json
     selected_columns = data.get('columns', [])
     
     if len(selected_columns) < 2:
         return jsonify({'success': False, 'error': 'Need at least 2 columns for correlation'})
     
+    windows = None
+    
     try:
-        df = current_df[selected_columns].select_dtypes(include=[np.number])
-        corr_matrix = df.corr()
+        accumulator = correlation.CorrelationAccumulator(selected_columns)
+        for dataset_id in dataset_ids:
+            windows = _request_windows(data, dataset_id)
+            df = _dataset_frame(dataset_id, selected_columns, windows) if windows is not None else dataset_cache.peek(dataset_id)
+            if df is None:
+                chunks = _stream_frames(dataset_id, selected_columns)
+            else:
+                df = _with_derived(df, selected_columns)
+                columns = [col for col in selected_columns if col in df.columns]
+                frame = _window_frame(df, windows, columns) if windows is not None else df[columns]
+                chunks = (frame.iloc[i:i + table_io.DEFAULT_CHUNK_ROWS] for i in range(0, len(frame), table_io.DEFAULT_CHUNK_ROWS))
+            for chunk in chunks:
+                accumulator.update(chunk)
+        matrix, counts = accumulator.result()
         
-        # Convert to JSON-serializable format
-        corr_dict = {}
-        for col1 in corr_matrix.columns:
-            corr_dict[col1] = {}
-            for col2 in corr_matrix.index:
-                corr_dict[col1][col2] = float(corr_matrix.loc[col2, col1])
+        # Drop columns with no numeric values at all (text tags)
+        keep = np.flatnonzero(np.diag(counts) > 0)
+        matrix = matrix[np.ix_(keep, keep)]
+        columns = [selected_columns[i] for i in keep]
         
-        log_message(f"[USER] Calculated correlation for {len(selected_columns)} columns")
+        log_message(f"[USER] Calculated correlation for {len(columns)} columns over {accumulator.rows:,} rows")
         
         return jsonify({
             'success': True,
-            'correlation': corr_dict,
-            'columns': list(corr_matrix.columns)
+            'matrix': [None if np.isnan(v) else float(v) for v in matrix.ravel()],
+            'columns': columns,
+            'rows': accumulator.rows,
+            'dataset_ids': dataset_ids,
+            'windows': windows
         })
     except Exception as e:
         log_message(f"[ERROR] Correlation calculation failed: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/cross-correlation', methods=['POST'])
+def get_cross_correlation():
+    """Correlation over a range of time lags for tag pairs (see correlation.py).
+
+    Body: columns (every pair among them) or pairs=[[x, y], ...], max_lag in
+    samples or max_lag_seconds, and optionally start/end, windows or regime. A
+    positive peak lag means y follows x. Curves are included with curves=true.
+    Rows between windows count as missing, so no lag pairs samples across a gap.
+    """
+    data = request.json
+    if (data.get('dataset_id') or current_csv) is None:
+        return jsonify({'success': False, 'error': 'No CSV loaded'})
+    
+    pairs = data.get('pairs')
+    if not pairs:
+        selected_columns = data.get('columns', [])
+        pairs = [[a, b] for i, a in enumerate(selected_columns) for b in selected_columns[i + 1:]]
+    if not pairs:
+        return jsonify({'success': False, 'error': 'Need at least 2 columns for cross-correlation'})
+    
+    try:
+        windows = _request_windows(data)
+        names = list(dict.fromkeys(name for pair in pairs for name in pair))
+        current_df = _request_dataset(data, names, windows)
+        if current_df is None:
+            return jsonify({'success': False, 'error': 'No CSV loaded'})
+        # Lags need the real time grid: keep every row from the first window to the last and
+        # blank the rows between windows, instead of joining the windows end to end
+        lo, hi = 0, len(current_df)
+        inside = np.ones(hi, dtype=bool)
+        if windows is not None:
+            bounds = _window_bounds(current_df, windows)
+            lo, hi = (bounds[0][0], bounds[-1][1]) if bounds else (0, 0)
+            inside = np.zeros(hi - lo, dtype=bool)
+            for start, end in bounds:
+                inside[start - lo:end - lo] = True
+        df = current_df[names].iloc[lo:hi]
+        numeric = set(df.select_dtypes(include=[np.number]).columns)
+        pairs = [pair for pair in pairs if pair[0] in numeric and pair[1] in numeric]
+        
+        # Sample spacing from the timestamps, so lags can be reported in seconds
+        sample_seconds = None
+        if _has_datetime_index(current_df):
+            steps = np.diff(_epoch_ns(current_df['timestamp'].iloc[lo:hi])) // 1_000_000
+            if len(steps):
+                sample_seconds = float(np.median(steps)) / 1000
+        
+        max_lag = data.get('max_lag')
+        if max_lag is None and data.get('max_lag_seconds') is not None and sample_seconds:
+            max_lag = float(data['max_lag_seconds']) / sample_seconds
+        max_lag = int(max_lag if max_lag is not None else 60)
+        
+        columns = {name: np.where(inside, df[name].to_numpy(dtype=float, na_value=np.nan), np.nan) for name in numeric}
+        lags, results = correlation.cross_correlations(columns, [tuple(pair) for pair in pairs], max_lag)
+        
+        for result in results:
+            curve = result.pop('r')
+            if data.get('curves'):
+                result['r'] = [None if np.isnan(v) else float(v) for v in curve]
+            if sample_seconds is not None and result['peak_lag'] is not None:
+                result['peak_lag_seconds'] = result['peak_lag'] * sample_seconds
+        
+        log_message(f"[USER] Calculated cross-correlation for {len(results)} pairs over +/-{int(lags[-1]) if len(lags) else 0} samples")
+        
+        return jsonify({
+            'success': True,
+            'pairs': results,
+            'lags': lags.tolist() if data.get('curves') else None,
+            'max_lag': int(lags[-1]) if len(lags) else 0,
+            'sample_seconds': sample_seconds,
+            'rows': int(inside.sum()),
+            'windows': windows
+        })
+    except Exception as e:
+        log_message(f"[ERROR] Cross-correlation failed: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
+# Plant load tag used for load regimes when the request names none (analysis plan step 1.4);
+# exports append the PI point's GUID ("<tag>.<GUID>"), so tags are matched by prefix
+DEFAULT_LOAD_TAG = 'NAP2_Plant_Load.NAP2_Load_Output'
+# Design load of DEFAULT_LOAD_TAG in the tag's units; load regimes are only
+# detected by default once this is set (None: only when the request sends design_load)
+DEFAULT_DESIGN_LOAD = None
+
+def _resolve_tag(name, columns):
+    """name if it is a column, else the one column named "<name>.<suffix>"; None if none or several"""
+    if name in columns:
+        return name
+    matches = [col for col in columns if col.startswith(name + '.')]
+    return matches[0] if len(matches) == 1 else None
+
+@app.route('/api/regimes', methods=['POST'])
+def get_regimes():
+    """Detect steady-state and load regimes for a dataset and store them as its regime index.
+
+    Body: tags (tested for steady state), window in samples or
+    window_seconds, max_rel_std (default 1% of the rolling mean) or
+    max_std={tag: limit}, and load_tag/design_load/load_bins for load
+    levels (a load_tag needs its design_load; design_load alone uses
+    DEFAULT_LOAD_TAG). Tags may omit their ".<GUID>" suffix. Unknown tags are
+    a 400. Without tags the stored index is returned. Other endpoints then
+    accept regime='steady', 'normal-steady', ... to restrict their rows.
+    """
+    data = request.json
+    dataset_id = data.get('dataset_id') or current_csv
+    if dataset_id is None:
+        return jsonify({'success': False, 'error': 'No CSV loaded'})
+    
+    try:
+        tags = data.get('tags')
+        if not tags:
+            index = regimes.load_index(dataset_id)
+            if index is None:
+                return jsonify({'success': False, 'error': 'No regime index for this dataset yet'})
+        else:
+            header = table_io.read_columns(dataset_id)
+            columns = header + derived_tags.available(header, derived_tags.load_definitions())
+            resolved = {tag: _resolve_tag(tag, columns) for tag in tags}
+            missing = [tag for tag, column in resolved.items() if column is None]
+            if missing:
+                return jsonify({'success': False, 'error': f"Unknown tags: {', '.join(missing)}"}), 400
+            tags = list(resolved.values())
+            
+            requested_load = data.get('load_tag')
+            design_load = data.get('design_load', DEFAULT_DESIGN_LOAD)
+            load_tag = None
+            if requested_load or design_load is not None:
+                load_tag = _resolve_tag(requested_load or DEFAULT_LOAD_TAG, columns)
+                # Only the server default may quietly fall back to steady state only
+                if load_tag is None and (requested_load or data.get('design_load') is not None):
+                    return jsonify({'success': False, 'error': f"Load tag {requested_load or DEFAULT_LOAD_TAG} is not in this dataset"}), 400
+            if load_tag and design_load is None:
+                return jsonify({'success': False, 'error': f"Load regimes need the design load of {load_tag} (design_load)"}), 400
+            
+            df = _dataset_frame(dataset_id, tags + ([load_tag] if load_tag else []))
+            if not _has_datetime_index(df):
+                return jsonify({'success': False, 'error': 'Regime detection needs a timestamp column'})
+            
+            window = data.get('window')
+            if window is None:
+                steps = np.diff(_epoch_ns(df['timestamp'])) // 1_000_000
+                sample_seconds = float(np.median(steps)) / 1000 if len(steps) else 0
+                window = float(data.get('window_seconds', 1800)) / sample_seconds if sample_seconds > 0 else 30
+            index = regimes.detect_regimes(
+                df, tags, max(2, int(round(float(window)))),
+                max_rel_std=float(data.get('max_rel_std', regimes.DEFAULT_MAX_REL_STD)),
+                max_std={resolved.get(tag, tag): limit for tag, limit in (data.get('max_std') or {}).items()},
+                load_tag=load_tag or None,
+                design_load=design_load,
+                load_bins=tuple(data.get('load_bins', regimes.DEFAULT_LOAD_BINS)))
+            regimes.save_index(dataset_id, index)
+            log_message(f"[USER] Detected {len(index['regimes'])} regimes in {len(index['intervals']):,} intervals for {Path(dataset_id).name}")
+        
+        counts = np.bincount([code for _, _, code in index['intervals']], minlength=len(index['regimes']))
+        return jsonify({
+            'success': True,
+            'regimes': [{'id': regime, 'rows': rows, 'intervals': int(count)}
+                        for regime, rows, count in zip(index['regimes'], index['rows'], counts)],
+            'parameters': index['parameters'],
+            'intervals': index['intervals'] if data.get('intervals') else None
+        })
+    except Exception as e:
+        log_message(f"[ERROR] Regime detection failed: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/compare-plants', methods=['POST'])
+def compare_plants_endpoint():
+    """Per-tag difference statistics between two plants (or files) on a shared time grid.
+
+    Body: dataset_a and dataset_b (plant folders or files from the list),
+    interval (default 10min), agg, optional tags, start and end (naive = UTC,
+    as for the other endpoints). Both sides
+    are streamed from disk, so neither has to be loaded first.
+    """
+    data = request.json
+    dataset_a, dataset_b = data.get('dataset_a'), data.get('dataset_b')
+    if not dataset_a or not dataset_b:
+        return jsonify({'success': False, 'error': 'Select two datasets to compare'})
+    
+    try:
+        comparison = compare_plants.compare(
+            dataset_a, dataset_b,
+            interval=data.get('interval') or compare_plants.DEFAULT_INTERVAL,
+            agg=data.get('agg', 'mean'),
+            tags=data.get('tags') or None,
+            start=parquet_search.utc_bound(data.get('start') or None),
+            end=parquet_search.utc_bound(data.get('end') or None),
+            workers=COMPARE_WORKERS,
+            pool=_get_compare_pool())
+        log_message(f"[USER] Compared {len(comparison['tags'])} tags of {comparison['a']} and {comparison['b']} "
+                    f"on a {comparison['interval']} grid ({comparison['seconds']:.2f}s)")
+        return jsonify({'success': True, **comparison})
+    except Exception as e:
+        log_message(f"[ERROR] Plant comparison failed: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """Dataset cache hits, misses, evictions and the datasets currently held"""
+    return jsonify({'success': True, **dataset_cache.stats()})
+
 # ===========================
 # RUN SERVER
 # ===========================
@@ -302,6 +910,8 @@ if __name__ == '__main__':
     print("Open your browser and go to: http://localhost:5000")
     print("\nPress Ctrl+C to stop the server\n")
     
+    log_message("=" * 80)
+    log_message("WEB-BASED INTERACTIVE PLOTTER STARTED")
     log_message("[INFO] Starting Flask server on http://localhost:5000")
     
     app.run(debug=True, use_reloader=False)